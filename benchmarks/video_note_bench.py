@@ -0,0 +1,65 @@
+"""Сравнение конвертации в видеокружок: один проход ffmpeg против сегментов.
+
+Для каждой длительности генерируется тестовое видео 1280x720 со звуком,
+затем оно конвертируется обоими способами; выводится лучшее время из
+нескольких повторов.
+
+Запуск из корня проекта:
+    python3 -m benchmarks.video_note_bench
+    python3 -m benchmarks.video_note_bench --durations 10 30 60 --repeat 3 --workers 4
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+from utils.media_pool import media_pool, run_ffmpeg, close_media_pool
+from utils.video_note import encode_single_pass, encode_segmented
+
+DEFAULT_DURATIONS = [10, 20, 30, 45, 60]
+
+async def make_sample(path: str, duration: int):
+    """Тестовое видео с ключевым кадром каждые 2 секунды, как у обычных записей с телефона."""
+    await run_ffmpeg([
+        "-f", "lavfi", "-i", f"testsrc2=size=1280x720:rate=30:duration={duration}",
+        "-f", "lavfi", "-i", f"sine=frequency=440:duration={duration}",
+        "-c:v", "libx264", "-preset", "ultrafast", "-g", "60",
+        "-c:a", "aac",
+        "-shortest",
+        "-y",
+        path
+    ], timeout=600)
+
+async def best_time(encode, sample: str, output: str, duration: int, repeat: int) -> float:
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        await encode(sample, output, duration)
+        times.append(time.perf_counter() - started)
+        os.remove(output)
+    return min(times)
+
+async def main(durations, repeat: int):
+    print(f"Процессов в пуле: {media_pool.workers}, ядер: {os.cpu_count()}")
+    print(f"{'Длина, с':>9} {'Один проход, с':>15} {'Сегменты, с':>12} {'Ускорение':>10}")
+    try:
+        with tempfile.TemporaryDirectory() as work_dir:
+            for duration in durations:
+                sample = os.path.join(work_dir, f"sample_{duration}.mp4")
+                output = os.path.join(work_dir, "out.mp4")
+                await make_sample(sample, duration)
+                single = await best_time(encode_single_pass, sample, output, duration, repeat)
+                segmented = await best_time(encode_segmented, sample, output, duration, repeat)
+                print(f"{duration:>9} {single:>15.2f} {segmented:>12.2f} {single / segmented:>9.2f}x")
+    finally:
+        await close_media_pool()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--durations", type=int, nargs="+", default=DEFAULT_DURATIONS)
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--workers", type=int, help="число процессов ffmpeg (по умолчанию из config.py)")
+    args = parser.parse_args()
+    if args.workers:
+        media_pool.workers = args.workers
+    asyncio.run(main(args.durations, args.repeat))
@@ -1,21 +1,29 @@
 import logging
 import os
-from io import BytesIO
-from PIL import Image, ImageDraw, ImageFont
-from pyrogram import Client, filters
-from pyrogram.types import Message
-from utils.filters import template_filter
-from textwrap import wrap
+from pyrogram import Client
+from pyrogram.types import InputMediaPhoto, Message, Photo
+from utils.router import router
+from utils.file_id_cache import file_id_cache
+from utils.render_pool import render, as_upload
+from utils.renderers import render_advice
+from utils.render_cache import render_cache, reply_album_photos
 
 # Настройка логирования
 logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
 
-# Путь к шрифту и изображениям
-FONT_PATH = "resources/fonts/arial.ttf"
+# Пути к изображениям
 ADVICE1_PATH = "resources/advice1.jpg"
 ADVICE2_PATH = "resources/advice2.jpg"
 
+async def make_advice(client: Client, photo: Photo, top_text: str, bottom_text: str):
+    """Скачивает фото в память и рисует мем в пуле процессов."""
+    photo_file = await client.download_media(photo, in_memory=True)
+    # Отрисовка в пуле процессов, шрифт там уже загружен
+    output = as_upload(await render(render_advice, photo_file.getvalue(), top_text, bottom_text), "advice.jpg")
+    logger.debug("Изображение отрисовано")
+    return output
+
 async def process_advice_image(client: Client, message: Message):
     """Обрабатывает команду эдвайс для создания мема с текстом на изображении."""
     try:
@@ -43,14 +51,14 @@ async def process_advice_image(client: Client, message: Message):
                 await message.reply(f"❌ Ошибка: файл {ADVICE1_PATH} не найден")
                 logger.error(f"Файл {ADVICE1_PATH} не найден")
                 return
-            with open(ADVICE1_PATH, "rb") as f:
-                output = BytesIO(f.read())
-                output.name = "advice.jpg"
             await message.delete()
-            await client.send_photo(
-                chat_id=message.chat.id,
-                photo=output,
-                reply_to_message_id=message.reply_to_message.id if message.reply_to_message else None
+            await file_id_cache.send(
+                ADVICE1_PATH, "photo",
+                lambda photo: client.send_photo(
+                    chat_id=message.chat.id,
+                    photo=photo,
+                    reply_to_message_id=message.reply_to_message.id if message.reply_to_message else None
+                )
             )
             logger.info(f"Отправлена картинка {ADVICE1_PATH} без текста для user_id={message.from_user.id}")
             return
@@ -61,23 +69,20 @@ async def process_advice_image(client: Client, message: Message):
                 await message.reply(f"❌ Ошибка: файл {ADVICE2_PATH} не найден")
                 logger.error(f"Файл {ADVICE2_PATH} не найден")
                 return
-            with open(ADVICE2_PATH, "rb") as f:
-                output = BytesIO(f.read())
-                output.name = "advice.jpg"
             await message.delete()
-            await client.send_photo(
-                chat_id=message.chat.id,
-                photo=output,
-                reply_to_message_id=message.reply_to_message.id if message.reply_to_message else None
+            await file_id_cache.send(
+                ADVICE2_PATH, "photo",
+                lambda photo: client.send_photo(
+                    chat_id=message.chat.id,
+                    photo=photo,
+                    reply_to_message_id=message.reply_to_message.id if message.reply_to_message else None
+                )
             )
             logger.info(f"Отправлена картинка {ADVICE2_PATH} без текста для user_id={message.from_user.id}")
             return
 
         # Случай 3 и 4: Есть картинка (с текстом или без)
         photo = message.photo if message.photo else message.reply_to_message.photo
-        photo_file = await client.download_media(photo, in_memory=True)
-        img = Image.open(BytesIO(photo_file.getbuffer()))
-        logger.debug(f"Загружена пользовательская картинка, размер: {img.size}")
 
         # Если нет текста, устанавливаем дефолтный (Случай 3)
         if not has_text:
@@ -85,80 +90,43 @@ async def process_advice_image(client: Client, message: Message):
             bottom_text = "(а где текст?)"
             logger.debug(f"Установлены дефолтные тексты: top_text='{top_text}', bottom_text='{bottom_text}'")
 
-        # Создаем объект для рисования
-        draw = ImageDraw.Draw(img)
-        img_width, img_height = img.size
-
-        # Настройки шрифта (адаптивный размер)
-        font_size = int(img_height / 10)
-        try:
-            if not os.path.exists(FONT_PATH):
-                raise FileNotFoundError(f"Шрифт по пути {FONT_PATH} не найден")
-            font = ImageFont.truetype(FONT_PATH, font_size)
-            logger.debug(f"Шрифт загружен: {FONT_PATH}, размер: {font_size}")
-        except Exception as e:
-            font = ImageFont.load_default()
-            logger.warning(f"Не удалось загрузить шрифт: {e}, используется стандартный")
-
-        # Обработка верхнего текста
-        if top_text:
-            chars_per_line = int(img_width / (font_size * 0.6))
-            wrapped_text = wrap(top_text, width=chars_per_line)
-            logger.debug(f"Верхний текст разбит на строки: {wrapped_text}")
-
-            y_position = 10
-            for line in wrapped_text:
-                text_width = draw.textlength(line, font=font)
-                x_position = (img_width - text_width) / 2
-                draw.text(
-                    (x_position, y_position),
-                    line,
-                    font=font,
-                    fill="white",
-                    stroke_width=2,
-                    stroke_fill="black"
-                )
-                y_position += font_size + 5
-
-        # Обработка нижнего текста
-        if bottom_text:
-            chars_per_line = int(img_width / (font_size * 0.6))
-            wrapped_text = wrap(bottom_text, width=chars_per_line)
-            logger.debug(f"Нижний текст разбит на строки: {wrapped_text}")
-
-            y_position = img_height - (len(wrapped_text) * (font_size + 5)) - 20
-            for line in wrapped_text:
-                text_width = draw.textlength(line, font=font)
-                x_position = (img_width - text_width) / 2
-                draw.text(
-                    (x_position, y_position),
-                    line,
-                    font=font,
-                    fill="white",
-                    stroke_width=2,
-                    stroke_fill="black"
-                )
-                y_position += font_size + 5
-
-        # Сохраняем результат
-        output = BytesIO()
-        output.name = "advice.jpg"
-        img.save(output, "JPEG")
-        output.seek(0)
-        logger.debug("Изображение сохранено в буфер")
-
-        # Отправляем результат
         reply_to_id = message.reply_to_message.id if message.reply_to_message else None
+
+        # Ответ на альбом: мем для каждого фото, одним сообщением
+        album = await reply_album_photos(client, message)
+        if len(album) > 1:
+            async def produce_item(index: int):
+                return await make_advice(client, album[index], top_text, bottom_text)
+
+            sent = await render_cache.send_album(
+                [render_cache.key("advice", item.file_unique_id, f"{top_text}\n{bottom_text}") for item in album],
+                lambda media: client.send_media_group(
+                    chat_id=message.chat.id,
+                    media=[InputMediaPhoto(item) for item in media],
+                    reply_to_message_id=reply_to_id
+                ),
+                produce_item
+            )
+        else:
+            # Отправляем результат; повтор для того же фото и текста уходит по file_id
+            sent = await render_cache.send(
+                render_cache.key("advice", photo.file_unique_id, f"{top_text}\n{bottom_text}"),
+                lambda advice: client.send_photo(
+                    chat_id=message.chat.id,
+                    photo=advice,
+                    reply_to_message_id=reply_to_id
+                ),
+                lambda: make_advice(client, photo, top_text, bottom_text)
+            )
+        if not sent:
+            await message.edit("❌ Ошибка при создании мема!")
+            logger.error(f"Мем не отправлен для user_id={message.from_user.id}, chat_id={message.chat.id}")
+            return
         try:
             await message.delete()
         except Exception as e:
             logger.warning(f"Не удалось удалить исходное сообщение: {e}")
 
-        await client.send_photo(
-            chat_id=message.chat.id,
-            photo=output,
-            reply_to_message_id=reply_to_id
-        )
         logger.info(f"Мем успешно отправлен для user_id={message.from_user.id}, chat_id={message.chat.id}")
 
     except Exception as e:
@@ -170,4 +138,4 @@ async def process_advice_image(client: Client, message: Message):
 
 def register(app: Client):
     """Регистрирует обработчик команды эдвайс."""
-    app.on_message(template_filter("эдвайс", ignore_case=True))(process_advice_image)
\ No newline at end of file
+    router.command("эдвайс", process_advice_image, caption=True)
\ No newline at end of file
@@ -1,9 +1,9 @@
 import logging
-from pyrogram import Client, filters
+from pyrogram import Client
 from pyrogram.types import Message
 from pyrogram.enums import ParseMode
 from db.db_utils import alias_exists, save_alias, delete_alias, list_aliases, get_alias_command, get_user_prefix
-from utils.filters import add_alias_filter, delete_alias_filter, list_aliases_filter, alias_trigger_filter
+from utils.router import router
 from commands.voice_cmd import get_voice_message_cmd
 from commands.template_cmd import get_template_cmd
 from commands.animation_cmd import get_animation_cmd
@@ -184,7 +184,7 @@ async def trigger_alias_cmd(client: Client, message: Message):
 
 def register(app: Client):
     """Регистрирует обработчики команд."""
-    app.on_message(filters.create(add_alias_filter))(add_alias_cmd)
-    app.on_message(filters.create(delete_alias_filter))(delete_alias_cmd)
-    app.on_message(filters.create(list_aliases_filter))(list_aliases_cmd)
-    app.on_message(filters.create(alias_trigger_filter))(trigger_alias_cmd)
\ No newline at end of file
+    router.command("+алиас", add_alias_cmd, min_words=3)
+    router.command("-алиас", delete_alias_cmd, min_words=3)
+    router.command("алиасы", list_aliases_cmd, exact=True)
+    router.alias(trigger_alias_cmd)
\ No newline at end of file
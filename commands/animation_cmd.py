@@ -1,9 +1,9 @@
-from pyrogram import Client, filters
+from pyrogram import Client
 from pyrogram.types import Message
-from pyrogram.errors import FloodWait
 from db.db_utils import anim_exists, save_animation, delete_animation, get_animation, list_animations
-from utils.filters import add_anim_filter, delete_anim_filter, get_anim_filter, list_anims_filter
-import asyncio
+from utils.router import router
+from utils.render_cache import render_cache
+from utils.text_animation import send_text_animation, play_by_edits
 
 async def add_animation_cmd(client: Client, message: Message):
     try:
@@ -68,22 +68,18 @@ async def get_animation_cmd(client: Client, message: Message):
             await message.edit(f"❌ Анимация '{anim_name}' не найдена!")
             return
 
-        msg = await message.edit(frames[0])
-        
-        for frame in frames[1:]:
-            try:
-                await asyncio.sleep(1)  # Задержка между кадрами
-                await msg.edit(frame)
-            except FloodWait as e:
-                await asyncio.sleep(e.x)
-            except Exception:
-                break  # Прерываем анимацию при ошибке
+        # Кадр показывается секунду; анимация собирается один раз на набор кадров
+        timed_frames = [(frame, 1) for frame in frames]
+        key = render_cache.key("animation", f"{user_id}:{anim_name}", "\0".join(frames))
+        if not await send_text_animation(client, message, key, timed_frames):
+            await play_by_edits(message, timed_frames)
 
     except Exception as e:
         await message.edit(f"⚠️ Ошибка: {str(e)}")
 
 def register(app: Client):
-    app.on_message(filters.create(add_anim_filter))(add_animation_cmd)
-    app.on_message(filters.create(delete_anim_filter))(delete_animation_cmd)
-    app.on_message(filters.create(list_anims_filter))(list_animations_cmd)
-    app.on_message(filters.create(get_anim_filter))(get_animation_cmd)
\ No newline at end of file
+    router.command("+анимка", add_animation_cmd, min_words=3,
+                   check=lambda m: bool(m.reply_to_message and m.reply_to_message.text))
+    router.command("-анимка", delete_animation_cmd, min_words=3)
+    router.command("анимки", list_animations_cmd, exact=True)
+    router.command("анимка", get_animation_cmd, min_words=3)
\ No newline at end of file
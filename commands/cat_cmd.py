@@ -1,14 +1,15 @@
-import requests
-from pyrogram import Client, filters
+from pyrogram import Client
 from pyrogram.types import Message
-from commands.template_cmd import template_filter
+from utils.router import router
+from utils.http_client import get_session
 
 async def cat_command(client: Client, message: Message):
     """Отправляет случайное фото котика с TheCatAPI."""
     try:
-        response = requests.get("https://api.thecatapi.com/v1/images/search")
-        if response.status_code == 200:
-            cat_url = response.json()[0]["url"]
+        async with get_session().get("https://api.thecatapi.com/v1/images/search") as response:
+            data = await response.json() if response.status == 200 else None
+        if data:
+            cat_url = data[0]["url"]
             await message.delete()
             await client.send_photo(message.chat.id, cat_url)
         else:
@@ -17,4 +18,4 @@ async def cat_command(client: Client, message: Message):
         await message.edit(f"⚠️ Ошибка: {str(e)}")
 
 def register(app: Client):
-    app.on_message(template_filter("котик", ignore_case=True) & filters.me)(cat_command)
+    router.command("котик", cat_command)
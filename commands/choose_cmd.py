@@ -1,16 +1,7 @@
-from pyrogram import Client, filters
+from pyrogram import Client
 from pyrogram.types import Message
 import random
-
-# Фильтр для команды .выбери
-def choose_filter(_: Client, __, message: Message):
-    return (
-        message.text is not None and
-        message.text.startswith('.выбери') and
-        len(message.text.split()) > 1 and
-        message.from_user and
-        message.from_user.is_self
-    )
+from utils.router import router
 
 async def choose_cmd(client: Client, message: Message):
     """Выбирает случайный вариант из указанных, разделённых словом 'или'."""
@@ -36,4 +27,4 @@ async def choose_cmd(client: Client, message: Message):
 
 def register(app: Client):
     """Регистрирует обработчик команды .выбери."""
-    app.on_message(filters.create(choose_filter))(choose_cmd)
\ No newline at end of file
+    router.dot_command("выбери", choose_cmd, min_words=2)
\ No newline at end of file
@@ -1,9 +1,10 @@
 import logging
 import re
-from pyrogram import Client, filters
+from pyrogram import Client
 from pyrogram.types import Message
 from db.db_utils import get_user_prefix
-from utils.filters import template_filter
+from utils.router import router
+from utils.message_index import message_index
 
 # Настройка логирования
 logging.basicConfig(level=logging.DEBUG)
@@ -35,11 +36,23 @@ def convert_text(text: str, to_russian: bool) -> str:
     mapping = ENG_TO_RUS if to_russian else RUS_TO_ENG
     return ''.join(mapping.get(char, char) for char in text)
 
-async def find_user_message(client: Client, chat_id: int, user_id: int, reply_to_message_id: int = None) -> Message | None:
-    """Ищет последнее сообщение пользователя в чате или ответ на конкретное сообщение."""
+async def find_user_message(client: Client, chat_id: int, user_id: int, before_id: int,
+                            reply_to_message_id: int = None) -> Message | None:
+    """Ищет последнее сообщение пользователя в чате или ответ на конкретное сообщение.
+
+    Сначала по индексу недавних сообщений (один запрос за самим сообщением),
+    при промахе — по последним 50 сообщениям истории чата.
+    """
     try:
         logger.debug(f"Поиск сообщения для user_id={user_id}, reply_to_message_id={reply_to_message_id}")
-        async for msg in client.get_chat_history(chat_id, limit=50):
+        record = message_index.find(chat_id, user_id, before_id, reply_to_message_id)
+        if record:
+            msg = await client.get_messages(chat_id, record.id)
+            if msg and not msg.empty and msg.text:
+                logger.debug(f"Сообщение message_id={msg.id} найдено в индексе")
+                return msg
+
+        async for msg in client.get_chat_history(chat_id, limit=50, offset_id=before_id):
             if not msg:
                 logger.debug("Пустое сообщение в истории")
                 continue
@@ -48,11 +61,11 @@ async def find_user_message(client: Client, chat_id: int, user_id: int, reply_to
                 continue
             if msg.from_user.id == user_id and msg.text:
                 if reply_to_message_id:
-                    if hasattr(msg, 'reply_to_message') and msg.reply_to_message and hasattr(msg.reply_to_message, 'message_id') and msg.reply_to_message.message_id == reply_to_message_id:
-                        logger.debug(f"Найден ответ message_id={getattr(msg, 'message_id', 'unknown')}")
+                    if msg.reply_to_message_id == reply_to_message_id:
+                        logger.debug(f"Найден ответ message_id={msg.id}")
                         return msg
                 else:
-                    logger.debug(f"Найдено последнее сообщение message_id={getattr(msg, 'message_id', 'unknown')}")
+                    logger.debug(f"Найдено последнее сообщение message_id={msg.id}")
                     return msg
         logger.debug("Сообщение не найдено")
         return None
@@ -80,7 +93,7 @@ async def conv_command(client: Client, message: Message):
             return
 
         # Проверяем наличие message_id у команды
-        command_message_id = getattr(message, 'message_id', None)
+        command_message_id = message.id
         if command_message_id is None:
             logger.warning(f"Команда не имеет message_id для user_id={user_id}, продолжаем без удаления")
             # Продолжаем обработку, но не будем пытаться удалить команду
@@ -89,13 +102,14 @@ async def conv_command(client: Client, message: Message):
         target_message = None
         if hasattr(message, 'reply_to_message') and message.reply_to_message:
             # Сценарий 2: Ответ на сообщение третьего лица
-            reply_to_message_id = getattr(message.reply_to_message, 'message_id', None)
+            reply_to_message_id = message.reply_to_message.id
             if reply_to_message_id is None:
                 await message.edit_text("❌ Реплай-сообщение не имеет ID")
                 logger.error(f"message.reply_to_message не имеет message_id для user_id={user_id}")
                 return
             logger.debug(f"Поиск ответа на message_id={reply_to_message_id}")
-            target_message = await find_user_message(client, chat_id, user_id, reply_to_message_id)
+            target_message = await find_user_message(client, chat_id, user_id, command_message_id,
+                                                     reply_to_message_id)
             if not target_message:
                 await message.edit_text("❌ Ваш ответ на сообщение не найден")
                 logger.error(f"Ответ user_id={user_id} на message_id={reply_to_message_id} не найден")
@@ -103,14 +117,14 @@ async def conv_command(client: Client, message: Message):
         else:
             # Сценарий 1: Собственное сообщение
             logger.debug(f"Поиск последнего сообщения user_id={user_id}")
-            target_message = await find_user_message(client, chat_id, user_id)
+            target_message = await find_user_message(client, chat_id, user_id, command_message_id)
             if not target_message:
                 await message.edit_text("❌ Ваше предыдущее сообщение не найдено")
                 logger.error(f"Предыдущее сообщение user_id={user_id} не найдено")
                 return
 
         # Проверяем, что target_message корректен
-        target_message_id = getattr(target_message, 'message_id', None)
+        target_message_id = target_message.id
         if not target_message or target_message_id is None:
             await message.edit_text("❌ Целевое сообщение недоступно или не имеет ID")
             logger.error(f"target_message некорректен или не имеет message_id для user_id={user_id}")
@@ -168,4 +182,4 @@ async def conv_command(client: Client, message: Message):
 
 def register(app: Client):
     """Регистрирует обработчик команды конв."""
-    app.on_message(template_filter("конв", ignore_case=True) & filters.me)(conv_command)
\ No newline at end of file
+    router.command("конв", conv_command)
\ No newline at end of file
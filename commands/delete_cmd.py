@@ -1,15 +1,127 @@
 import logging
-import re
 import asyncio
-from pyrogram import Client, filters
+from pyrogram import Client
+from pyrogram import errors as pyrogram_errors
 from pyrogram.types import Message
-from db.db_utils import get_edit_text, get_delete_cmd
-from utils.filters import delete_cmd_trigger_filter
+from typing import Dict, List, Optional, Set, Tuple
+from db.db_utils import (get_edit_text, get_delete_cmd, create_delete_job, update_delete_job,
+                         finish_delete_job, load_delete_jobs)
+from utils.filters import compile_delete_pattern
+from utils.router import router
+from utils.outbound import outbound, Priority, PERMANENT_SEND_ERRORS
+from utils.message_index import message_index
+from config import DELETE_EDIT_CONCURRENCY, DELETE_SKIP_UNCHANGED_EDITS, DELETE_JOB_MAX_ATTEMPTS
 
 # Настройка логирования
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Максимум сообщений в одном запросе удаления
+DELETE_CHUNK_SIZE = 100
+
+# Ошибки, с которыми задание удаления не выполнится и при повторе
+PERMANENT_DELETE_ERRORS = PERMANENT_SEND_ERRORS + (pyrogram_errors.MessageDeleteForbidden,)
+
+# Задания, продолженные после перезапуска
+_resumed_jobs: Set[asyncio.Task] = set()
+
+def _needs_edit(msg: Message, edit_text: str) -> bool:
+    current = msg.text or msg.caption
+    if msg.empty or current is None:
+        return False  # удалено, служебное или медиа без подписи — редактировать нечего
+    return not (DELETE_SKIP_UNCHANGED_EDITS and current == edit_text)
+
+async def _edit_before_delete(client: Client, chat_id: int, msg: Message, edit_text: str,
+                              semaphore: asyncio.Semaphore):
+    async with semaphore:
+        try:
+            edit = client.edit_message_text if msg.text is not None else client.edit_message_caption
+            await outbound.run("edit", chat_id, edit, chat_id, msg.id, edit_text, priority=Priority.BACKGROUND)
+        except Exception as e:
+            logger.error(f"Ошибка при редактировании сообщения {msg.id}: {e}")
+
+async def wipe_messages(client: Client, user_id: int, chat_id: int, message_ids: List[int],
+                        edit_text: Optional[str], known: Optional[Dict[int, Message]] = None,
+                        job_id: Optional[int] = None):
+    """Удаляет сообщения частями по DELETE_CHUNK_SIZE, при edit_text — сначала редактирует их.
+
+    Правки внутри части идут параллельно (не больше DELETE_EDIT_CONCURRENCY),
+    темп задаёт планировщик исходящих запросов. После каждой части остаток
+    записывается в БД, поэтому прерванное задание продолжается с того же места.
+    Задание, которое не выполнить и при повторе (нет прав, чат недоступен),
+    удаляется из БД, а ошибка передаётся вызывающему.
+    """
+    if job_id is None:
+        job_id = await create_delete_job(user_id, chat_id, edit_text, message_ids)
+    known = known or {}
+    semaphore = asyncio.Semaphore(DELETE_EDIT_CONCURRENCY)
+
+    remaining = list(message_ids)
+    while remaining:
+        chunk = remaining[:DELETE_CHUNK_SIZE]
+        try:
+            if edit_text is not None:
+                unknown = [message_id for message_id in chunk if message_id not in known]
+                if unknown:
+                    for msg in await client.get_messages(chat_id, unknown):
+                        known[msg.id] = msg
+                await asyncio.gather(*(
+                    _edit_before_delete(client, chat_id, known[message_id], edit_text, semaphore)
+                    for message_id in chunk
+                    if message_id in known and _needs_edit(known[message_id], edit_text)
+                ))
+            await outbound.run("delete", chat_id, client.delete_messages, chat_id, chunk)
+        except PERMANENT_DELETE_ERRORS:
+            if job_id is not None:
+                await finish_delete_job(job_id)
+            raise
+
+        remaining = remaining[len(chunk):]
+        if job_id is not None and remaining:
+            await update_delete_job(job_id, remaining)
+
+    if job_id is not None:
+        await finish_delete_job(job_id)
+
+async def find_my_messages(client: Client, chat_id: int, count: int,
+                           before_id: int) -> Tuple[List[int], Dict[int, Message]]:
+    """id последних count своих сообщений до before_id, новые первыми.
+
+    Берутся из индекса недавних сообщений; при промахе ищутся на сервере,
+    и тогда найденные сообщения возвращаются вторым значением.
+    """
+    message_ids = message_index.recent_from(chat_id, client.me.id, count, before_id)
+    if message_ids is not None:
+        return message_ids, {}
+    messages = [msg async for msg in client.search_messages(chat_id, from_user="me", limit=count)]
+    return [msg.id for msg in messages], {msg.id: msg for msg in messages}
+
+async def _resume_job(client: Client, job: dict):
+    if job['attempts'] > DELETE_JOB_MAX_ATTEMPTS:
+        logger.warning(f"Задание удаления в chat_id={job['chat_id']} не выполнено за "
+                       f"{DELETE_JOB_MAX_ATTEMPTS} попыток, {len(job['message_ids'])} сообщений оставлены")
+        await finish_delete_job(job['job_id'])
+        return
+    try:
+        await wipe_messages(client, job['user_id'], job['chat_id'], job['message_ids'], job['edit_text'],
+                            job_id=job['job_id'])
+        logger.info(f"Продолжено и завершено удаление {len(job['message_ids'])} сообщений в chat_id={job['chat_id']}")
+    except Exception as e:
+        logger.error(f"Ошибка при продолжении удаления в chat_id={job['chat_id']}: {e}")
+
+async def resume_delete_jobs(client: Client):
+    """Продолжает задания удаления, прерванные перезапуском."""
+    for job in await load_delete_jobs():
+        task = asyncio.create_task(_resume_job(client, job))
+        _resumed_jobs.add(task)
+        task.add_done_callback(_resumed_jobs.discard)
+
+async def stop_delete_jobs():
+    """Останавливает задания; остаток уже сохранён в БД."""
+    for task in list(_resumed_jobs):
+        task.cancel()
+    await asyncio.gather(*_resumed_jobs, return_exceptions=True)
+
 async def handle_delete_commands(client: Client, message: Message):
     try:
         cmd_text = message.text.strip().lower()  # Приводим к нижнему регистру
@@ -20,28 +132,11 @@ async def handle_delete_commands(client: Client, message: Message):
         edit_text = await get_edit_text(message.from_user.id)
         logger.info(f"Текущая команда удаления: {delete_cmd}")
         
-        # Определяем количество сообщений и тип команды
-        count = 1  # По умолчанию
-        is_edit = cmd_text.startswith(f"{delete_cmd}-")  # Проверяем, редактировать ли перед удалением
-        
-        if cmd_text == delete_cmd:
-            # Точное совпадение: удаляем 1 сообщение
-            pass
-        elif re.match(f"^{re.escape(delete_cmd)}\d+$", cmd_text):
-            # Формат `<delete_cmd><число>`
-            count = int(cmd_text[len(delete_cmd):])
-        elif re.match(f"^{re.escape(delete_cmd)}\s+(\d+)$", cmd_text):
-            # Формат `<delete_cmd> <число>`
-            count = int(re.match(f"^{re.escape(delete_cmd)}\s+(\d+)$", cmd_text).group(1))
-        elif cmd_text == f"{delete_cmd}-":
-            # Точное совпадение: редактируем и удаляем 1 сообщение
-            pass
-        elif re.match(f"^{re.escape(delete_cmd)}-\d+$", cmd_text):
-            # Формат `<delete_cmd>-<число>`
-            count = int(cmd_text[len(delete_cmd)+1:])
-        elif re.match(f"^{re.escape(delete_cmd)}-\s+(\d+)$", cmd_text):
-            # Формат `<delete_cmd>- <число>`
-            count = int(re.match(f"^{re.escape(delete_cmd)}-\s+(\d+)$", cmd_text).group(1))
+        # Определяем количество сообщений и тип команды по скомпилированному шаблону
+        match = compile_delete_pattern(delete_cmd).match(cmd_text)
+        if match:
+            is_edit = bool(match.group(1))  # `<delete_cmd>-`: редактировать перед удалением
+            count = int(match.group(2)) if match.group(2) else 1
         else:
             # Показываем пример с оригинальным регистром команды
             original_cmd = await get_delete_cmd(message.from_user.id)
@@ -54,49 +149,31 @@ async def handle_delete_commands(client: Client, message: Message):
 
         await message.delete()
         
+        message_ids, known = await find_my_messages(client, message.chat.id, count, message.id)
+
         if count == 1:
             # Обработка 1 сообщения
-            async for msg in client.search_messages(
-                chat_id=message.chat.id,
-                from_user="me",
-                limit=1
-            ):
+            for message_id in message_ids:
                 try:
                     if is_edit:
-                        await msg.edit(edit_text)
-                        await asyncio.sleep(0.3)
-                    await msg.delete()
+                        msg = known.get(message_id) or await client.get_messages(message.chat.id, message_id)
+                        if _needs_edit(msg, edit_text):
+                            await outbound.run("edit", message.chat.id, msg.edit, edit_text,
+                                               priority=Priority.INTERACTIVE)
+                    await outbound.run("delete", message.chat.id, client.delete_messages, message.chat.id, message_id,
+                                       priority=Priority.INTERACTIVE)
                     logger.info(f"{'Отредактировано и удалено' if is_edit else 'Удалено'} 1 сообщение для user_id={message.from_user.id}")
                 except Exception as e:
-                    logger.error(f"Ошибка при обработке сообщения {msg.id}: {e}")
+                    logger.error(f"Ошибка при обработке сообщения {message_id}: {e}")
         else:
             # Массовое удаление/редактирование
-            messages = []
-            async for msg in client.search_messages(
-                chat_id=message.chat.id,
-                from_user="me",
-                limit=count
-            ):
-                messages.append(msg)
-            
-            if messages:
-                if is_edit:
-                    # Сначала редактируем все сообщения
-                    for msg in messages:
-                        try:
-                            await client.edit_message_text(
-                                chat_id=message.chat.id,
-                                message_id=msg.id,
-                                text=edit_text
-                            )
-                            await asyncio.sleep(0.1)
-                        except Exception as e:
-                            logger.error(f"Ошибка при редактировании сообщения {msg.id}: {e}")
-                
-                # Затем удаляем все сообщения
-                message_ids = [msg.id for msg in messages]
-                await client.delete_messages(message.chat.id, message_ids)
-                logger.info(f"{'Массово отредактировано и удалено' if is_edit else 'Массово удалено'} {len(messages)} сообщений для user_id={message.from_user.id}")
+            if message_ids:
+                # Задание сохраняется в БД и продолжится после перезапуска
+                await wipe_messages(
+                    client, message.from_user.id, message.chat.id,
+                    message_ids, edit_text if is_edit else None, known
+                )
+                logger.info(f"{'Массово отредактировано и удалено' if is_edit else 'Массово удалено'} {len(message_ids)} сообщений для user_id={message.from_user.id}")
             else:
                 logger.warning(f"Нет сообщений для {'редактирования/удаления' if is_edit else 'удаления'}: user_id={message.from_user.id}")
 
@@ -107,4 +184,4 @@ async def handle_delete_commands(client: Client, message: Message):
         logger.error(f"Ошибка в handle_delete_commands: {e}")
 
 def register(app: Client):
-    app.on_message(filters.create(delete_cmd_trigger_filter))(handle_delete_commands)
\ No newline at end of file
+    router.delete_command(handle_delete_commands)
\ No newline at end of file
@@ -1,70 +1,24 @@
 import logging
-import os
-from PIL import Image, ImageDraw, ImageFont
-from pyrogram import Client, filters
-from pyrogram.types import Message
-from db.db_utils import get_user_prefix
-from utils.filters import template_filter
+from pyrogram import Client
+from pyrogram.types import InputMediaPhoto, Message, Photo
+from utils.router import router
+from utils.render_pool import render, as_upload
+from utils.renderers import render_demotivator
+from utils.render_cache import render_cache, reply_album_photos
 
 # Настройка логирования
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-async def create_demotivator(photo_path: str, text: str, output_path: str):
-    """Создаёт демотиватор с подписью."""
+async def make_demotivator(client: Client, photo: Photo, text: str):
+    """Скачивает фото в память и рисует демотиватор в пуле процессов."""
+    photo_file = await client.download_media(photo, in_memory=True)
     try:
-        # Открываем шаблон и фото
-        template = Image.open('resources/demotivator_template.jpg')
-        mem = Image.open(photo_path).convert('RGBA')
-
-        # Изменяем размер фото
-        width, height = 610, 569
-        resized_mem = mem.resize((width, height), Image.LANCZOS)
-
-        # Параметры подписи
-        strip_width, strip_height = 700, 1300
-        text_color = (255, 255, 255)  # Красный цвет
-
-        def find_len(text_len):
-            return len(text_len)
-
-        font_width = 60
-        if find_len(text) >= 25:
-            font_width = 50
-
-        draw = ImageDraw.Draw(template)
-
-        if '\n' in text:
-            split_offers = text.split('\n')[:2]  # Ограничиваем до 2 строк
-            for i in range(len(split_offers)):
-                if i == 1:
-                    strip_height += 110
-                    font_width -= 20
-                font = ImageFont.truetype("resources/fonts/arial.ttf", font_width)
-                # Используем textbbox вместо textsize
-                bbox = draw.textbbox((0, 0), split_offers[i], font=font)
-                text_width = bbox[2] - bbox[0]
-                text_height = bbox[3] - bbox[1]
-                position = ((strip_width - text_width) / 2, (strip_height - text_height) / 2)
-                draw.text(position, split_offers[i], fill=text_color, font=font)
-        else:
-            font = ImageFont.truetype("resources/fonts/arial.ttf", font_width)
-            # Используем textbbox вместо textsize
-            bbox = draw.textbbox((0, 0), text, font=font)
-            text_width = bbox[2] - bbox[0]
-            text_height = bbox[3] - bbox[1]
-            strip_height = 1330
-            position = ((strip_width - text_width) / 2, (strip_height - text_height) / 2)
-            draw.text(position, text, fill=text_color, font=font)
-
-        # Накладываем фото на шаблон
-        template.paste(resized_mem, (54, 32), resized_mem)
-        template.save(output_path, "JPEG")
-        logger.info(f"Демотиватор сохранён: {output_path}")
-        return True
+        result = await render(render_demotivator, photo_file.getvalue(), text)
     except Exception as e:
         logger.error(f"Ошибка при создании демотиватора: {e}")
-        return False
+        return None
+    return as_upload(result, "demotivator.jpg")
 
 async def demotivator_cmd(client: Client, message: Message):
     """Создаёт демотиватор с подписью под фотографией."""
@@ -76,6 +30,33 @@ async def demotivator_cmd(client: Client, message: Message):
             return
         text = parts[2].strip()
 
+        # Проверяем длину подписи
+        if len(text) > 100:
+            await message.edit("❌ Подпись не должна превышать 100 символов!")
+            return
+
+        user_id = message.from_user.id
+
+        # Ответ на альбом: демотиватор для каждого фото, одним сообщением
+        album = await reply_album_photos(client, message)
+        if len(album) > 1:
+            async def produce_item(index: int):
+                return await make_demotivator(client, album[index], text)
+
+            sent = await render_cache.send_album(
+                [render_cache.key("demotivator", photo.file_unique_id, text) for photo in album],
+                lambda media: client.send_media_group(
+                    message.chat.id, [InputMediaPhoto(item) for item in media]
+                ),
+                produce_item
+            )
+            if sent:
+                await message.delete()
+                logger.info(f"Альбом из {len(album)} демотиваторов отправлен для пользователя {user_id}")
+            else:
+                await message.edit("❌ Ошибка при создании демотиватора!")
+            return
+
         # Проверяем наличие фото
         photo = None
         if message.photo:
@@ -86,46 +67,22 @@ async def demotivator_cmd(client: Client, message: Message):
             await message.edit("❌ Прикрепите фото или ответьте на сообщение с фото!")
             return
 
-        # Проверяем длину подписи
-        if len(text) > 100:
-            await message.edit("❌ Подпись не должна превышать 100 символов!")
-            return
-
-        # Создаём директорию для сохранения
-        save_dir = "demotivators"
-        if not os.path.exists(save_dir):
-            os.makedirs(save_dir)
-
-        user_id = message.from_user.id
-        temp_photo_path = os.path.join(save_dir, f"temp_{user_id}_{message.id}.jpg")
-        output_path = os.path.join(save_dir, f"demotivator_{user_id}_{message.id}.jpg")
-
-        # Скачиваем фото
-        await client.download_media(photo, temp_photo_path)
-
-        # Создаём демотиватор
-        if await create_demotivator(temp_photo_path, text, output_path):
+        # Тот же демотиватор для того же фото отправляется по file_id без отрисовки
+        sent = await render_cache.send(
+            render_cache.key("demotivator", photo.file_unique_id, text),
+            lambda demotivator: client.send_photo(message.chat.id, demotivator),
+            lambda: make_demotivator(client, photo, text)
+        )
+        if sent:
             await message.delete()
-            await client.send_photo(message.chat.id, output_path)
             logger.info(f"Демотиватор отправлен для пользователя {user_id}")
         else:
             await message.edit("❌ Ошибка при создании демотиватора!")
 
-        # Очистка временных файлов
-        if os.path.exists(temp_photo_path):
-            os.remove(temp_photo_path)
-        if os.path.exists(output_path):
-            os.remove(output_path)
-
     except Exception as e:
         logger.error(f"Ошибка при выполнении команды демотиватор: {e}")
         await message.edit(f"⚠️ Ошибка: {str(e)}")
-        # Очистка в случае ошибки
-        if 'temp_photo_path' in locals() and os.path.exists(temp_photo_path):
-            os.remove(temp_photo_path)
-        if 'output_path' in locals() and os.path.exists(output_path):
-            os.remove(output_path)
 
 
 def register(app: Client):
-    app.on_message(template_filter("дем") & filters.me)(demotivator_cmd)
\ No newline at end of file
+    router.command("дем", demotivator_cmd)
\ No newline at end of file
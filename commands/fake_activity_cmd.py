@@ -1,40 +1,152 @@
-from pyrogram import Client, filters
+from pyrogram import Client
 from pyrogram.types import Message
 from pyrogram.enums import ChatAction
-from db.db_utils import add_fake_activity, remove_fake_activity, list_fake_activities
-from utils.filters import (
-    add_fake_voice_filter, remove_fake_voice_filter,
-    add_fake_typing_filter, remove_fake_typing_filter,
-    list_fake_voice_filter, list_fake_typing_filter
-)
+from db.db_utils import add_fake_activity, remove_fake_activity, list_fake_activities, load_all_fake_activities
+from utils.router import router
+from utils.outbound import outbound, Priority, PERMANENT_SEND_ERRORS
+from utils.peer_cache import peer_cache
 import asyncio
-from typing import Dict
+import logging
+import time
+from typing import Dict, List, Optional, Tuple
 
-# Глобальный словарь для хранения задач симуляции активности
-fake_activity_tasks: Dict[tuple, asyncio.Task] = {}
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
 
-async def simulate_activity(client: Client, chat_id: int, action: ChatAction):
-    """Циклически отправляет действие в чат, пока задача не будет отменена."""
-    try:
+# Telegram показывает действие в чате около 5 секунд, за это время его нужно обновить
+ACTIVITY_REFRESH_INTERVAL = 5
+
+# Виды фейковой активности и действия в чате, которые их изображают
+ACTIVITY_ACTIONS = {
+    "Голосовое сообщение": ChatAction.RECORD_AUDIO,
+    "Набор текста": ChatAction.TYPING,
+}
+
+ActivityKey = Tuple[int, int, str]
+
+class FakeActivityTicker:
+    """Единая задача, обновляющая все фейковые активности.
+
+    Вместо отдельной задачи на каждый чат одна задача раз в
+    ACTIVITY_REFRESH_INTERVAL секунд обходит все активности, распределяя
+    обновления равномерно по интервалу, чтобы запросы шли с постоянной
+    скоростью, а не пачками. Отправки идут через общий планировщик исходящих
+    запросов как фоновые и не задерживают обход: если предыдущее обновление
+    чата ещё ждёт (например, FloodWait), следующее для него пропускается.
+    Чаты, куда писать нельзя, убираются из списка и из БД; при старте
+    активности восстанавливаются из БД.
+    """
+
+    def __init__(self):
+        self._entries: Dict[ActivityKey, ChatAction] = {}
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._pending: Dict[ActivityKey, asyncio.Task] = {}
+        self._client: Optional[Client] = None
+
+    def __contains__(self, key: ActivityKey) -> bool:
+        return key in self._entries
+
+    def add(self, user_id: int, chat_id: int, activity_type: str):
+        self._entries[(user_id, chat_id, activity_type)] = ACTIVITY_ACTIONS[activity_type]
+        if self._wakeup:
+            self._wakeup.set()
+
+    def remove(self, user_id: int, chat_id: int, activity_type: str):
+        self._entries.pop((user_id, chat_id, activity_type), None)
+
+    async def start(self, client: Client):
+        """Запускает обновление активностей и восстанавливает их из БД."""
+        self._client = client
+        self._wakeup = asyncio.Event()
+        for row in await load_all_fake_activities():
+            if row['activity_type'] in ACTIVITY_ACTIONS:
+                self.add(row['user_id'], row['chat_id'], row['activity_type'])
+        self._task = asyncio.create_task(self._run())
+        logger.info(f"Фейковая активность запущена, восстановлено: {len(self._entries)}")
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        for task in list(self._pending.values()):
+            task.cancel()
+        await asyncio.gather(*self._pending.values(), return_exceptions=True)
+
+    def _fire(self, key: ActivityKey):
+        if key in self._pending:
+            return  # предыдущее обновление ещё ждёт очереди
+        task = asyncio.create_task(self.refresh(key))
+        self._pending[key] = task
+        task.add_done_callback(lambda _: self._pending.pop(key, None))
+
+    async def _run(self):
         while True:
-            await client.send_chat_action(chat_id, action)
-            await asyncio.sleep(5)  # Telegram требует обновления действия каждые 5 секунд
-    except asyncio.CancelledError:
-        pass  # Задача была отменена, завершаем цикл
-    except Exception as e:
-        print(f"Error in simulate_activity: {e}")
+            self._wakeup.clear()
+            if not self._entries:
+                await self._wakeup.wait()
+                continue
+
+            # Активности, добавленные во время обхода, попадут в следующий
+            cycle_start = time.monotonic()
+            keys = list(self._entries)
+            step = ACTIVITY_REFRESH_INTERVAL / len(keys)
+            for i, key in enumerate(keys):
+                delay = cycle_start + i * step - time.monotonic()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                if key in self._entries:
+                    self._fire(key)
+
+            delay = cycle_start + ACTIVITY_REFRESH_INTERVAL - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+
+    async def refresh(self, key: ActivityKey) -> bool:
+        """Отправляет действие в чат. False — в чат писать нельзя, активность удалена."""
+        user_id, chat_id, activity_type = key
+        action = self._entries.get(key)
+        if action is None:
+            return False
+        try:
+            await outbound.run("action", chat_id, self._client.send_chat_action, chat_id, action,
+                               priority=Priority.BACKGROUND)
+        except PERMANENT_SEND_ERRORS as e:
+            logger.warning(f"{activity_type} остановлена, chat_id={chat_id}: {str(e)}")
+            self.remove(user_id, chat_id, activity_type)
+            await remove_fake_activity(user_id, chat_id, activity_type)
+            return False
+        except Exception as e:
+            logger.error(f"Ошибка отправки действия в chat_id={chat_id}: {str(e)}")
+        return True
+
+ticker = FakeActivityTicker()
 
-async def start_fake_activity(client: Client, user_id: int, chat_id: int, activity_type: str, action: ChatAction, message: Message):
+async def start_fake_activity_ticker(client: Client):
+    await ticker.start(client)
+
+async def stop_fake_activity_ticker():
+    await ticker.stop()
+
+async def start_fake_activity(client: Client, user_id: int, chat_id: int, activity_type: str, message: Message):
     """Запускает симуляцию активности и сохраняет её в базе данных."""
     try:
-        if (user_id, chat_id, activity_type) in fake_activity_tasks:
+        key = (user_id, chat_id, activity_type)
+        if key in ticker:
             await message.edit(f"❌ {activity_type} уже активна в этом чате!")
             return
 
         if await add_fake_activity(user_id, chat_id, activity_type):
-            task = asyncio.create_task(simulate_activity(client, chat_id, action))
-            fake_activity_tasks[(user_id, chat_id, activity_type)] = task
-            await message.edit(f"✅ {activity_type} включена в этом чате!")
+            ticker.add(user_id, chat_id, activity_type)
+            # Первое обновление сразу, не дожидаясь очереди в обходе
+            if await ticker.refresh(key):
+                await message.edit(f"✅ {activity_type} включена в этом чате!")
+            else:
+                await message.edit(f"❌ {activity_type} недоступна в этом чате!")
         else:
             await message.edit(f"❌ Ошибка при включении {activity_type}!")
     except Exception as e:
@@ -43,25 +155,37 @@ async def start_fake_activity(client: Client, user_id: int, chat_id: int, activi
 async def stop_fake_activity(client: Client, user_id: int, chat_id: int, activity_type: str, message: Message):
     """Останавливает симуляцию активности и удаляет её из базы данных."""
     try:
-        key = (user_id, chat_id, activity_type)
-        if key not in fake_activity_tasks:
+        if (user_id, chat_id, activity_type) not in ticker:
             await message.edit(f"❌ {activity_type} не активна в этом чате!")
             return
 
         if await remove_fake_activity(user_id, chat_id, activity_type):
-            task = fake_activity_tasks.pop(key)
-            task.cancel()  # Отменяем задачу
+            ticker.remove(user_id, chat_id, activity_type)
             await message.edit(f"✅ {activity_type} отключена в этом чате!")
         else:
             await message.edit(f"❌ Ошибка при отключении {activity_type}!")
     except Exception as e:
         await message.edit(f"⚠️ Ошибка: {str(e)}")
 
+async def format_chat_list(client: Client, activities: List[Dict[str, int]]) -> str:
+    """Нумерованный список чатов; названия берутся одним пакетом через кэш чатов."""
+    chats = await peer_cache.get_many(client, [activity["chat_id"] for activity in activities])
+    chat_list = []
+    for i, activity in enumerate(activities, 1):
+        chat_id = activity["chat_id"]
+        chat = chats.get(chat_id)
+        if chat:
+            chat_name = chat.name or f"Чат {chat_id}"
+        else:
+            chat_name = f"Чат {chat_id} (недоступен)"
+        chat_list.append(f"{i}. {chat_name} (ID: {chat_id})")
+    return "\n".join(chat_list)
+
 async def add_fake_voice_cmd(client: Client, message: Message):
     """Включает симуляцию записи голосового сообщения."""
     user_id = message.from_user.id
     chat_id = message.chat.id
-    await start_fake_activity(client, user_id, chat_id, "Голосовое сообщение", ChatAction.RECORD_AUDIO, message)
+    await start_fake_activity(client, user_id, chat_id, "Голосовое сообщение", message)
 
 async def remove_fake_voice_cmd(client: Client, message: Message):
     """Отключает симуляцию записи голосового сообщения."""
@@ -73,7 +197,7 @@ async def add_fake_typing_cmd(client: Client, message: Message):
     """Включает симуляцию набора текста."""
     user_id = message.from_user.id
     chat_id = message.chat.id
-    await start_fake_activity(client, user_id, chat_id, "Набор текста", ChatAction.TYPING, message)
+    await start_fake_activity(client, user_id, chat_id, "Набор текста", message)
 
 async def remove_fake_typing_cmd(client: Client, message: Message):
     """Отключает симуляцию набора текста."""
@@ -89,16 +213,7 @@ async def list_fake_voice_cmd(client: Client, message: Message):
         if not activities:
             await message.edit("📂 Нет чатов с активной симуляцией голосового сообщения!")
         else:
-            chat_list = []
-            for i, activity in enumerate(activities, 1):
-                chat_id = activity["chat_id"]
-                try:
-                    chat = await client.get_chat(chat_id)
-                    chat_name = chat.title or chat.first_name or f"Чат {chat_id}"
-                except:
-                    chat_name = f"Чат {chat_id} (недоступен)"
-                chat_list.append(f"{i}. {chat_name} (ID: {chat_id})")
-            chat_text = "\n".join(chat_list)
+            chat_text = await format_chat_list(client, activities)
             await message.edit(f"📂 Чаты с активной симуляцией голосового сообщения:\n\n{chat_text}\n\nВсего: {len(activities)}")
     except Exception as e:
         await message.edit(f"⚠️ Ошибка: {str(e)}")
@@ -111,25 +226,16 @@ async def list_fake_typing_cmd(client: Client, message: Message):
         if not activities:
             await message.edit("📂 Нет чатов с активной симуляцией набора текста!")
         else:
-            chat_list = []
-            for i, activity in enumerate(activities, 1):
-                chat_id = activity["chat_id"]
-                try:
-                    chat = await client.get_chat(chat_id)
-                    chat_name = chat.title or chat.first_name or f"Чат {chat_id}"
-                except:
-                    chat_name = f"Чат {chat_id} (недоступен)"
-                chat_list.append(f"{i}. {chat_name} (ID: {chat_id})")
-            chat_text = "\n".join(chat_list)
+            chat_text = await format_chat_list(client, activities)
             await message.edit(f"📂 Чаты с активной симуляцией набора текста:\n\n{chat_text}\n\nВсего: {len(activities)}")
     except Exception as e:
         await message.edit(f"⚠️ Ошибка: {str(e)}")
 
 def register(app: Client):
     """Регистрирует обработчики команд для симуляции активности."""
-    app.on_message(filters.create(add_fake_voice_filter))(add_fake_voice_cmd)
-    app.on_message(filters.create(remove_fake_voice_filter))(remove_fake_voice_cmd)
-    app.on_message(filters.create(add_fake_typing_filter))(add_fake_typing_cmd)
-    app.on_message(filters.create(remove_fake_typing_filter))(remove_fake_typing_cmd)
-    app.on_message(filters.create(list_fake_voice_filter))(list_fake_voice_cmd)
-    app.on_message(filters.create(list_fake_typing_filter))(list_fake_typing_cmd)
\ No newline at end of file
+    router.command("+гсф", add_fake_voice_cmd, exact=True)
+    router.command("-гсф", remove_fake_voice_cmd, exact=True)
+    router.command("+смс", add_fake_typing_cmd, exact=True)
+    router.command("-смс", remove_fake_typing_cmd, exact=True)
+    router.command("гсф", list_fake_voice_cmd, exact=True)
+    router.command("смс", list_fake_typing_cmd, exact=True)
\ No newline at end of file
@@ -1,33 +1,33 @@
-from pyrogram import Client, filters
+from pyrogram import Client
 from pyrogram.types import Message
-from pyrogram.errors import FloodWait
-import asyncio
 import random
+from typing import List
+from utils.router import router
+from utils.text_animation import Frame, send_text_animation, play_by_edits
 
-async def hack_cmd(client: Client, message: Message):
+def hack_frames() -> List[Frame]:
+    frames = []
     perc = 0
     while perc < 100:
-        try:
-            await message.edit(f"👮‍ Взлом пентагона... {perc}%")
-            perc += random.randint(1, 3)
-            await asyncio.sleep(0.1)
-        except FloodWait as e:
-            await asyncio.sleep(e.x)
-    
-    await message.edit("🟢 Пентагон успешно взломан!")
-    await asyncio.sleep(3)
-    await message.edit("👽 Поиск секретных данных об НЛО...")
-    
+        frames.append((f"👮‍ Взлом пентагона... {perc}%", 0.1))
+        perc += random.randint(1, 3)
+
+    frames.append(("🟢 Пентагон успешно взломан!", 3))
+    frames.append(("👽 Поиск секретных данных об НЛО...", 0.5))
+
     perc = 0
     while perc < 100:
-        try:
-            await message.edit(f"👽 Поиск данных... {perc}%")
-            perc += random.randint(1, 5)
-            await asyncio.sleep(0.15)
-        except FloodWait as e:
-            await asyncio.sleep(e.x)
-    
-    await message.edit("🦖 Найдены данные о динозаврах на земле!")
+        frames.append((f"👽 Поиск данных... {perc}%", 0.15))
+        perc += random.randint(1, 5)
+
+    frames.append(("🦖 Найдены данные о динозаврах на земле!", 3))
+    return frames
+
+async def hack_cmd(client: Client, message: Message):
+    frames = hack_frames()
+    # Шаги прогресса случайные, поэтому анимация каждый раз новая и не кэшируется
+    if not await send_text_animation(client, message, None, frames):
+        await play_by_edits(message, frames)
 
 def register(app: Client):
-    app.on_message(filters.command("hack", prefixes=".") & filters.me)(hack_cmd)
\ No newline at end of file
+    router.dot_command("hack", hack_cmd)
@@ -1,5 +1,6 @@
-from pyrogram import Client, filters
+from pyrogram import Client
 from pyrogram.types import Message
+from utils.router import router
 
 async def help_cmd(client: Client, message: Message):
     """Выводит список всех доступных команд с описаниями, разделённый по категориям."""
@@ -70,5 +71,5 @@ async def help_cmd(client: Client, message: Message):
         await message.edit(f"⚠️ Ошибка: {str(e)}")
 
 def register(app: Client):
-    app.on_message(filters.command("help", prefixes=".") & filters.me)(help_cmd)
-    app.on_message(filters.command("помощь", prefixes=".") & filters.me)(help_cmd)
\ No newline at end of file
+    router.dot_command("help", help_cmd)
+    router.dot_command("помощь", help_cmd)
\ No newline at end of file
@@ -1,10 +1,11 @@
 import logging
 import re
-from pyrogram import Client, filters
+from pyrogram import Client
 from pyrogram.types import Message
 from pyrogram.errors import UserNotParticipant, UsernameNotOccupied, UsernameInvalid
 from db.db_utils import get_user_prefix
-from utils.filters import template_filter
+from utils.router import router
+from utils.peer_cache import peer_cache
 
 # Настройка логирования
 logging.basicConfig(level=logging.DEBUG)
@@ -58,7 +59,7 @@ async def id_command(client: Client, message: Message):
                 logger.error(f"Неверный формат тега: {username}")
                 return
             try:
-                user = await client.get_users(username)
+                user = await peer_cache.resolve_username(client, username)
                 response = (
                     f"🆔 **ID пользователя**: `{user.id}`\n"
                     f"🔗 **Username**: @{user.username}\n"
@@ -99,4 +100,4 @@ async def id_command(client: Client, message: Message):
 
 def register(app: Client):
     """Регистрирует обработчик команды ид."""
-    app.on_message(template_filter("ид", ignore_case=True) & filters.me)(id_command)
\ No newline at end of file
+    router.command("ид", id_command)
\ No newline at end of file
@@ -1,13 +1,19 @@
 import logging
 import asyncio
-import re
-from typing import Dict, List
-from pyrogram import Client, filters
+import heapq
+import itertools
+import math
+import time
+from datetime import datetime
+from typing import Dict, List, Optional, Set, Tuple
+from pyrogram import Client
 from pyrogram.types import Message
-from pyrogram.handlers import MessageHandler
 from pyrogram import errors as pyrogram_errors
-from db.db_utils import get_user_prefix, save_interval, count_intervals, list_intervals, delete_interval
-from utils.filters import simple_cmd_filter
+from db.db_utils import (get_user_prefix, save_interval, count_intervals, list_intervals,
+                         delete_interval, load_all_intervals)
+from utils.router import router
+from utils.outbound import outbound, Priority, PERMANENT_SEND_ERRORS
+from utils.peer_cache import peer_cache
 
 # Настройка логирования
 logging.basicConfig(
@@ -16,36 +22,144 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-# Словарь для хранения активных задач интервалов
-active_intervals: Dict[str, asyncio.Task] = {}
+class IntervalEntry:
+    """Интервал в расписании. Отправки идут в моменты started_at + k * период."""
 
-async def interval_task(client: Client, user_id: int, interval_name: str, 
-                       chat_id: int, interval_text: str, interval_minutes: int):
-    """Фоновая задача для отправки сообщений по интервалу"""
-    try:
-        while True:
+    def __init__(self, user_id: int, interval_name: str, chat_id: int,
+                 interval_minutes: int, interval_text: str, started_at: float):
+        self.key = f"{user_id}:{interval_name}"
+        self.user_id = user_id
+        self.interval_name = interval_name
+        self.chat_id = chat_id
+        self.period = interval_minutes * 60
+        self.interval_text = interval_text
+        self.started_at = started_at
+        self.next_run = started_at
+
+    def next_slot(self, after: float) -> float:
+        """Первый момент расписания строго позже after."""
+        if after < self.started_at:
+            return self.started_at
+        return self.started_at + (math.floor((after - self.started_at) / self.period) + 1) * self.period
+
+class IntervalScheduler:
+    """Единый планировщик интервалов на мин-куче времён следующей отправки.
+
+    Вместо отдельной задачи на каждый интервал одна задача спит до ближайшего
+    срока. Время считается от сохранённой в БД точки отсчёта, поэтому задержка
+    отправки не накапливается, а после перезапуска расписание продолжается.
+    Отправки идут через общий планировщик исходящих запросов как фоновые;
+    FloodWait, который он не выждал сам, откладывает только этот интервал.
+    """
+
+    def __init__(self):
+        self._heap: List[Tuple[float, int, IntervalEntry]] = []
+        self._entries: Dict[str, IntervalEntry] = {}
+        self._counter = itertools.count()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._firing: Set[asyncio.Task] = set()
+        self._client: Optional[Client] = None
+
+    def _push(self, entry: IntervalEntry, when: float):
+        entry.next_run = when
+        heapq.heappush(self._heap, (when, next(self._counter), entry))
+        if self._wakeup:
+            self._wakeup.set()
+
+    def _is_active(self, entry: IntervalEntry) -> bool:
+        return self._entries.get(entry.key) is entry
+
+    def add(self, user_id: int, interval_name: str, chat_id: int, interval_minutes: int,
+            interval_text: str, started_at: float, fire_now: bool = False):
+        """Добавляет интервал. fire_now — первая отправка сразу, иначе по ближайшему сроку."""
+        entry = IntervalEntry(user_id, interval_name, chat_id, interval_minutes, interval_text, started_at)
+        self._entries[entry.key] = entry
+        self._push(entry, started_at if fire_now else entry.next_slot(time.time()))
+
+    def remove(self, user_id: int, interval_name: str):
+        """Убирает интервал из расписания. Запись в куче отбрасывается при извлечении."""
+        self._entries.pop(f"{user_id}:{interval_name}", None)
+
+    def next_run(self, user_id: int, interval_name: str) -> Optional[float]:
+        entry = self._entries.get(f"{user_id}:{interval_name}")
+        return entry.next_run if entry else None
+
+    async def start(self, client: Client):
+        """Запускает планировщик и восстанавливает интервалы из БД."""
+        self._client = client
+        self._wakeup = asyncio.Event()
+        for row in await load_all_intervals():
+            self.add(row['user_id'], row['interval_name'], row['chat_id'],
+                     row['interval_minutes'], row['interval_text'], row['started_at'])
+        self._task = asyncio.create_task(self._run())
+        logger.info(f"Планировщик интервалов запущен, восстановлено интервалов: {len(self._entries)}")
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
             try:
-                await client.send_message(chat_id, interval_text)
-                logger.info(f"Отправлено интервальное сообщение '{interval_name}' в chat_id={chat_id}")
-            except pyrogram_errors.ChatWriteForbidden:
-                logger.warning(f"Нет прав для отправки в chat_id={chat_id}")
-                break
-            except pyrogram_errors.ChatNotFound:
-                logger.warning(f"Чат {chat_id} не найден")
-                break
-            except Exception as e:
-                logger.error(f"Ошибка отправки в chat_id={chat_id}: {str(e)}")
-                # Продолжаем попытки, если это не фатальная ошибка
-                if isinstance(e, (pyrogram_errors.ChatWriteForbidden, 
-                                pyrogram_errors.ChatNotFound)):
-                    break
-            
-            await asyncio.sleep(interval_minutes * 60)
-            
-    except asyncio.CancelledError:
-        logger.info(f"Интервал '{interval_name}' отменен")
-    except Exception as e:
-        logger.error(f"Критическая ошибка в интервале '{interval_name}': {str(e)}")
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        for task in list(self._firing):
+            task.cancel()
+        await asyncio.gather(*self._firing, return_exceptions=True)
+
+    async def _run(self):
+        while True:
+            self._wakeup.clear()
+            if not self._heap:
+                await self._wakeup.wait()
+                continue
+
+            when, _, entry = self._heap[0]
+            delay = when - time.time()
+            if delay > 0:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            heapq.heappop(self._heap)
+            if not self._is_active(entry) or entry.next_run != when:
+                continue
+            task = asyncio.create_task(self._fire(entry))
+            self._firing.add(task)
+            task.add_done_callback(self._firing.discard)
+
+    async def _fire(self, entry: IntervalEntry):
+        try:
+            await outbound.run("send", entry.chat_id, self._client.send_message, entry.chat_id,
+                               entry.interval_text, priority=Priority.BACKGROUND)
+            logger.info(f"Отправлено интервальное сообщение '{entry.interval_name}' в chat_id={entry.chat_id}")
+        except pyrogram_errors.FloodWait as e:
+            logger.warning(f"FloodWait {e.value} сек для интервала '{entry.interval_name}'")
+            if self._is_active(entry):
+                self._push(entry, time.time() + e.value)
+            return
+        except PERMANENT_SEND_ERRORS as e:
+            logger.warning(f"Интервал '{entry.interval_name}' остановлен, chat_id={entry.chat_id}: {str(e)}")
+            # Интервал с тем же именем мог быть пересоздан, пока шла отправка: его не трогаем
+            if self._is_active(entry):
+                self.remove(entry.user_id, entry.interval_name)
+                await delete_interval(entry.user_id, entry.interval_name)
+            return
+        except Exception as e:
+            logger.error(f"Ошибка отправки в chat_id={entry.chat_id}: {str(e)}")
+
+        if self._is_active(entry):
+            self._push(entry, entry.next_slot(time.time()))
+
+scheduler = IntervalScheduler()
+
+async def start_interval_scheduler(client: Client):
+    await scheduler.start(client)
+
+async def stop_interval_scheduler():
+    await scheduler.stop()
 
 async def add_interval_command(client: Client, message: Message):
     """Обработчик команды добавления интервала"""
@@ -87,18 +201,13 @@ async def add_interval_command(client: Client, message: Message):
             return
 
         # Сохраняем в БД
-        if not await save_interval(user_id, interval_name, chat_id, interval_minutes, interval_text):
+        started_at = time.time()
+        if not await save_interval(user_id, interval_name, chat_id, interval_minutes, interval_text, started_at):
             await message.edit("❌ Ошибка сохранения (возможно, имя занято)")
             return
 
-        # Запускаем задачу
-        task_key = f"{user_id}:{interval_name}"
-        if task_key in active_intervals:
-            active_intervals[task_key].cancel()
-            
-        active_intervals[task_key] = asyncio.create_task(
-            interval_task(client, user_id, interval_name, chat_id, interval_text, interval_minutes)
-        )
+        # Ставим в расписание, первая отправка сразу
+        scheduler.add(user_id, interval_name, chat_id, interval_minutes, interval_text, started_at, fire_now=True)
 
         await message.edit(f"✅ Интервал '{interval_name}' создан (каждые {interval_minutes} мин)")
         logger.info(f"Создан интервал '{interval_name}' для user_id={user_id}")
@@ -117,17 +226,24 @@ async def list_intervals_command(client: Client, message: Message):
             await message.edit("📋 Нет активных интервалов")
             return
 
+        # Сведения о всех чатах списка — одним пакетом (или из кэша)
+        chats = await peer_cache.get_many(client, [interval['chat_id'] for interval in intervals])
+
         response = ["📋 Ваши интервалы:"]
         for i, interval in enumerate(intervals, 1):
-            try:
-                chat = await client.get_chat(interval['chat_id'])
+            chat = chats.get(interval['chat_id'])
+            if chat:
                 chat_info = chat.title or f"ID: {interval['chat_id']}"
-            except:
+            else:
                 chat_info = f"ID: {interval['chat_id']} (недоступен)"
-                
+
+            next_run = scheduler.next_run(user_id, interval['interval_name'])
+            next_info = datetime.fromtimestamp(next_run).strftime('%d.%m %H:%M:%S') if next_run else "остановлен"
+
             response.append(
                 f"{i}. {interval['interval_name']} - каждые {interval['interval_minutes']} мин\n"
                 f"   Чат: {chat_info}\n"
+                f"   Следующая отправка: {next_info}\n"
                 f"   Текст: {interval['interval_text'][:50]}..."
             )
 
@@ -155,11 +271,8 @@ async def delete_interval_command(client: Client, message: Message):
             await message.edit(f"❌ Интервал '{interval_name}' не найден")
             return
 
-        # Останавливаем задачу
-        task_key = f"{user_id}:{interval_name}"
-        if task_key in active_intervals:
-            active_intervals[task_key].cancel()
-            del active_intervals[task_key]
+        # Убираем из расписания
+        scheduler.remove(user_id, interval_name)
 
         await message.edit(f"✅ Интервал '{interval_name}' удален")
         logger.info(f"Удален интервал '{interval_name}' для user_id={user_id}")
@@ -170,6 +283,6 @@ async def delete_interval_command(client: Client, message: Message):
 
 def register(app: Client):
     """Регистрация обработчиков команд"""
-    app.on_message(simple_cmd_filter("+интервал", ignore_case=True) & filters.me)(add_interval_command)
-    app.on_message(simple_cmd_filter("интервалы", ignore_case=True) & filters.me)(list_intervals_command)
-    app.on_message(simple_cmd_filter("-интервал", ignore_case=True) & filters.me)(delete_interval_command)
\ No newline at end of file
+    router.command("+интервал", add_interval_command)
+    router.command("интервалы", list_intervals_command)
+    router.command("-интервал", delete_interval_command)
\ No newline at end of file
@@ -1,10 +1,10 @@
 import logging
 import ipaddress
-import aiohttp
-from pyrogram import Client, filters
+from pyrogram import Client
 from pyrogram.types import Message
 from db.db_utils import get_user_prefix
-from utils.filters import template_filter
+from utils.router import router
+from utils.response_cache import cached_json
 
 # Настройка логирования
 logging.basicConfig(level=logging.DEBUG)
@@ -49,22 +49,20 @@ async def ip_command(client: Client, message: Message):
             return
 
         # Запрос к ipinfo.io без API-ключа
-        async with aiohttp.ClientSession() as session:
-            url = IPINFO_URL.format(ip=ip_address)
-            async with session.get(url) as resp:
-                if resp.status == 404:
-                    await message.edit_text("❌ Данные для этого IP-адреса недоступны")
-                    logger.error(f"Данные для IP {ip_address} не найдены (404)")
-                    return
-                if resp.status == 429:
-                    await message.edit_text("❌ Превышен лимит запросов к ipinfo.io")
-                    logger.error(f"Превышен лимит запросов для IP {ip_address} (429)")
-                    return
-                if resp.status != 200:
-                    await message.edit_text("❌ Ошибка при получении данных")
-                    logger.error(f"Ошибка ipinfo.io API для IP {ip_address}: {resp.status}")
-                    return
-                data = await resp.json()
+        url = IPINFO_URL.format(ip=ip_address)
+        status, data = await cached_json("ip", ip_address, "GET", url)
+        if status == 404:
+            await message.edit_text("❌ Данные для этого IP-адреса недоступны")
+            logger.error(f"Данные для IP {ip_address} не найдены (404)")
+            return
+        if status == 429:
+            await message.edit_text("❌ Превышен лимит запросов к ipinfo.io")
+            logger.error(f"Превышен лимит запросов для IP {ip_address} (429)")
+            return
+        if status != 200:
+            await message.edit_text("❌ Ошибка при получении данных")
+            logger.error(f"Ошибка ipinfo.io API для IP {ip_address}: {status}")
+            return
 
         # Форматируем ответ
         ip = data.get("ip", "Неизвестно")
@@ -100,4 +98,4 @@ async def ip_command(client: Client, message: Message):
             logger.error(f"Не удалось отредактировать сообщение: {edit_e}")
 
 def register(app: Client):
-    app.on_message(template_filter("ip", ignore_case=True) & filters.me)(ip_command)
\ No newline at end of file
+    router.command("ip", ip_command)
\ No newline at end of file
@@ -1,28 +1,17 @@
-from pyrogram import Client, filters
+from pyrogram import Client
 from pyrogram.types import Message
 from pyrogram.enums import ChatType
-from pyrogram.errors import FloodWait
-import asyncio
 import logging
+from utils.router import router
+from utils.outbound import outbound, Priority
 
 # Настройка логирования
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Фильтр для команды .мегапуш
-def megapush_filter(_: Client, __: any, message: Message):
-    try:
-        return (
-            message.text is not None and
-            message.text.startswith('.мегапуш') and
-            message.chat is not None and
-            message.chat.type in (ChatType.SUPERGROUP, ChatType.GROUP) and
-            message.from_user and
-            message.from_user.is_self
-        )
-    except Exception as e:
-        logger.error(f"Ошибка в megapush_filter: {str(e)}, сообщение: {message.text}")
-        return False
+# Условие для команды .мегапуш
+def is_group_chat(message: Message) -> bool:
+    return message.chat is not None and message.chat.type in (ChatType.SUPERGROUP, ChatType.GROUP)
 
 async def megapush_cmd(client: Client, message: Message):
     """Редактирует сообщение, добавляя push-теги всех участников чата."""
@@ -51,10 +40,7 @@ async def megapush_cmd(client: Client, message: Message):
         # Формируем текст с push-тегами
         push_text = " ".join(usernames)
         try:
-            await message.edit(push_text)
-        except FloodWait as e:
-            await asyncio.sleep(e.value)
-            await message.edit(push_text)
+            await outbound.run("edit", message.chat.id, message.edit, push_text, priority=Priority.INTERACTIVE)
         except Exception as e:
             await message.edit(f"⚠️ Ошибка при редактировании: {str(e)}")
 
@@ -64,4 +50,4 @@ async def megapush_cmd(client: Client, message: Message):
 
 def register(app: Client):
     """Регистрирует обработчик команды .мегапуш."""
-    app.on_message(filters.create(megapush_filter))(megapush_cmd)
\ No newline at end of file
+    router.dot_command("мегапуш", megapush_cmd, check=is_group_chat)
\ No newline at end of file
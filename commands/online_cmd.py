@@ -1,7 +1,8 @@
-from pyrogram import Client, filters
+from pyrogram import Client
 from pyrogram.types import Message
 import asyncio
 import logging
+from utils.router import router
 
 # Настройка логирования
 logging.basicConfig(level=logging.INFO)
@@ -68,6 +69,6 @@ async def check_online(client: Client, message: Message):
 
 def register(app: Client):
     """Регистрирует обработчики команд для вечного онлайна."""
-    app.on_message(filters.create(lambda _, __, m: m.text and m.text.startswith('.+онлайн') and m.from_user and m.from_user.is_self))(enable_online)
-    app.on_message(filters.create(lambda _, __, m: m.text and m.text.startswith('.-онлайн') and m.from_user and m.from_user.is_self))(disable_online)
-    app.on_message(filters.create(lambda _, __, m: m.text and m.text.startswith('.онлайн') and m.from_user and m.from_user.is_self))(check_online)
\ No newline at end of file
+    router.dot_command("+онлайн", enable_online)
+    router.dot_command("-онлайн", disable_online)
+    router.dot_command("онлайн", check_online)
\ No newline at end of file
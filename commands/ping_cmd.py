@@ -1,10 +1,18 @@
 import logging
 import time
-import asyncio
 from datetime import datetime
-from pyrogram import Client, filters
+from pyrogram import Client
 from pyrogram.types import Message
-from utils.filters import simple_cmd_filter
+from utils.router import router
+from db.pool import get_pool_stats
+from db.user_state import user_state
+from utils.file_id_cache import file_id_cache
+from utils.media_pool import media_pool
+from utils.render_pool import render_pool
+from utils.response_cache import response_cache
+from utils.avatar_cache import avatar_cache
+from utils.outbound import outbound
+from utils.message_index import message_index
 
 # Настройка логирования
 logging.basicConfig(
@@ -35,12 +43,41 @@ async def ping_command(client: Client, message: Message):
         # Время обработки командой
         processing_time = (time.time() - start_time) * 1000  # в мс
         
+        # Состояние пула соединений БД
+        pool_stats = get_pool_stats()
+        state_stats = user_state.stats()
+        media_stats = media_pool.stats()
+        render_stats = render_pool.stats()
+        api_stats = response_cache.stats()
+        outbound_stats = outbound.stats()
+        index_stats = message_index.stats()
+        throttled = ", ".join(outbound_stats['throttled'])
+        throttled_note = f" (снижена скорость: {throttled})" if throttled else ""
+
         # Формируем ответ
         response = (
             "📊 Результаты ping:\n\n"
             f"• Задержка Telegram: {server_delay:.2f} мс\n"
             f"• Время ответа API: {api_time:.2f} мс\n"
-            f"• Время обработки: {processing_time:.2f} мс\n\n"
+            f"• Время обработки: {processing_time:.2f} мс\n"
+            f"• Пул БД: {pool_stats['in_use']}/{pool_stats['open']} занято (макс. {pool_stats['max_size']}), "
+            f"ожидают: {pool_stats['waiters']}, ожидание ср./макс.: "
+            f"{pool_stats['avg_wait_ms']:.2f}/{pool_stats['max_wait_ms']:.2f} мс\n"
+            f"• Кэш настроек: {state_stats['hits']} попаданий, {state_stats['misses']} промахов "
+            f"({state_stats['hit_rate'] * 100:.1f}%)\n"
+            f"• Кэш file_id: {file_id_cache.hits} без загрузки, {file_id_cache.misses} с загрузкой\n"
+            f"• Обработка медиа: {media_stats['running']}/{media_stats['workers']} занято, "
+            f"в очереди: {media_stats['queued']}\n"
+            f"• Отрисовка: {render_stats['running']} выполняется, {render_stats['workers']} процессов, "
+            f"готово: {render_stats['completed']}\n"
+            f"• Исходящие запросы: {outbound_stats['calls']}, FloodWait: {outbound_stats['flood_waits']}, "
+            f"пропущено кадров: {outbound_stats['coalesced']}, ожидание: {outbound_stats['waited']:.1f} с{throttled_note}\n"
+            f"• Индекс сообщений: {index_stats['messages']} в {index_stats['chats']} чатах, "
+            f"{index_stats['hits']} найдено, {index_stats['misses']} запросов к серверу, "
+            f"{index_stats['resets']} сбросов\n"
+            f"• Кэш аватарок: {avatar_cache.hits} без загрузки, {avatar_cache.misses} с загрузкой\n"
+            f"• Кэш API: {api_stats['hits']} в памяти, {api_stats['persistent_hits']} из БД, "
+            f"{api_stats['misses']} промахов ({api_stats['hit_rate'] * 100:.1f}%)\n\n"
             f"⏱ Общее время выполнения: {(time.time() - start_time) * 1000:.2f} мс"
         )
         
@@ -52,4 +89,4 @@ async def ping_command(client: Client, message: Message):
         await message.edit("⚠️ Ошибка при проверке ping")
 
 def register(app: Client):
-    app.on_message(simple_cmd_filter("пинг", ignore_case=True) & filters.me)(ping_command)
\ No newline at end of file
+    router.command("пинг", ping_command)
\ No newline at end of file
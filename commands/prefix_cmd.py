@@ -1,7 +1,8 @@
 import logging
-from pyrogram import Client, filters
+from pyrogram import Client
 from pyrogram.types import Message
 from db.db_utils import set_user_prefix
+from utils.router import router
 
 # Настройка логирования
 logging.basicConfig(level=logging.INFO)
@@ -34,5 +35,5 @@ async def set_prefix_cmd(client: Client, message: Message):
         await message.edit(f"⚠️ Ошибка: {str(e)}")
 
 def register(app: Client):
-    app.on_message(filters.command("префикс", prefixes=".") & filters.me)(set_prefix_cmd)
-    app.on_message(filters.command("преф", prefixes=".") & filters.me)(set_prefix_cmd)
\ No newline at end of file
+    router.dot_command("префикс", set_prefix_cmd)
+    router.dot_command("преф", set_prefix_cmd)
\ No newline at end of file
@@ -1,8 +1,9 @@
 import logging
-from pyrogram import Client, filters
+from pyrogram import Client
 from pyrogram.types import Message
 from db.db_utils import get_user_prefix, list_video_notes, list_voice_messages, list_templates, get_edit_text, get_delete_cmd
 from pyrogram.enums import ParseMode
+from utils.router import router
 
 # Настройка логирования
 logging.basicConfig(level=logging.INFO)
@@ -36,4 +37,4 @@ async def profile_cmd(client: Client, message: Message):
         await message.edit(f"⚠️ Ошибка: {str(e)}")
 
 def register(app: Client):
-    app.on_message(filters.command("профиль", prefixes=".") & filters.me)(profile_cmd)
\ No newline at end of file
+    router.dot_command("профиль", profile_cmd)
\ No newline at end of file
@@ -1,9 +1,8 @@
 import logging
-import asyncio
-from pyrogram import Client, filters
+from pyrogram import Client
 from pyrogram.types import Message
 from db.db_utils import get_user_prefix, get_edit_text, set_edit_text
-from utils.filters import simple_cmd_filter
+from utils.router import router
 
 # Настройка логирования
 logging.basicConfig(level=logging.INFO)
@@ -47,4 +46,4 @@ async def set_edit_text_cmd(client: Client, message: Message):
         logger.error(f"Ошибка в set_edit_text_cmd: {e}")
 
 def register(app: Client):
-    app.on_message(simple_cmd_filter("редач", ignore_case=True) & filters.me)(set_edit_text_cmd)
\ No newline at end of file
+    router.command("редач", set_edit_text_cmd)
\ No newline at end of file
@@ -1,13 +1,13 @@
 import pyrogram
-from pyrogram import Client, filters
+from pyrogram import Client
 from pyrogram.types import Message
 from pyrogram.raw.functions.messages import SendScreenshotNotification
 from pyrogram.raw.types import InputPeerUser
 from pyrogram.enums import ChatType
-from utils.filters import simple_cmd_filter
+from utils.router import router
+from utils.outbound import outbound
 import logging
 import time
-import asyncio
 
 # Настройка логирования
 logging.basicConfig(level=logging.INFO)
@@ -68,18 +68,12 @@ async def send_screenshot_cmd(client: Client, message: Message):
             random_id = int(time.time() * 1000) + i
             logger.info(f"Отправка уведомления {i+1}/{count}: peer={peer}, reply_to_msg_id={reply_to_msg_id}, random_id={random_id}")
 
-            # Отправляем уведомление о скриншоте
-            await client.invoke(
-                SendScreenshotNotification(
-                    peer=peer,
-                    reply_to_msg_id=reply_to_msg_id,
-                    random_id=random_id
-                )
-            )
-
-            # Задержка 0.5 секунды между уведомлениями (избегаем FloodWait)
-            if i < count - 1:
-                await asyncio.sleep(0.5)
+            # Отправляем уведомление о скриншоте; темп задаёт планировщик исходящих запросов
+            await outbound.run("send", chat_id, client.invoke, SendScreenshotNotification(
+                peer=peer,
+                reply_to_msg_id=reply_to_msg_id,
+                random_id=random_id
+            ))
 
         # Удаляем сообщение команды
         try:
@@ -89,7 +83,7 @@ async def send_screenshot_cmd(client: Client, message: Message):
             pass  # Игнорируем, если нет прав
 
     except pyrogram.errors.FloodWait as e:
-        logger.error(f"FloodWait: ждать {e.x} секунд, user_id={user_id}")
+        logger.error(f"FloodWait: ждать {e.value} секунд, user_id={user_id}")
         try:
             await message.delete()
         except pyrogram.errors.Forbidden:
@@ -108,4 +102,4 @@ async def send_screenshot_cmd(client: Client, message: Message):
             pass
 
 def register(app: Client):
-    app.on_message(simple_cmd_filter("скрин", ignore_case=True) & filters.me)(send_screenshot_cmd)
\ No newline at end of file
+    router.command("скрин", send_screenshot_cmd)
\ No newline at end of file
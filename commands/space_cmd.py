@@ -1,11 +1,11 @@
 import logging
 import re
 from datetime import datetime
-import aiohttp
-from pyrogram import Client, filters
+from pyrogram import Client
 from pyrogram.types import Message
 from db.db_utils import get_user_prefix
-from utils.filters import template_filter
+from utils.router import router
+from utils.response_cache import cached_json
 from config import NASA_API_KEY
 
 # Настройка логирования
@@ -46,6 +46,7 @@ async def space_command(client: Client, message: Message):
 
         # Параметры запроса
         params = {"api_key": NASA_API_KEY}
+        past_date = False  # Фото за прошедшую дату уже не изменится
         if date_str:
             # Проверяем формат даты (YYYY-MM-DD)
             if not re.match(r"^\d{4}-\d{2}-\d{2}$", date_str):
@@ -58,26 +59,25 @@ async def space_command(client: Client, message: Message):
                     await message.edit_text("❌ Дата не может быть в будущем")
                     return
                 params["date"] = date_str
+                past_date = target_date.date() < now.date()
             except ValueError:
                 await message.edit_text("❌ Неверная дата")
                 return
 
         # Запрос к NASA API
-        async with aiohttp.ClientSession() as session:
-            async with session.get(NASA_APOD_URL, params=params) as resp:
-                if resp.status == 401:
-                    await message.edit_text("❌ Неверный или неактивный API-ключ NASA")
-                    logger.error("Ошибка NASA API: Неверный ключ (401)")
-                    return
-                if resp.status == 404:
-                    await message.edit_text("❌ Данные за эту дату недоступны")
-                    logger.error(f"Данные APOD за {date_str or 'сегодня'} не найдены (404)")
-                    return
-                if resp.status != 200:
-                    await message.edit_text("❌ Ошибка при получении данных")
-                    logger.error(f"Ошибка NASA API: {resp.status}")
-                    return
-                data = await resp.json()
+        status, data = await cached_json("apod", date_str or "today", "GET", NASA_APOD_URL, forever=past_date, params=params)
+        if status == 401:
+            await message.edit_text("❌ Неверный или неактивный API-ключ NASA")
+            logger.error("Ошибка NASA API: Неверный ключ (401)")
+            return
+        if status == 404:
+            await message.edit_text("❌ Данные за эту дату недоступны")
+            logger.error(f"Данные APOD за {date_str or 'сегодня'} не найдены (404)")
+            return
+        if status != 200:
+            await message.edit_text("❌ Ошибка при получении данных")
+            logger.error(f"Ошибка NASA API: {status}")
+            return
 
         # Форматируем ответ
         title = data.get("title", "Без заголовка")
@@ -110,4 +110,4 @@ async def space_command(client: Client, message: Message):
 
 def register(app: Client):
     """Регистрирует обработчик команды космос."""
-    app.on_message(template_filter("космос", ignore_case=True) & filters.me)(space_command)
\ No newline at end of file
+    router.command("космос", space_command)
\ No newline at end of file
@@ -5,7 +5,8 @@ from pyrogram import Client, filters
 from pyrogram.types import Message
 from pyrogram.handlers import MessageHandler
 from db.db_utils import get_user_prefix
-from utils.filters import spam_cmd_filter
+from utils.router import router
+from utils.outbound import outbound
 
 # Настройка логирования
 logging.basicConfig(level=logging.INFO)
@@ -104,8 +105,8 @@ async def spam_command(client: Client, message: Message):
         logger.info(f"Отправка {count} сообщений с текстом '{spam_text}' для user_id={user_id}")
         for i in range(count):
             try:
-                await client.send_message(chat_id, spam_text)
-                await asyncio.sleep(0.5)  # Пауза 0.5 секунды
+                # Темп задают лимиты планировщика для чата, FloodWait выжидается там же
+                await outbound.run("send", chat_id, client.send_message, chat_id, spam_text)
             except Exception as e:
                 await client.send_message(chat_id, f"⚠️ Ошибка при отправке сообщения {i+1}: {str(e)}")
                 logger.error(f"Ошибка при отправке спам-сообщения {i+1} для user_id={user_id}: {e}")
@@ -121,4 +122,4 @@ async def spam_command(client: Client, message: Message):
         logger.error(f"Ошибка в spam_command для user_id={user_id}: {e}")
 
 def register(app: Client):
-    app.on_message(spam_cmd_filter("спам", ignore_case=True) & filters.me)(spam_command)
\ No newline at end of file
+    router.command("спам", spam_command)
\ No newline at end of file
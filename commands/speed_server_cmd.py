@@ -1,10 +1,12 @@
-from pyrogram import Client, filters
+from pyrogram import Client
 from pyrogram.types import Message
 from db.db_utils import list_speed_servers, get_speed_server, remove_speed_server, add_speed_server
 from utils.speedtest_utils import run_remote_speedtest, format_speedtest_results, mask_ip
-import asyncio
 from urllib.parse import urlparse
 import re
+from utils.router import router
+
+SPEED_SERVER_ID_RE = re.compile(r"^\.speed\s+\d+$")
 
 def extract_masked_ip_from_url(url: str) -> str:
     """Извлекает IP из URL и маскирует его, сохраняя порт."""
@@ -111,7 +113,7 @@ async def add_speed_server_cmd(client: Client, message: Message):
 
 def register(app: Client):
     """Регистрирует обработчики команд для работы с серверами тестирования скорости."""
-    app.on_message(filters.command("speed", prefixes=".") & filters.me & ~filters.regex(r"^\.speed\s+\d+$"))(list_speed_servers_cmd)
-    app.on_message(filters.command("speed", prefixes=".") & filters.me & filters.regex(r"^\.speed\s+\d+$"))(speedtest_server_cmd)
-    app.on_message(filters.command("-speed", prefixes=".") & filters.me)(remove_speed_server_cmd)
-    app.on_message(filters.command("+speed", prefixes=".") & filters.me)(add_speed_server_cmd)
\ No newline at end of file
+    router.dot_command("speed", speedtest_server_cmd, check=lambda m: bool(SPEED_SERVER_ID_RE.match(m.text)))
+    router.dot_command("speed", list_speed_servers_cmd)
+    router.dot_command("-speed", remove_speed_server_cmd)
+    router.dot_command("+speed", add_speed_server_cmd)
\ No newline at end of file
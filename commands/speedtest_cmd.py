@@ -1,9 +1,10 @@
-from pyrogram import Client, filters
+from pyrogram import Client
 from pyrogram.types import Message
 import asyncio
 import subprocess
 import json
 from utils.speedtest_utils import format_speedtest_results
+from utils.router import router
 
 async def speedtest_cmd(client: Client, message: Message):
     try:
@@ -38,4 +39,4 @@ async def speedtest_cmd(client: Client, message: Message):
         print(f"Speedtest command error: {e}")
 
 def register(app: Client):
-    app.on_message(filters.command("speedtest", prefixes=".") & filters.me)(speedtest_cmd)
\ No newline at end of file
+    router.dot_command("speedtest", speedtest_cmd)
\ No newline at end of file
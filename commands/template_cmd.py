@@ -1,7 +1,7 @@
-from pyrogram import Client, filters
+from pyrogram import Client
 from pyrogram.types import Message
 from db.db_utils import template_exists, save_template, get_template, delete_template, list_templates, list_categories
-from utils.filters import template_filter, simple_cmd_filter
+from utils.router import router
 import logging
 
 # Настройка логирования
@@ -118,7 +118,7 @@ async def list_templates_cmd(client: Client, message: Message):
         logger.error(f"Ошибка в list_templates_cmd: {e}")
 
 def register(app: Client):
-    app.on_message(simple_cmd_filter("шабы", ignore_case=True) & filters.me)(list_templates_cmd)
-    app.on_message(template_filter("+шаб", ignore_case=True) & filters.me)(save_template_cmd)
-    app.on_message(template_filter("шаб", ignore_case=True) & filters.me)(get_template_cmd)
-    app.on_message(template_filter("-шаб", ignore_case=True) & filters.me)(delete_template_cmd)
\ No newline at end of file
+    router.command("шабы", list_templates_cmd)
+    router.command("+шаб", save_template_cmd)
+    router.command("шаб", get_template_cmd)
+    router.command("-шаб", delete_template_cmd)
\ No newline at end of file
@@ -3,7 +3,8 @@ import random
 from pyrogram import Client, filters
 from pyrogram.types import Message
 from collections import defaultdict
-from utils.filters import simple_cmd_filter
+from utils.router import router
+from utils.file_id_cache import file_id_cache
 
 # Настройка логирования
 logging.basicConfig(level=logging.INFO)
@@ -21,10 +22,13 @@ async def trap_command(client: Client, message: Message):
         await message.delete()
         
         # Отправляем первую картинку
-        trap_msg = await client.send_photo(
-            chat_id=chat_id,
-            photo="resources/lovushka1.jpg",
-            caption="Ловушка установлена! Ждём жертву..."
+        trap_msg = await file_id_cache.send(
+            "resources/lovushka1.jpg", "photo",
+            lambda photo: client.send_photo(
+                chat_id=chat_id,
+                photo=photo,
+                caption="Ловушка установлена! Ждём жертву..."
+            )
         )
         
         # Сохраняем информацию о ловушке
@@ -52,20 +56,26 @@ async def handle_trap_reply(client: Client, message: Message):
         # Если сообщение от того же пользователя, что и установил ловушку
         if message.from_user.id == trap['user_id']:
             # Отправляем первую картинку
-            await client.send_photo(
-                chat_id=chat_id,
-                photo="resources/lovushka1.jpg",
-                reply_to_message_id=message.id
+            await file_id_cache.send(
+                "resources/lovushka1.jpg", "photo",
+                lambda photo: client.send_photo(
+                    chat_id=chat_id,
+                    photo=photo,
+                    reply_to_message_id=message.id
+                )
             )
             return
         
         # Если сообщение от другого пользователя
         if message.from_user.id != trap['user_id']:
             # Отправляем вторую картинку с реплаем
-            await client.send_photo(
-                chat_id=chat_id,
-                photo="resources/lovushka2.jpg",
-                reply_to_message_id=message.id
+            await file_id_cache.send(
+                "resources/lovushka2.jpg", "photo",
+                lambda photo: client.send_photo(
+                    chat_id=chat_id,
+                    photo=photo,
+                    reply_to_message_id=message.id
+                )
             )
             
             # Деактивируем ловушку
@@ -76,5 +86,5 @@ async def handle_trap_reply(client: Client, message: Message):
         logger.error(f"Ошибка в handle_trap_reply: {e}")
 
 def register(app: Client):
-    app.on_message(simple_cmd_filter("ловушка", ignore_case=True) & filters.me)(trap_command)
+    router.command("ловушка", trap_command)
     app.on_message(filters.group & ~filters.service)(handle_trap_reply)
\ No newline at end of file
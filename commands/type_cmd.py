@@ -1,7 +1,22 @@
-from pyrogram import Client, filters
+from pyrogram import Client
 from pyrogram.types import Message
-from pyrogram.errors import FloodWait
-import asyncio
+from typing import List
+from utils.router import router
+from utils.render_cache import render_cache
+from utils.text_animation import Frame, send_text_animation, play_by_edits
+
+TYPING_SYMBOL = "▒"
+
+def typing_frames(orig_text: str) -> List[Frame]:
+    """Два кадра на символ: с курсором и без, как при печати."""
+    frames = []
+    for i in range(len(orig_text)):
+        frames.append((orig_text[:i] + TYPING_SYMBOL, 0.05))
+        frames.append((orig_text[:i + 1], 0.05))
+    # Готовый текст задерживается на экране перед повтором GIF
+    if frames:
+        frames[-1] = (orig_text, 2)
+    return frames
 
 async def type_cmd(client: Client, message: Message):
     try:
@@ -10,22 +25,11 @@ async def type_cmd(client: Client, message: Message):
             return
             
         orig_text = message.text.split(".type", 1)[1].strip()
-        text = orig_text
-        tbp = ""
-        typing_symbol = "▒"
-
-        while tbp != orig_text:
-            try:
-                await message.edit(tbp + typing_symbol)
-                await asyncio.sleep(0.05)
-                tbp += text[0]
-                text = text[1:]
-                await message.edit(tbp)
-                await asyncio.sleep(0.05)
-            except FloodWait as e:
-                await asyncio.sleep(e.x)
+        frames = typing_frames(orig_text)
+        if not await send_text_animation(client, message, render_cache.key("type", "", orig_text), frames):
+            await play_by_edits(message, frames)
     except Exception as e:
         await message.edit(f"Error: {str(e)}")
 
 def register(app: Client):
-    app.on_message(filters.command("type", prefixes=".") & filters.me)(type_cmd)
\ No newline at end of file
+    router.dot_command("type", type_cmd)
@@ -1,9 +1,8 @@
 import logging
-import asyncio
-from pyrogram import Client, filters
+from pyrogram import Client
 from pyrogram.types import Message
 from db.db_utils import get_user_prefix, get_delete_cmd, set_delete_cmd
-from utils.filters import simple_cmd_filter
+from utils.router import router
 
 # Настройка логирования
 logging.basicConfig(level=logging.INFO)
@@ -71,4 +70,4 @@ async def set_delete_cmd_cmd(client: Client, message: Message):
         logger.error(f"Ошибка в set_delete_cmd_cmd: {e}")
 
 def register(app: Client):
-    app.on_message(simple_cmd_filter("удалялка", ignore_case=True) & filters.me)(set_delete_cmd_cmd)
\ No newline at end of file
+    router.command("удалялка", set_delete_cmd_cmd)
\ No newline at end of file
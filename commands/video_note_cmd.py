@@ -1,11 +1,15 @@
-from pyrogram import Client, filters
+from pyrogram import Client
 from pyrogram.types import Message
 import os
 import unicodedata
 import re
-import subprocess
 from db.db_utils import video_note_exists, save_video_note, delete_video_note, list_video_notes, get_video_note
-from utils.filters import template_filter
+from utils.router import router
+from utils.file_id_cache import file_id_cache
+from utils.media_pool import edit_progress
+from utils.media_store import media_store
+from utils.media_catalog import probe_media
+from utils.video_note import convert_to_video_note, VIDEO_NOTE_MAX_DURATION
 
 def normalize_filename(name: str) -> str:
     """Нормализует имя файла, убирая недопустимые символы."""
@@ -16,29 +20,15 @@ def normalize_filename(name: str) -> str:
     name = name.strip('_')
     return name or 'video_note'
 
-async def convert_video_to_note(input_path: str, output_path: str) -> bool:
-    """Конвертирует видео в видеокружочек с сохранением звука."""
+async def convert_video_to_note(client: Client, media, output_path: str, temp_path: str,
+                                progress=None) -> bool:
+    """Конвертирует видео из Telegram в видеокружочек с сохранением звука.
+
+    Подходящее видео перепаковывается без перекодирования, остальное
+    перекодируется по мере загрузки.
+    """
     try:
-        # Проверяем наличие аудиодорожки
-        has_audio = subprocess.run(
-            ["ffprobe", "-i", input_path, "-show_streams", "-select_streams", "a", "-loglevel", "error"],
-            capture_output=True
-        ).returncode == 0
-
-        command = [
-            "ffmpeg",
-            "-i", input_path,
-            "-vf", "crop=min(iw\\,ih):min(iw\\,ih),scale=512:512",
-            "-c:v", "libx264",
-            "-profile:v", "baseline",
-            "-level", "3.0",
-            "-pix_fmt", "yuv420p",
-            *(["-c:a", "aac", "-shortest"] if has_audio else ["-an"]),
-            "-y",
-            output_path
-        ]
-        
-        subprocess.run(command, check=True, timeout=30)
+        await convert_to_video_note(client, media, output_path, temp_path, progress)
         return os.path.exists(output_path)
     except Exception as e:
         print(f"Ошибка при конвертации: {e}")
@@ -46,6 +36,7 @@ async def convert_video_to_note(input_path: str, output_path: str) -> bool:
 
 async def convert_to_video_note_cmd(client: Client, message: Message):
     """Конвертирует обычное видео в видеокружочек и сразу отправляет"""
+    temp_path = output_path = None
     try:
         if not message.reply_to_message or not message.reply_to_message.video:
             await message.edit("❌ Ответьте на видео для конвертации!")
@@ -57,28 +48,38 @@ async def convert_to_video_note_cmd(client: Client, message: Message):
         
         temp_path = os.path.join(save_dir, f"temp_{user_id}_{message.id}")
         output_path = os.path.join(save_dir, f"converted_{user_id}_{message.id}.mp4")
-
-        # Скачиваем видео
-        await client.download_media(message.reply_to_message.video.file_id, temp_path)
-        
-        # Конвертируем
-        if not await convert_video_to_note(temp_path, output_path):
+        video = message.reply_to_message.video
+
+        async def convert():
+            # Это видео уже сохранялось как кружок — берём готовый файл
+            stored = await media_store.find("video_note", video.file_unique_id)
+            if stored:
+                return stored[1]
+            # Конвертируем по мере загрузки
+            progress = edit_progress(message, "⏳ Конвертация", video.duration)
+            if await convert_video_to_note(client, video, output_path, temp_path, progress):
+                return output_path
+            return None
+
+        # Повторный вкруг того же видео отправляет уже загруженный кружок по file_id
+        sent = await file_id_cache.send_converted(
+            video.file_unique_id, "video_note",
+            lambda video_note: client.send_video_note(
+                chat_id=message.chat.id,
+                video_note=video_note,
+                duration=min(int(video.duration or 0), VIDEO_NOTE_MAX_DURATION)
+            ),
+            convert
+        )
+        if sent:
+            await message.delete()
+        else:
             await message.edit("❌ Ошибка при конвертации!")
-            if os.path.exists(temp_path):
-                os.remove(temp_path)
-            return
-
-        # Отправляем результат
-        await message.delete()
-        await send_video_note_wrapper(client, message.chat.id, output_path)
-
-        # Удаляем временные файлы
-        for path in [temp_path, output_path]:
-            if os.path.exists(path):
-                os.remove(path)
                 
     except Exception as e:
         await message.edit(f"⚠️ Ошибка: {str(e)}")
+    finally:
+        # Удаляем временные файлы
         for path in [temp_path, output_path]:
             if path and os.path.exists(path):
                 os.remove(path)
@@ -90,7 +91,7 @@ async def add_video_note_cmd(client: Client, message: Message):
             await message.edit("❌ Ответьте на видеокружочек или видео!")
             return
 
-        video_note_name = message.text.split(maxsplit=1)[1].strip()
+        video_note_name = message.text.split(maxsplit=2)[2].strip()
         user_id = message.from_user.id
 
         # Проверка имени
@@ -104,59 +105,63 @@ async def add_video_note_cmd(client: Client, message: Message):
             await message.edit(f"❌ Видеокружочек '{video_note_name}' уже существует!")
             return
 
-        # Подготовка путей
-        save_dir = "video_notes"
-        os.makedirs(save_dir, exist_ok=True)
-        safe_name = normalize_filename(video_note_name)
-        temp_path = os.path.join(save_dir, f"temp_{user_id}_{message.id}")
-        file_path = os.path.join(save_dir, f"vn_{user_id}_{safe_name}_{message.reply_to_message.id}.mp4")
-
-        # Скачивание и конвертация
         media = message.reply_to_message.video or message.reply_to_message.video_note
         if media.file_size > 50 * 1024 * 1024:
             await message.edit("❌ Файл слишком большой (>50 МБ)")
             return
 
-        await client.download_media(media.file_id, temp_path)
-        
-        if not await convert_video_to_note(temp_path, file_path):
-            await message.edit("❌ Ошибка конвертации!")
-            if os.path.exists(temp_path):
-                os.remove(temp_path)
-            return
+        # Сохранение в БД вместе с метаданными, чтобы при отправке не вызывать ffprobe
+        async def save(content_hash: str, file_path: str) -> bool:
+            metadata = await probe_media(file_path)
+            return await save_video_note(user_id, video_note_name, file_path, content_hash,
+                                         media.file_unique_id, metadata)
+
+        # Уже сохранённый файл не скачиваем и не конвертируем повторно
+        stored = await media_store.find("video_note", media.file_unique_id)
+        if stored:
+            saved = await media_store.reuse(*stored, save)
+        else:
+            staging_path = media_store.staging_path("video_note", "mp4")
+            temp_path = media_store.staging_path("video_note", "part")
 
-        # Сохранение в БД
-        if await save_video_note(user_id, video_note_name, file_path):
+            # Скачивание и конвертация
+            progress = edit_progress(message, "⏳ Конвертация", media.duration)
+            if not await convert_video_to_note(client, media, staging_path, temp_path, progress):
+                await message.edit("❌ Ошибка конвертации!")
+                if os.path.exists(staging_path):
+                    os.remove(staging_path)
+                return
+
+            saved = await media_store.store("video_note", staging_path, "mp4", save)
+
+        if saved:
             await message.edit(f"✅ Видеокружочек '{video_note_name}' сохранён!")
         else:
             await message.edit("❌ Ошибка сохранения!")
-        
-        # Очистка временных файлов
-        if os.path.exists(temp_path):
-            os.remove(temp_path)
             
     except Exception as e:
         await message.edit(f"⚠️ Ошибка: {str(e)}")
-        for path in [temp_path, file_path]:
-            if path and os.path.exists(path):
-                os.remove(path)
+        if 'staging_path' in locals() and os.path.exists(staging_path):
+            os.remove(staging_path)
+
+async def send_video_note_wrapper(client: Client, chat_id: int, file_path: str, duration: float = 0):
+    """Обертка для отправки видеокружка с обработкой ошибок
 
-async def send_video_note_wrapper(client: Client, chat_id: int, file_path: str):
-    """Обертка для отправки видеокружка с обработкой ошибок"""
+    Длительность берётся из каталога (или из исходного видео), а не из ffprobe.
+    """
     try:
         # Проверяем длительность (не более 60 сек)
-        duration = int(float(subprocess.check_output(
-            ["ffprobe", "-v", "error", "-show_entries", "format=duration", 
-             "-of", "default=noprint_wrappers=1:nokey=1", file_path]
-        ).decode().strip()))
-        
-        if duration > 60:
+        duration = int(duration or 0)
+        if duration > VIDEO_NOTE_MAX_DURATION:
             raise ValueError("Видеокружок должен быть не длиннее 60 секунд")
 
-        await client.send_video_note(
-            chat_id=chat_id,
-            video_note=file_path,
-            duration=duration
+        await file_id_cache.send(
+            file_path, "video_note",
+            lambda video_note: client.send_video_note(
+                chat_id=chat_id,
+                video_note=video_note,
+                duration=duration
+            )
         )
         return True
     except Exception as e:
@@ -166,16 +171,16 @@ async def send_video_note_wrapper(client: Client, chat_id: int, file_path: str):
 async def get_video_note_cmd(client: Client, message: Message):
     """Отправляет сохраненный видеокружочек"""
     try:
-        video_note_name = message.text.split(maxsplit=1)[1].strip()
+        video_note_name = message.text.split(maxsplit=2)[2].strip()
         user_id = message.from_user.id
-        file_path = await get_video_note(user_id, video_note_name)
+        note = await get_video_note(user_id, video_note_name)
 
-        if not file_path or not os.path.exists(file_path):
+        if not note or not os.path.exists(note['file_path']):
             await message.edit(f"❌ Видеокружочек '{video_note_name}' не найден!")
             return
 
         await message.delete()
-        if not await send_video_note_wrapper(client, message.chat.id, file_path):
+        if not await send_video_note_wrapper(client, message.chat.id, note['file_path'], note['duration']):
             await message.reply("❌ Не удалось отправить видеокружочек")
             
     except Exception as e:
@@ -184,7 +189,7 @@ async def get_video_note_cmd(client: Client, message: Message):
 async def delete_video_note_cmd(client: Client, message: Message):
     """Удаляет видеокружочек по имени"""
     try:
-        video_note_name = message.text.split(maxsplit=1)[1].strip()
+        video_note_name = message.text.split(maxsplit=2)[2].strip()
         user_id = message.from_user.id
 
         if await delete_video_note(user_id, video_note_name):
@@ -209,9 +214,8 @@ async def list_video_notes_cmd(client: Client, message: Message):
         await message.edit(f"⚠️ Ошибка: {str(e)}")
 
 def register(app: Client):
-    
-    app.on_message(template_filter("+кружочек", ignore_case=True) & filters.me)(add_video_note_cmd)
-    app.on_message(template_filter("-кружочек", ignore_case=True) & filters.me)(delete_video_note_cmd)
-    app.on_message(template_filter("кружочек", ignore_case=True) & filters.me)(list_video_notes_cmd)
-    app.on_message(template_filter("кружочки", ignore_case=True) & filters.me)(get_video_note_cmd)
-    app.on_message(template_filter("вкруг", ignore_case=True) & filters.me)(convert_to_video_note_cmd)
+    router.command("+кружочек", add_video_note_cmd)
+    router.command("-кружочек", delete_video_note_cmd)
+    router.command("кружочек", get_video_note_cmd)
+    router.command("кружочки", list_video_notes_cmd)
+    router.command("вкруг", convert_to_video_note_cmd)
@@ -2,13 +2,15 @@ import logging
 import os
 import unicodedata
 import re
-import subprocess
-import random
 import pyrogram
-from pyrogram import Client, filters
+from pyrogram import Client
 from pyrogram.types import Message
 from db.db_utils import voice_message_exists, save_voice_message, delete_voice_message, list_voice_messages, get_voice_message, list_voice_categories
-from utils.filters import add_voice_filter, delete_voice_filter, get_voice_filter, list_voices_filter
+from utils.router import router
+from utils.file_id_cache import file_id_cache
+from utils.media_pool import transcode_from_telegram, edit_progress, MediaJobError
+from utils.media_store import media_store
+from utils.media_catalog import probe_media
 
 # Настройка логирования
 logging.basicConfig(level=logging.INFO)
@@ -23,30 +25,6 @@ def normalize_filename(name: str) -> str:
     name = name.strip('_')
     return name or 'voice'
 
-def generate_unique_filename(save_dir: str, user_id: int) -> str:
-    """Генерирует уникальное имя файла для голосового сообщения."""
-    while True:
-        random_id = random.randint(100000, 999999)  # Случайное 6-значное число
-        file_path = os.path.join(save_dir, f"voice_{user_id}_voice_{random_id}.ogg")
-        if not os.path.exists(file_path):
-            return file_path
-
-async def has_audio_track(file_path: str) -> bool:
-    """Проверяет наличие аудиодорожки в файле."""
-    try:
-        command = [
-            'ffprobe',
-            '-i', file_path,
-            '-show_streams',
-            '-select_streams', 'a',
-            '-loglevel', 'error'
-        ]
-        result = subprocess.run(command, capture_output=True, text=True)
-        return bool(result.stdout.strip())
-    except Exception as e:
-        logger.error(f"Ошибка проверки аудиодорожки: {e}")
-        return False
-
 async def add_voice_message_cmd(client: Client, message: Message):
     """Сохраняет голосовое сообщение из голоса, аудио или видео."""
     try:
@@ -75,13 +53,6 @@ async def add_voice_message_cmd(client: Client, message: Message):
             await message.edit(f"❌ Аудиозапись '{voice_name}' уже существует!")
             return
 
-        save_dir = "voice_messages"
-        if not os.path.exists(save_dir):
-            os.makedirs(save_dir)
-
-        temp_path = os.path.join(save_dir, f"temp_{user_id}_{message.reply_to_message.id}")
-        final_path = generate_unique_filename(save_dir, user_id)
-
         if message.reply_to_message.voice:
             file_to_download = message.reply_to_message.voice
         elif message.reply_to_message.audio:
@@ -93,62 +64,68 @@ async def add_voice_message_cmd(client: Client, message: Message):
             await message.edit("❌ Файл слишком большой (максимум 50 МБ)")
             return
 
-        # Скачиваем и конвертируем при необходимости
-        if message.reply_to_message.voice:
-            await client.download_media(file_to_download, final_path)
+        # Метаданные собираются один раз при сохранении, отправка их только читает
+        async def save(content_hash: str, final_path: str) -> bool:
+            metadata = await probe_media(final_path)
+            if not await save_voice_message(user_id, voice_name, final_path, category,
+                                            content_hash, file_to_download.file_unique_id, metadata):
+                return False
+            logger.info(f"Voice message '{voice_name}' saved for user {user_id} at {final_path}, category '{category}'")
+            return True
+
+        # Уже сохранённый файл не скачиваем и не конвертируем повторно
+        stored = await media_store.find("voice", file_to_download.file_unique_id)
+        if stored:
+            saved = await media_store.reuse(*stored, save)
         else:
-            # Скачиваем аудио или видео
-            await client.download_media(file_to_download, temp_path)
-            # Для видео или аудио конвертируем в OGG
-            if message.reply_to_message.video:
-                if not await has_audio_track(temp_path):
-                    await message.edit("❌ Видео не содержит аудиодорожки!")
-                    if os.path.exists(temp_path):
-                        os.remove(temp_path)
+            staging_path = media_store.staging_path("voice", "ogg")
+            temp_path = media_store.staging_path("voice", "part")
+
+            # Скачиваем и конвертируем при необходимости
+            if message.reply_to_message.voice:
+                await client.download_media(file_to_download, staging_path)
+            else:
+                # Аудио или видео идёт из загрузки прямо в ffmpeg и сохраняется в OGG
+                try:
+                    command = [
+                        '-map', '0:a:0',  # Первая аудиодорожка; у видео без звука её нет
+                        '-vn',
+                        '-c:a', 'libopus',
+                        '-f', 'ogg',
+                        '-y',
+                        staging_path
+                    ]
+                    progress = edit_progress(message, "⏳ Конвертация", file_to_download.duration)
+                    await transcode_from_telegram(client, file_to_download.file_id, command, temp_path, progress)
+                except MediaJobError as e:
+                    if os.path.exists(staging_path):
+                        os.remove(staging_path)
+                    if "matches no streams" in e.stderr:
+                        await message.edit("❌ Видео не содержит аудиодорожки!")
+                        return
+                    logger.error(f"Ошибка обработки аудио: {e}")
+                    await message.edit(f"❌ Ошибка обработки аудио: {e}")
                     return
-            try:
-                command = [
-                    'ffmpeg',
-                    '-i', temp_path,
-                    '-vn',  # Без видео для видео, игнорируется для аудио
-                    '-c:a', 'libopus',
-                    '-f', 'ogg',
-                    '-y',
-                    final_path
-                ]
-                result = subprocess.run(command, check=True, capture_output=True, text=True)
-                logger.debug(f"FFmpeg process stdout: {result.stdout}")
-            except subprocess.CalledProcessError as e:
-                logger.error(f"Ошибка обработки аудио: {e.stderr}")
-                await message.edit(f"❌ Ошибка обработки аудио: {e.stderr}")
-                if os.path.exists(temp_path):
-                    os.remove(temp_path)
-                return
-            except Exception as e:
-                logger.error(f"Общая ошибка обработки аудио: {e}")
-                await message.edit("❌ Ошибка обработки аудио!")
-                if os.path.exists(temp_path):
-                    os.remove(temp_path)
-                return
-
-            # Очистка временного файла
-            if os.path.exists(temp_path):
-                os.remove(temp_path)
-
-        if await save_voice_message(user_id, voice_name, final_path, category):
+                except Exception as e:
+                    logger.error(f"Общая ошибка обработки аудио: {e}")
+                    await message.edit("❌ Ошибка обработки аудио!")
+                    if os.path.exists(staging_path):
+                        os.remove(staging_path)
+                    return
+
+            saved = await media_store.store("voice", staging_path, "ogg", save)
+
+        if saved:
             await message.edit(f"✅ Аудиозапись '{voice_name}' сохранена в категории '{category}'!")
-            logger.info(f"Voice message '{voice_name}' saved for user {user_id} at {final_path}, category '{category}'")
         else:
             await message.edit("❌ Ошибка при сохранении!")
-            if os.path.exists(final_path):
-                os.remove(final_path)
     except Exception as e:
         logger.error(f"Ошибка при добавлении голосового сообщения: {e}")
         await message.edit(f"⚠️ Ошибка: {str(e)}")
+        if 'staging_path' in locals() and os.path.exists(staging_path):
+            os.remove(staging_path)
         if 'temp_path' in locals() and os.path.exists(temp_path):
             os.remove(temp_path)
-        if 'final_path' in locals() and os.path.exists(final_path):
-            os.remove(final_path)
 
 async def delete_voice_message_cmd(client: Client, message: Message):
     """Удаляет голосовое сообщение."""
@@ -224,7 +201,12 @@ async def get_voice_message_cmd(client: Client, message: Message):
         if voice and os.path.exists(voice['file_path']):
             try:
                 await message.delete()
-                await client.send_voice(message.chat.id, voice['file_path'])
+                await file_id_cache.send(
+                    voice['file_path'], "voice",
+                    lambda voice_file: client.send_voice(
+                        message.chat.id, voice_file, duration=int(voice['duration'] or 0)
+                    )
+                )
             except Exception as send_err:
                 logger.error(f"Ошибка при отправке голосового сообщения: {send_err}")
                 await message.edit(f"⚠️ Ошибка при отправке: {send_err}")
@@ -240,7 +222,9 @@ async def get_voice_message_cmd(client: Client, message: Message):
 
 def register(app: Client):
     """Регистрирует обработчики команд."""
-    app.on_message(filters.create(add_voice_filter))(add_voice_message_cmd)
-    app.on_message(filters.create(delete_voice_filter))(delete_voice_message_cmd)
-    app.on_message(filters.create(list_voices_filter))(list_voice_messages_cmd)
-    app.on_message(filters.create(get_voice_filter))(get_voice_message_cmd)
\ No newline at end of file
+    router.command("+гс", add_voice_message_cmd, min_words=3, check=lambda m: bool(
+        m.reply_to_message and (m.reply_to_message.voice or m.reply_to_message.audio or m.reply_to_message.video)
+    ))
+    router.command("-гс", delete_voice_message_cmd, min_words=3)
+    router.command("гсы", list_voice_messages_cmd)
+    router.command("гс", get_voice_message_cmd, min_words=3)
\ No newline at end of file
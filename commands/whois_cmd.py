@@ -1,10 +1,12 @@
+import asyncio
 import logging
 import re
 import aiohttp
-from pyrogram import Client, filters
+from pyrogram import Client
 from pyrogram.types import Message
 from db.db_utils import get_user_prefix
-from utils.filters import template_filter
+from utils.router import router
+from utils.response_cache import cached_json
 from config import API_KEY_WHOIS, API_BASE_URL_WHOIS
 
 # Настройка логирования
@@ -16,46 +18,44 @@ DOMAIN_REGEX = r"^[a-zA-Z0-9][a-zA-Z0-9-]{1,61}[a-zA-Z0-9](?:\.[a-zA-Z]{2,})+$"
 
 async def fetch_whois_data(domain: str, api_key: str) -> dict:
     """Получает WHOIS-данные для одного домена через API."""
-    async with aiohttp.ClientSession() as session:
-        headers = {"x-api-key": api_key}
-        url = f"{API_BASE_URL_WHOIS}/whois/{domain}"
-        try:
-            async with session.get(url, headers=headers) as response:
-                if response.status == 200:
-                    return await response.json()
-                elif response.status == 400:
-                    return {"error": "Invalid domain format"}
-                elif response.status == 401:
-                    return {"error": "Invalid or missing API key"}
-                elif response.status == 429:
-                    return {"error": "API key request limit exceeded"}
-                else:
-                    return {"error": f"API error: {response.status}"}
-        except aiohttp.ClientError as e:
-            logger.error(f"API request error for {domain}: {e}")
-            return {"error": "Failed to connect to API"}
+    headers = {"x-api-key": api_key}
+    url = f"{API_BASE_URL_WHOIS}/whois/{domain}"
+    try:
+        status, data = await cached_json("whois", domain, "GET", url, headers=headers)
+        if status == 200:
+            return data
+        elif status == 400:
+            return {"error": "Invalid domain format"}
+        elif status == 401:
+            return {"error": "Invalid or missing API key"}
+        elif status == 429:
+            return {"error": "API key request limit exceeded"}
+        else:
+            return {"error": f"API error: {status}"}
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+        logger.error(f"API request error for {domain}: {e}")
+        return {"error": "Failed to connect to API"}
 
 async def fetch_batch_whois_data(domains: list[str], api_key: str) -> dict:
     """Получает WHOIS-данные для нескольких доменов через API."""
-    async with aiohttp.ClientSession() as session:
-        headers = {"x-api-key": api_key}
-        url = f"{API_BASE_URL_WHOIS}/whois"
-        payload = {"domains": domains}
-        try:
-            async with session.post(url, headers=headers, json=payload) as response:
-                if response.status == 200:
-                    return await response.json()
-                elif response.status == 400:
-                    return {"error": "Invalid domains or format"}
-                elif response.status == 401:
-                    return {"error": "Invalid or missing API key"}
-                elif response.status == 429:
-                    return {"error": "API key request limit exceeded"}
-                else:
-                    return {"error": f"API error: {response.status}"}
-        except aiohttp.ClientError as e:
-            logger.error(f"Batch API request error: {e}")
-            return {"error": "Failed to connect to API"}
+    headers = {"x-api-key": api_key}
+    url = f"{API_BASE_URL_WHOIS}/whois"
+    payload = {"domains": domains}
+    try:
+        status, data = await cached_json("whois", ",".join(sorted(domains)), "POST", url, headers=headers, json=payload)
+        if status == 200:
+            return data
+        elif status == 400:
+            return {"error": "Invalid domains or format"}
+        elif status == 401:
+            return {"error": "Invalid or missing API key"}
+        elif status == 429:
+            return {"error": "API key request limit exceeded"}
+        else:
+            return {"error": f"API error: {status}"}
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+        logger.error(f"Batch API request error: {e}")
+        return {"error": "Failed to connect to API"}
 
 async def format_whois_data(data: dict, domain: str) -> str:
     """Форматирует WHOIS-данные для вывода."""
@@ -231,4 +231,4 @@ async def whois_command(client: Client, message: Message):
 
 def register(app: Client):
     """Регистрирует обработчик команды whois."""
-    app.on_message(template_filter("whois", ignore_case=True) & filters.me)(whois_command)
\ No newline at end of file
+    router.command("whois", whois_command)
\ No newline at end of file
@@ -7,6 +7,78 @@ db_config = {
     "host": "localhost",
     "port": "5432"
 }
+DB_POOL_MIN_SIZE = 1
+DB_POOL_MAX_SIZE = 10
+
+# Обработка медиа (ffmpeg/ffprobe): 0 — половина ядер CPU
+MEDIA_POOL_WORKERS = 0
+MEDIA_POOL_QUEUE_SIZE = 32
+MEDIA_JOB_TIMEOUT = 120
+
+# Видеокружки: пресет x264 для перекодирования и запас времени (сек) на секунду видео
+VIDEO_NOTE_PRESET = "veryfast"
+VIDEO_NOTE_TIMEOUT_PER_SECOND = 4
+# С какой длины (сек) видео кодируется по сегментам параллельно и минимальная длина сегмента
+VIDEO_NOTE_SEGMENTED_FROM = 20
+VIDEO_NOTE_MIN_SEGMENT = 4
+
+# Пул процессов отрисовки изображений (0 — половина ядер)
+RENDER_POOL_WORKERS = 0
+
+# Кэш аватарок для цитат: число аватарок и как часто (сек) перепроверять фото пользователя
+AVATAR_CACHE_SIZE = 200
+AVATAR_CHECK_TTL = 600
+
+# Кэш готовых изображений (демотиваторы, цитаты, эдвайсы): сколько file_id хранить
+RENDER_CACHE_SIZE = 5000
+
+# Анимации из правок (.hack, .type, анимки): True — одно GIF-видео, False — серия правок сообщения
+EDIT_ANIMATIONS_AS_VIDEO = True
+
+# Исходящие запросы к Telegram: вид → (запросов в секунду и запас на аккаунт, то же на один чат).
+# Фейковая активность обновляет каждый чат раз в 5 секунд: 60 действий в секунду хватает
+# примерно на 300 активностей
+OUTBOUND_LIMITS = {
+    "send": (20, 30, 2, 5),
+    "edit": (20, 30, 5, 20),
+    "delete": (10, 20, 5, 10),
+    "action": (60, 60, 1, 3),
+}
+# FloodWait дольше стольких секунд не выжидается, а возвращается командой; число повторов
+OUTBOUND_MAX_FLOOD_WAIT = 60
+OUTBOUND_FLOOD_RETRIES = 2
+
+# Массовое удаление: сколько правок перед удалением идёт одновременно и
+# не редактировать сообщения, текст которых уже равен тексту редактирования
+DELETE_EDIT_CONCURRENCY = 5
+DELETE_SKIP_UNCHANGED_EDITS = True
+# Сколько раз задание удаления продолжается после перезапусков, прежде чем от него отказаться
+DELETE_JOB_MAX_ATTEMPTS = 3
+
+# Индекс недавних сообщений для удалялки и конвертации: сообщений на чат и число чатов
+MESSAGE_INDEX_PER_CHAT = 500
+MESSAGE_INDEX_MAX_CHATS = 200
+
+# Кэш сведений о чатах: размер, время жизни (сек), время жизни «чат недоступен»
+# и сколько чатов запрашивать одновременно, если пакетный запрос не подошёл
+PEER_CACHE_SIZE = 1000
+PEER_CACHE_TTL = 3600
+PEER_CACHE_NEGATIVE_TTL = 300
+PEER_RESOLVE_CONCURRENCY = 5
+
+# Общий HTTP-клиент: таймауты в секундах, лимиты соединений, кэш DNS
+HTTP_CONNECT_TIMEOUT = 5
+HTTP_READ_TIMEOUT = 15
+HTTP_TOTAL_TIMEOUT = 30
+HTTP_MAX_CONNECTIONS = 100
+HTTP_MAX_PER_HOST = 8
+HTTP_DNS_CACHE_TTL = 300
+
+# Кэш ответов внешних API: размер в памяти и хранение в БД между перезапусками
+RESPONSE_CACHE_MAX_ENTRIES = 1000
+RESPONSE_CACHE_PERSISTENT = True
+# Пустой ответ (например, город не найден) хранится недолго, в секундах
+RESPONSE_CACHE_EMPTY_TTL = 300
 
 OPENWEATHERMAP_API_KEY = "111111111111111111"
 NASA_API_KEY = "1111111111111111111"
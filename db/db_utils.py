@@ -1,917 +1,1074 @@
-import psycopg2
-from psycopg2.extras import DictCursor
 from typing import Optional, List, Dict, Any
-from config import db_config
+from db import pool
+from db.pool import db_pool
+from db.user_state import user_state, DEFAULT_PREFIX, DEFAULT_EDIT_TEXT, DEFAULT_DELETE_CMD
 import os
+import json
 import logging
+import asyncio
+import weakref
 from typing import Tuple
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-def get_db_connection():
-    return psycopg2.connect(**db_config)
+# Метаданные медиа, которые сохраняются вместе с голосовыми и видеокружками
+MEDIA_METADATA_COLUMNS = ("duration", "width", "height", "video_codec", "audio_codec", "file_size", "has_audio")
+
+# Таблица и столбец имени для каждого вида сохранённых медиа
+MEDIA_TABLES = {
+    "voice": ("voice_messages", "voice_name"),
+    "video_note": ("video_notes", "video_note_name"),
+}
 
 def init_db():
-    conn = get_db_connection()
-    try:
-        with conn.cursor() as cursor:
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS templates (
-                    user_id BIGINT,
-                    template_name TEXT,
-                    template_text TEXT,
-                    category TEXT DEFAULT 'без категории',
-                    PRIMARY KEY (user_id, template_name)
-                );
-                CREATE TABLE IF NOT EXISTS speed_servers (
-                    id SERIAL PRIMARY KEY,
-                    name TEXT UNIQUE,
-                    url TEXT NOT NULL
-                );
-                CREATE TABLE IF NOT EXISTS voice_messages (
-                    user_id BIGINT,
-                    voice_name TEXT,
-                    file_path TEXT,
-                    category TEXT DEFAULT 'без категории',
-                    PRIMARY KEY (user_id, voice_name)
-                );
-                CREATE TABLE IF NOT EXISTS animations (
-                    user_id BIGINT,
-                    anim_name TEXT,
-                    frames TEXT,
-                    PRIMARY KEY (user_id, anim_name)
-                );
-                CREATE TABLE IF NOT EXISTS video_notes (
-                    user_id BIGINT,
-                    video_note_name TEXT,
-                    file_path TEXT,
-                    PRIMARY KEY (user_id, video_note_name)
-                );
-                CREATE TABLE IF NOT EXISTS fake_activities (
-                    user_id BIGINT,
-                    chat_id BIGINT,
-                    activity_type TEXT,
-                    PRIMARY KEY (user_id, chat_id, activity_type)
-                );
-                CREATE TABLE IF NOT EXISTS settings (
-                    user_id BIGINT PRIMARY KEY,
-                    prefix TEXT NOT NULL DEFAULT '.',
-                    edit_text TEXT DEFAULT '🫥🫥🫥',
-                    delete_cmd TEXT DEFAULT 'дд'
-                );
-                CREATE TABLE IF NOT EXISTS aliases (
-                    user_id BIGINT NOT NULL,
-                    alias_name TEXT,
-                    command TEXT NOT NULL,
-                    PRIMARY KEY (user_id, alias_name)
-                );
-                CREATE TABLE IF NOT EXISTS intervals (
-                    user_id BIGINT,
-                    interval_name TEXT,
-                    chat_id BIGINT,
-                    interval_minutes INTEGER,
-                    interval_text TEXT,
-                    PRIMARY KEY (user_id, interval_name)
-                );
-            """)
-            conn.commit()
+    """Создаёт таблицы. Вызывается при старте после открытия пула соединений."""
+    def _create_tables(cursor):
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS templates (
+                user_id BIGINT,
+                template_name TEXT,
+                template_text TEXT,
+                category TEXT DEFAULT 'без категории',
+                PRIMARY KEY (user_id, template_name)
+            );
+            CREATE TABLE IF NOT EXISTS speed_servers (
+                id SERIAL PRIMARY KEY,
+                name TEXT UNIQUE,
+                url TEXT NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS voice_messages (
+                user_id BIGINT,
+                voice_name TEXT,
+                file_path TEXT,
+                category TEXT DEFAULT 'без категории',
+                PRIMARY KEY (user_id, voice_name)
+            );
+            CREATE TABLE IF NOT EXISTS animations (
+                user_id BIGINT,
+                anim_name TEXT,
+                frames TEXT,
+                PRIMARY KEY (user_id, anim_name)
+            );
+            CREATE TABLE IF NOT EXISTS video_notes (
+                user_id BIGINT,
+                video_note_name TEXT,
+                file_path TEXT,
+                PRIMARY KEY (user_id, video_note_name)
+            );
+            CREATE TABLE IF NOT EXISTS fake_activities (
+                user_id BIGINT,
+                chat_id BIGINT,
+                activity_type TEXT,
+                PRIMARY KEY (user_id, chat_id, activity_type)
+            );
+            CREATE TABLE IF NOT EXISTS settings (
+                user_id BIGINT PRIMARY KEY,
+                prefix TEXT NOT NULL DEFAULT '.',
+                edit_text TEXT DEFAULT '🫥🫥🫥',
+                delete_cmd TEXT DEFAULT 'дд'
+            );
+            CREATE TABLE IF NOT EXISTS aliases (
+                user_id BIGINT NOT NULL,
+                alias_name TEXT,
+                command TEXT NOT NULL,
+                PRIMARY KEY (user_id, alias_name)
+            );
+            CREATE TABLE IF NOT EXISTS intervals (
+                user_id BIGINT,
+                interval_name TEXT,
+                chat_id BIGINT,
+                interval_minutes INTEGER,
+                interval_text TEXT,
+                started_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+                PRIMARY KEY (user_id, interval_name)
+            );
+            ALTER TABLE intervals ADD COLUMN IF NOT EXISTS started_at TIMESTAMPTZ NOT NULL DEFAULT NOW();
+            CREATE TABLE IF NOT EXISTS file_ids (
+                file_path TEXT PRIMARY KEY,
+                content_hash TEXT NOT NULL,
+                file_id TEXT NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS media_blobs (
+                content_hash TEXT PRIMARY KEY,
+                file_path TEXT NOT NULL,
+                refcount INTEGER NOT NULL DEFAULT 0
+            );
+            CREATE TABLE IF NOT EXISTS media_sources (
+                kind TEXT,
+                file_unique_id TEXT,
+                content_hash TEXT NOT NULL REFERENCES media_blobs (content_hash) ON DELETE CASCADE,
+                PRIMARY KEY (kind, file_unique_id)
+            );
+            ALTER TABLE voice_messages ADD COLUMN IF NOT EXISTS content_hash TEXT;
+            ALTER TABLE video_notes ADD COLUMN IF NOT EXISTS content_hash TEXT;
+            ALTER TABLE voice_messages
+                ADD COLUMN IF NOT EXISTS duration REAL,
+                ADD COLUMN IF NOT EXISTS width INTEGER,
+                ADD COLUMN IF NOT EXISTS height INTEGER,
+                ADD COLUMN IF NOT EXISTS video_codec TEXT,
+                ADD COLUMN IF NOT EXISTS audio_codec TEXT,
+                ADD COLUMN IF NOT EXISTS file_size BIGINT,
+                ADD COLUMN IF NOT EXISTS has_audio BOOLEAN;
+            ALTER TABLE video_notes
+                ADD COLUMN IF NOT EXISTS duration REAL,
+                ADD COLUMN IF NOT EXISTS width INTEGER,
+                ADD COLUMN IF NOT EXISTS height INTEGER,
+                ADD COLUMN IF NOT EXISTS video_codec TEXT,
+                ADD COLUMN IF NOT EXISTS audio_codec TEXT,
+                ADD COLUMN IF NOT EXISTS file_size BIGINT,
+                ADD COLUMN IF NOT EXISTS has_audio BOOLEAN;
+            CREATE TABLE IF NOT EXISTS api_cache (
+                source TEXT,
+                cache_key TEXT,
+                value JSONB NOT NULL,
+                expires_at TIMESTAMPTZ,
+                PRIMARY KEY (source, cache_key)
+            );
+            CREATE TABLE IF NOT EXISTS render_cache (
+                cache_key TEXT PRIMARY KEY,
+                file_id TEXT NOT NULL,
+                used_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+            );
+            CREATE TABLE IF NOT EXISTS delete_jobs (
+                job_id BIGSERIAL PRIMARY KEY,
+                user_id BIGINT NOT NULL,
+                chat_id BIGINT NOT NULL,
+                edit_text TEXT,
+                message_ids BIGINT[] NOT NULL,
+                created_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+            );
+            ALTER TABLE delete_jobs ADD COLUMN IF NOT EXISTS attempts INTEGER NOT NULL DEFAULT 0;
+        """)
+
+    try:
+        db_pool.run_sync(_create_tables)
     except Exception as e:
         logger.error(f"DB Init Error: {e}")
-    finally:
-        conn.close()
+
+def load_user_state():
+    """Загружает снимок настроек и алиасов всех пользователей одним запросом."""
+    def _load(cursor):
+        cursor.execute("""
+            SELECT u.user_id, s.prefix, s.edit_text, s.delete_cmd,
+                   COALESCE(ARRAY_AGG(a.alias_name) FILTER (WHERE a.alias_name IS NOT NULL), '{}')
+            FROM (SELECT user_id FROM settings UNION SELECT user_id FROM aliases) u
+            LEFT JOIN settings s ON s.user_id = u.user_id
+            LEFT JOIN aliases a ON a.user_id = u.user_id
+            GROUP BY u.user_id, s.prefix, s.edit_text, s.delete_cmd
+        """)
+        return cursor.fetchall()
+
+    try:
+        user_state.load(db_pool.run_sync(_load))
+    except Exception as e:
+        logger.error(f"Ошибка загрузки снимка настроек: {e}")
 
 async def template_exists(user_id: int, template_name: str) -> bool:
-    conn = None
     try:
-        conn = get_db_connection()
-        with conn.cursor() as cursor:
-            cursor.execute(
-                "SELECT 1 FROM templates WHERE user_id = %s AND template_name = %s",
-                (user_id, template_name)
-            )
-            return cursor.fetchone() is not None
+        row = await pool.fetchone(
+            "SELECT 1 FROM templates WHERE user_id = %s AND template_name = %s",
+            (user_id, template_name)
+        )
+        return row is not None
     except Exception as e:
         logger.error(f"DB Error in template_exists: {e}")
         return False
-    finally:
-        if conn:
-            conn.close()
 
 async def save_template(user_id: int, template_name: str, template_text: str, category: str = "без категории") -> bool:
-    conn = None
     try:
-        conn = get_db_connection()
-        with conn.cursor() as cursor:
-            cursor.execute(
-                "INSERT INTO templates (user_id, template_name, template_text, category) VALUES (%s, %s, %s, %s)",
-                (user_id, template_name, template_text, category)
-            )
-            conn.commit()
-            return True
+        await pool.execute(
+            "INSERT INTO templates (user_id, template_name, template_text, category) VALUES (%s, %s, %s, %s)",
+            (user_id, template_name, template_text, category)
+        )
+        return True
     except Exception as e:
         logger.error(f"DB Error in save_template: {e}")
         return False
-    finally:
-        if conn:
-            conn.close()
 
 async def get_template(user_id: int, template_name: str) -> Optional[Tuple[str, str]]:
-    conn = None
     try:
-        conn = get_db_connection()
-        with conn.cursor() as cursor:
-            cursor.execute(
-                "SELECT template_text, category FROM templates WHERE user_id = %s AND template_name = %s",
-                (user_id, template_name)
-            )
-            result = cursor.fetchone()
-            return (result[0], result[1]) if result else None
+        result = await pool.fetchone(
+            "SELECT template_text, category FROM templates WHERE user_id = %s AND template_name = %s",
+            (user_id, template_name)
+        )
+        return (result[0], result[1]) if result else None
     except Exception as e:
         logger.error(f"DB Error in get_template: {e}")
         return None
-    finally:
-        if conn:
-            conn.close()
 
 async def delete_template(user_id: int, template_name: str) -> bool:
-    conn = None
     try:
-        conn = get_db_connection()
-        with conn.cursor() as cursor:
-            cursor.execute(
-                "DELETE FROM templates WHERE user_id = %s AND template_name = %s",
-                (user_id, template_name)
-            )
-            conn.commit()
-            return cursor.rowcount > 0
+        rowcount = await pool.execute(
+            "DELETE FROM templates WHERE user_id = %s AND template_name = %s",
+            (user_id, template_name)
+        )
+        return rowcount > 0
     except Exception as e:
         logger.error(f"DB Error in delete_template: {e}")
         return False
-    finally:
-        if conn:
-            conn.close()
 
 async def list_templates(user_id: int, category: Optional[str] = None) -> List[Tuple[str, str]]:
-    conn = None
-    try:
-        conn = get_db_connection()
-        with conn.cursor() as cursor:
-            if category:
-                cursor.execute(
-                    "SELECT template_name, category FROM templates WHERE user_id = %s AND category = %s ORDER BY template_name",
-                    (user_id, category)
-                )
-            else:
-                cursor.execute(
-                    "SELECT template_name, category FROM templates WHERE user_id = %s ORDER BY template_name",
-                    (user_id,)
-                )
-            return [(row[0], row[1]) for row in cursor.fetchall()]
+    try:
+        if category:
+            rows = await pool.fetchall(
+                "SELECT template_name, category FROM templates WHERE user_id = %s AND category = %s ORDER BY template_name",
+                (user_id, category)
+            )
+        else:
+            rows = await pool.fetchall(
+                "SELECT template_name, category FROM templates WHERE user_id = %s ORDER BY template_name",
+                (user_id,)
+            )
+        return [(row[0], row[1]) for row in rows]
     except Exception as e:
         logger.error(f"DB Error in list_templates: {e}")
         return []
-    finally:
-        if conn:
-            conn.close()
 
 async def list_categories(user_id: int) -> List[Tuple[str, int]]:
-    conn = None
     try:
-        conn = get_db_connection()
-        with conn.cursor() as cursor:
-            cursor.execute(
-                """
-                SELECT category, COUNT(*) as count
-                FROM templates
-                WHERE user_id = %s
-                GROUP BY category
-                ORDER BY category
-                """,
-                (user_id,)
-            )
-            return [(row[0], row[1]) for row in cursor.fetchall()]
+        rows = await pool.fetchall(
+            """
+            SELECT category, COUNT(*) as count
+            FROM templates
+            WHERE user_id = %s
+            GROUP BY category
+            ORDER BY category
+            """,
+            (user_id,)
+        )
+        return [(row[0], row[1]) for row in rows]
     except Exception as e:
         logger.error(f"DB Error in list_categories: {e}")
         return []
-    finally:
-        if conn:
-            conn.close()
 
 async def add_speed_server(name: str, url: str) -> bool:
-    conn = None
     try:
-        conn = get_db_connection()
-        with conn.cursor() as cursor:
-            cursor.execute(
-                "INSERT INTO speed_servers (name, url) VALUES (%s, %s)",
-                (name, url)
-            )
-            conn.commit()
-            return True
+        await pool.execute(
+            "INSERT INTO speed_servers (name, url) VALUES (%s, %s)",
+            (name, url)
+        )
+        return True
     except Exception as e:
         logger.error(f"DB Error: {e}")
         return False
-    finally:
-        if conn:
-            conn.close()
 
 async def remove_speed_server(name: str) -> bool:
-    conn = None
     try:
-        conn = get_db_connection()
-        with conn.cursor() as cursor:
-            cursor.execute(
-                "DELETE FROM speed_servers WHERE name = %s",
-                (name,)
-            )
-            conn.commit()
-            return cursor.rowcount > 0
+        rowcount = await pool.execute(
+            "DELETE FROM speed_servers WHERE name = %s",
+            (name,)
+        )
+        return rowcount > 0
     except Exception as e:
         logger.error(f"DB Error: {e}")
         return False
-    finally:
-        if conn:
-            conn.close()
 
 async def list_speed_servers() -> List[Dict[str, str]]:
-    conn = None
     try:
-        conn = get_db_connection()
-        with conn.cursor() as cursor:
-            cursor.execute(
-                "SELECT id, name, url FROM speed_servers ORDER BY id"
-            )
-            return [{"id": row[0], "name": row[1], "url": row[2]} for row in cursor.fetchall()]
+        rows = await pool.fetchall(
+            "SELECT id, name, url FROM speed_servers ORDER BY id"
+        )
+        return [{"id": row[0], "name": row[1], "url": row[2]} for row in rows]
     except Exception as e:
         logger.error(f"DB Error: {e}")
         return []
-    finally:
-        if conn:
-            conn.close()
 
 async def get_speed_server(server_id: int) -> Optional[Dict[str, str]]:
-    conn = None
     try:
-        conn = get_db_connection()
-        with conn.cursor() as cursor:
-            cursor.execute(
-                "SELECT name, url FROM speed_servers WHERE id = %s",
-                (server_id,)
-            )
-            result = cursor.fetchone()
-            return {"name": result[0], "url": result[1]} if result else None
+        result = await pool.fetchone(
+            "SELECT name, url FROM speed_servers WHERE id = %s",
+            (server_id,)
+        )
+        return {"name": result[0], "url": result[1]} if result else None
     except Exception as e:
         logger.error(f"DB Error: {e}")
         return None
-    finally:
-        if conn:
-            conn.close()
 
-async def voice_message_exists(user_id: int, voice_name: str) -> bool:
-    conn = None
+def _acquire_media_blob(cursor, kind: str, content_hash: str, file_path: str, source_unique_id: Optional[str]):
+    cursor.execute("""
+        INSERT INTO media_blobs (content_hash, file_path, refcount) VALUES (%s, %s, 1)
+        ON CONFLICT (content_hash) DO UPDATE SET refcount = media_blobs.refcount + 1
+    """, (content_hash, file_path))
+    if source_unique_id:
+        cursor.execute("""
+            INSERT INTO media_sources (kind, file_unique_id, content_hash) VALUES (%s, %s, %s)
+            ON CONFLICT (kind, file_unique_id) DO UPDATE SET content_hash = EXCLUDED.content_hash
+        """, (kind, source_unique_id, content_hash))
+
+# Блокировки файлов хранилища по хэшу: перенос файла с сохранением ссылки на него
+# и удаление файла без ссылок не пересекаются
+_media_blob_locks: "weakref.WeakValueDictionary[str, asyncio.Lock]" = weakref.WeakValueDictionary()
+
+def media_blob_lock(content_hash: str) -> asyncio.Lock:
+    lock = _media_blob_locks.get(content_hash)
+    if lock is None:
+        lock = _media_blob_locks[content_hash] = asyncio.Lock()
+    return lock
+
+def _release_row_media(cursor, row: Optional[tuple]) -> Tuple[bool, Optional[Tuple[str, Optional[str]]]]:
+    """Снимает ссылку удалённой строки (file_path, content_hash) на файл.
+
+    Возвращает (строка была, (путь, хэш) файла, который больше никому не нужен).
+    Строки, сохранённые до появления хранилища, владеют своим файлом целиком.
+    """
+    if not row:
+        return False, None
+    file_path, content_hash = row
+    if not content_hash:
+        return True, (file_path, None)
+    cursor.execute(
+        "UPDATE media_blobs SET refcount = refcount - 1 WHERE content_hash = %s RETURNING refcount, file_path",
+        (content_hash,)
+    )
+    blob = cursor.fetchone()
+    if blob and blob[0] <= 0:
+        cursor.execute("DELETE FROM media_blobs WHERE content_hash = %s", (content_hash,))
+        return True, (blob[1], content_hash)
+    return True, None
+
+async def _remove_media_file(file_path: str, content_hash: Optional[str] = None):
+    if content_hash:
+        async with media_blob_lock(content_hash):
+            # Пока удаление ждало блокировку, на файл могла сослаться новая запись
+            if await media_blob_exists(content_hash):
+                return
+            if os.path.exists(file_path):
+                os.remove(file_path)
+    elif os.path.exists(file_path):
+        os.remove(file_path)
+    await delete_file_id(os.path.normpath(file_path))
+
+async def get_media_blob_by_source(kind: str, file_unique_id: str) -> Optional[Tuple[str, str]]:
+    """Возвращает (content_hash, file_path) результата, уже полученного из этого файла Telegram."""
     try:
-        conn = get_db_connection()
-        with conn.cursor() as cursor:
+        return await pool.fetchone("""
+            SELECT b.content_hash, b.file_path
+            FROM media_sources s JOIN media_blobs b ON b.content_hash = s.content_hash
+            WHERE s.kind = %s AND s.file_unique_id = %s
+        """, (kind, file_unique_id))
+    except Exception as e:
+        logger.error(f"DB Error in get_media_blob_by_source: {e}")
+        return None
+
+async def media_blob_exists(content_hash: str) -> bool:
+    try:
+        row = await pool.fetchone("SELECT 1 FROM media_blobs WHERE content_hash = %s", (content_hash,))
+        return row is not None
+    except Exception as e:
+        logger.error(f"DB Error in media_blob_exists: {e}")
+        # Не уверены — считаем, что файл используется, и не удаляем его
+        return True
+
+async def list_media_without_metadata() -> List[Dict[str, Any]]:
+    """Возвращает голосовые и видеокружки, сохранённые до появления каталога метаданных."""
+    try:
+        rows = []
+        for kind, (table, name_column) in MEDIA_TABLES.items():
+            result = await pool.fetchall(
+                f"SELECT user_id, {name_column}, file_path, content_hash FROM {table} WHERE file_size IS NULL"
+            )
+            rows.extend({"kind": kind, "user_id": row[0], "name": row[1], "file_path": row[2],
+                         "content_hash": row[3]} for row in result)
+        return rows
+    except Exception as e:
+        logger.error(f"DB Error in list_media_without_metadata: {e}")
+        return []
+
+async def update_media_metadata(kind: str, user_id: int, name: str, metadata: Dict[str, Any],
+                                content_hash: Optional[str] = None, file_path: Optional[str] = None) -> bool:
+    """Записывает метаданные; если передан content_hash, переводит строку на файл из хранилища."""
+    table, name_column = MEDIA_TABLES[kind]
+
+    def _update(cursor):
+        assignments = ", ".join(f"{column} = %s" for column in MEDIA_METADATA_COLUMNS)
+        params = [metadata.get(column) for column in MEDIA_METADATA_COLUMNS]
+        if content_hash:
             cursor.execute(
-                "SELECT 1 FROM voice_messages WHERE user_id = %s AND voice_name = %s",
-                (user_id, voice_name)
+                f"UPDATE {table} SET {assignments}, file_path = %s, content_hash = %s "
+                f"WHERE user_id = %s AND {name_column} = %s AND content_hash IS NULL",
+                (*params, file_path, content_hash, user_id, name)
             )
-            return cursor.fetchone() is not None
+            updated = cursor.rowcount > 0
+            if updated:
+                _acquire_media_blob(cursor, kind, content_hash, file_path, None)
+            return updated
+        cursor.execute(
+            f"UPDATE {table} SET {assignments} WHERE user_id = %s AND {name_column} = %s",
+            (*params, user_id, name)
+        )
+        return cursor.rowcount > 0
+
+    try:
+        return await pool.run(_update)
+    except Exception as e:
+        logger.error(f"DB Error in update_media_metadata: {e}")
+        return False
+
+async def voice_message_exists(user_id: int, voice_name: str) -> bool:
+    try:
+        row = await pool.fetchone(
+            "SELECT 1 FROM voice_messages WHERE user_id = %s AND voice_name = %s",
+            (user_id, voice_name)
+        )
+        return row is not None
     except Exception as e:
         logger.error(f"DB Error: {e}")
         return False
-    finally:
-        if conn:
-            conn.close()
 
-async def save_voice_message(user_id: int, voice_name: str, file_path: str, category: str = "без категории") -> bool:
-    conn = None
+async def save_voice_message(user_id: int, voice_name: str, file_path: str, category: str = "без категории",
+                             content_hash: Optional[str] = None, source_unique_id: Optional[str] = None,
+                             metadata: Optional[Dict[str, Any]] = None) -> bool:
+    """Сохраняет запись вместе с метаданными; если указан content_hash, увеличивает счётчик ссылок на файл."""
+    metadata = metadata or {}
+
+    def _save(cursor):
+        if content_hash:
+            _acquire_media_blob(cursor, "voice", content_hash, file_path, source_unique_id)
+        cursor.execute(
+            f"INSERT INTO voice_messages (user_id, voice_name, file_path, category, content_hash, "
+            f"{', '.join(MEDIA_METADATA_COLUMNS)}) VALUES (%s, %s, %s, %s, %s{', %s' * len(MEDIA_METADATA_COLUMNS)})",
+            (user_id, voice_name, file_path, category, content_hash,
+             *(metadata.get(column) for column in MEDIA_METADATA_COLUMNS))
+        )
+
     try:
-        conn = get_db_connection()
-        with conn.cursor() as cursor:
-            cursor.execute(
-                "INSERT INTO voice_messages (user_id, voice_name, file_path, category) VALUES (%s, %s, %s, %s)",
-                (user_id, voice_name, file_path, category)
-            )
-            conn.commit()
-            return True
+        await pool.run(_save)
+        return True
     except Exception as e:
         logger.error(f"DB Error in save_voice_message: {e}")
         return False
-    finally:
-        if conn:
-            conn.close()
 
 async def delete_voice_message(user_id: int, voice_name: str) -> bool:
-    conn = None
+    """Удаляет запись; файл удаляется с диска, только если на него больше нет ссылок."""
+    def _delete(cursor):
+        cursor.execute(
+            "DELETE FROM voice_messages WHERE user_id = %s AND voice_name = %s RETURNING file_path, content_hash",
+            (user_id, voice_name)
+        )
+        return _release_row_media(cursor, cursor.fetchone())
+
     try:
-        conn = get_db_connection()
-        with conn.cursor() as cursor:
-            cursor.execute(
-                "SELECT file_path FROM voice_messages WHERE user_id = %s AND voice_name = %s",
-                (user_id, voice_name)
-            )
-            result = cursor.fetchone()
-            if result:
-                file_path = result[0]
-                cursor.execute(
-                    "DELETE FROM voice_messages WHERE user_id = %s AND voice_name = %s",
-                    (user_id, voice_name)
-                )
-                conn.commit()
-                if os.path.exists(file_path):
-                    os.remove(file_path)
-                return True
-            return False
+        deleted, unused = await pool.run(_delete)
+        if unused:
+            await _remove_media_file(*unused)
+        return deleted
     except Exception as e:
         logger.error(f"DB Error: {e}")
         return False
-    finally:
-        if conn:
-            conn.close()
 
 async def list_voice_messages(user_id: int, category: Optional[str] = None) -> List[Dict[str, str]]:
-    conn = None
-    try:
-        conn = get_db_connection()
-        with conn.cursor() as cursor:
-            if category:
-                cursor.execute(
-                    "SELECT voice_name, category FROM voice_messages WHERE user_id = %s AND category = %s ORDER BY voice_name",
-                    (user_id, category)
-                )
-            else:
-                cursor.execute(
-                    "SELECT voice_name, category FROM voice_messages WHERE user_id = %s ORDER BY voice_name",
-                    (user_id,)
-                )
-            return [{"name": row[0], "category": row[1]} for row in cursor.fetchall()]
+    try:
+        if category:
+            rows = await pool.fetchall(
+                "SELECT voice_name, category FROM voice_messages WHERE user_id = %s AND category = %s ORDER BY voice_name",
+                (user_id, category)
+            )
+        else:
+            rows = await pool.fetchall(
+                "SELECT voice_name, category FROM voice_messages WHERE user_id = %s ORDER BY voice_name",
+                (user_id,)
+            )
+        return [{"name": row[0], "category": row[1]} for row in rows]
     except Exception as e:
         logger.error(f"DB Error in list_voice_messages: {e}")
         return []
-    finally:
-        if conn:
-            conn.close()
 
 async def get_voice_message(user_id: int, voice_name: str) -> Optional[Dict[str, str]]:
-    conn = None
     try:
-        conn = get_db_connection()
-        with conn.cursor() as cursor:
-            cursor.execute(
-                "SELECT file_path, category FROM voice_messages WHERE user_id = %s AND voice_name = %s",
-                (user_id, voice_name)
-            )
-            result = cursor.fetchone()
-            return {"file_path": result[0], "category": result[1]} if result else None
+        result = await pool.fetchone(
+            f"SELECT file_path, category, {', '.join(MEDIA_METADATA_COLUMNS)} "
+            f"FROM voice_messages WHERE user_id = %s AND voice_name = %s",
+            (user_id, voice_name)
+        )
+        if not result:
+            return None
+        return {"file_path": result[0], "category": result[1], **dict(zip(MEDIA_METADATA_COLUMNS, result[2:]))}
     except Exception as e:
         logger.error(f"DB Error in get_voice_message: {e}")
         return None
-    finally:
-        if conn:
-            conn.close()
 
 async def list_voice_categories(user_id: int) -> List[Tuple[str, int]]:
-    conn = None
     try:
-        conn = get_db_connection()
-        with conn.cursor() as cursor:
-            cursor.execute(
-                """
-                SELECT category, COUNT(*) as count
-                FROM voice_messages
-                WHERE user_id = %s
-                GROUP BY category
-                ORDER BY category
-                """,
-                (user_id,)
-            )
-            return [(row[0], row[1]) for row in cursor.fetchall()]
+        rows = await pool.fetchall(
+            """
+            SELECT category, COUNT(*) as count
+            FROM voice_messages
+            WHERE user_id = %s
+            GROUP BY category
+            ORDER BY category
+            """,
+            (user_id,)
+        )
+        return [(row[0], row[1]) for row in rows]
     except Exception as e:
         logger.error(f"DB Error in list_voice_categories: {e}")
         return []
-    finally:
-        if conn:
-            conn.close()
 
 async def anim_exists(user_id: int, anim_name: str) -> bool:
-    conn = None
     try:
-        conn = get_db_connection()
-        with conn.cursor() as cursor:
-            cursor.execute(
-                "SELECT 1 FROM animations WHERE user_id = %s AND anim_name = %s",
-                (user_id, anim_name)
-            )
-            return cursor.fetchone() is not None
+        row = await pool.fetchone(
+            "SELECT 1 FROM animations WHERE user_id = %s AND anim_name = %s",
+            (user_id, anim_name)
+        )
+        return row is not None
     except Exception as e:
         logger.error(f"DB Error: {e}")
         return False
-    finally:
-        if conn:
-            conn.close()
 
 async def save_animation(user_id: int, anim_name: str, frames: List[str]) -> bool:
-    conn = None
     try:
-        conn = get_db_connection()
-        with conn.cursor() as cursor:
-            frames_str = " #$ ".join(frames)
-            cursor.execute(
-                "INSERT INTO animations (user_id, anim_name, frames) VALUES (%s, %s, %s)",
-                (user_id, anim_name, frames_str)
-            )
-            conn.commit()
-            return True
+        frames_str = " #$ ".join(frames)
+        await pool.execute(
+            "INSERT INTO animations (user_id, anim_name, frames) VALUES (%s, %s, %s)",
+            (user_id, anim_name, frames_str)
+        )
+        return True
     except Exception as e:
         logger.error(f"DB Error: {e}")
         return False
-    finally:
-        if conn:
-            conn.close()
 
 async def delete_animation(user_id: int, anim_name: str) -> bool:
-    conn = None
     try:
-        conn = get_db_connection()
-        with conn.cursor() as cursor:
-            cursor.execute(
-                "DELETE FROM animations WHERE user_id = %s AND anim_name = %s",
-                (user_id, anim_name)
-            )
-            conn.commit()
-            return cursor.rowcount > 0
+        rowcount = await pool.execute(
+            "DELETE FROM animations WHERE user_id = %s AND anim_name = %s",
+            (user_id, anim_name)
+        )
+        return rowcount > 0
     except Exception as e:
         logger.error(f"DB Error: {e}")
         return False
-    finally:
-        if conn:
-            conn.close()
 
 async def get_animation(user_id: int, anim_name: str) -> Optional[List[str]]:
-    conn = None
     try:
-        conn = get_db_connection()
-        with conn.cursor() as cursor:
-            cursor.execute(
-                "SELECT frames FROM animations WHERE user_id = %s AND anim_name = %s",
-                (user_id, anim_name)
-            )
-            result = cursor.fetchone()
-            if result:
-                return [frame.strip() for frame in result[0].split("#$") if frame.strip()]
-            return None
+        result = await pool.fetchone(
+            "SELECT frames FROM animations WHERE user_id = %s AND anim_name = %s",
+            (user_id, anim_name)
+        )
+        if result:
+            return [frame.strip() for frame in result[0].split("#$") if frame.strip()]
+        return None
     except Exception as e:
         logger.error(f"DB Error: {e}")
         return None
-    finally:
-        if conn:
-            conn.close()
 
 async def list_animations(user_id: int) -> List[str]:
-    conn = None
     try:
-        conn = get_db_connection()
-        with conn.cursor() as cursor:
-            cursor.execute(
-                "SELECT anim_name FROM animations WHERE user_id = %s ORDER BY anim_name",
-                (user_id,)
-            )
-            return [row[0] for row in cursor.fetchall()]
+        rows = await pool.fetchall(
+            "SELECT anim_name FROM animations WHERE user_id = %s ORDER BY anim_name",
+            (user_id,)
+        )
+        return [row[0] for row in rows]
     except Exception as e:
         logger.error(f"DB Error: {e}")
         return []
-    finally:
-        if conn:
-            conn.close()
 
 async def video_note_exists(user_id: int, video_note_name: str) -> bool:
-    conn = None
     try:
-        conn = get_db_connection()
-        with conn.cursor() as cursor:
-            cursor.execute(
-                "SELECT 1 FROM video_notes WHERE user_id = %s AND video_note_name = %s",
-                (user_id, video_note_name)
-            )
-            return cursor.fetchone() is not None
+        row = await pool.fetchone(
+            "SELECT 1 FROM video_notes WHERE user_id = %s AND video_note_name = %s",
+            (user_id, video_note_name)
+        )
+        return row is not None
     except Exception as e:
         logger.error(f"DB Error: {e}")
         return False
-    finally:
-        if conn:
-            conn.close()
 
-async def save_video_note(user_id: int, video_note_name: str, file_path: str) -> bool:
-    conn = None
+async def save_video_note(user_id: int, video_note_name: str, file_path: str,
+                          content_hash: Optional[str] = None, source_unique_id: Optional[str] = None,
+                          metadata: Optional[Dict[str, Any]] = None) -> bool:
+    """Сохраняет запись вместе с метаданными; если указан content_hash, увеличивает счётчик ссылок на файл."""
+    metadata = metadata or {}
+
+    def _save(cursor):
+        if content_hash:
+            _acquire_media_blob(cursor, "video_note", content_hash, file_path, source_unique_id)
+        cursor.execute(
+            f"INSERT INTO video_notes (user_id, video_note_name, file_path, content_hash, "
+            f"{', '.join(MEDIA_METADATA_COLUMNS)}) VALUES (%s, %s, %s, %s{', %s' * len(MEDIA_METADATA_COLUMNS)})",
+            (user_id, video_note_name, file_path, content_hash,
+             *(metadata.get(column) for column in MEDIA_METADATA_COLUMNS))
+        )
+
     try:
-        conn = get_db_connection()
-        with conn.cursor() as cursor:
-            cursor.execute(
-                "INSERT INTO video_notes (user_id, video_note_name, file_path) VALUES (%s, %s, %s)",
-                (user_id, video_note_name, file_path)
-            )
-            conn.commit()
-            return True
+        await pool.run(_save)
+        return True
     except Exception as e:
         logger.error(f"DB Error: {e}")
         return False
-    finally:
-        if conn:
-            conn.close()
 
 async def delete_video_note(user_id: int, video_note_name: str) -> bool:
-    conn = None
+    """Удаляет запись; файл удаляется с диска, только если на него больше нет ссылок."""
+    def _delete(cursor):
+        cursor.execute(
+            "DELETE FROM video_notes WHERE user_id = %s AND video_note_name = %s RETURNING file_path, content_hash",
+            (user_id, video_note_name)
+        )
+        return _release_row_media(cursor, cursor.fetchone())
+
     try:
-        conn = get_db_connection()
-        with conn.cursor() as cursor:
-            cursor.execute(
-                "SELECT file_path FROM video_notes WHERE user_id = %s AND video_note_name = %s",
-                (user_id, video_note_name)
-            )
-            result = cursor.fetchone()
-            if result:
-                file_path = result[0]
-                cursor.execute(
-                    "DELETE FROM video_notes WHERE user_id = %s AND video_note_name = %s",
-                    (user_id, video_note_name)
-                )
-                conn.commit()
-                if os.path.exists(file_path):
-                    os.remove(file_path)
-                return True
-            return False
+        deleted, unused = await pool.run(_delete)
+        if unused:
+            await _remove_media_file(*unused)
+        return deleted
     except Exception as e:
         logger.error(f"DB Error: {e}")
         return False
-    finally:
-        if conn:
-            conn.close()
 
 async def list_video_notes(user_id: int) -> List[Dict[str, str]]:
-    conn = None
     try:
-        conn = get_db_connection()
-        with conn.cursor() as cursor:
-            cursor.execute(
-                "SELECT video_note_name, file_path FROM video_notes WHERE user_id = %s ORDER BY video_note_name",
-                (user_id,)
-            )
-            return [{"name": row[0], "file_path": row[1]} for row in cursor.fetchall()]
+        rows = await pool.fetchall(
+            "SELECT video_note_name, file_path FROM video_notes WHERE user_id = %s ORDER BY video_note_name",
+            (user_id,)
+        )
+        return [{"name": row[0], "file_path": row[1]} for row in rows]
     except Exception as e:
         logger.error(f"DB Error: {e}")
         return []
-    finally:
-        if conn:
-            conn.close()
 
-async def get_video_note(user_id: int, video_note_name: str) -> Optional[str]:
-    conn = None
+async def get_video_note(user_id: int, video_note_name: str) -> Optional[Dict[str, Any]]:
     try:
-        conn = get_db_connection()
-        with conn.cursor() as cursor:
-            cursor.execute(
-                "SELECT file_path FROM video_notes WHERE user_id = %s AND video_note_name = %s",
-                (user_id, video_note_name)
-            )
-            result = cursor.fetchone()
-            return result[0] if result else None
+        result = await pool.fetchone(
+            f"SELECT file_path, {', '.join(MEDIA_METADATA_COLUMNS)} "
+            f"FROM video_notes WHERE user_id = %s AND video_note_name = %s",
+            (user_id, video_note_name)
+        )
+        if not result:
+            return None
+        return {"file_path": result[0], **dict(zip(MEDIA_METADATA_COLUMNS, result[1:]))}
     except Exception as e:
         logger.error(f"DB Error: {e}")
         return None
-    finally:
-        if conn:
-            conn.close()
 
 async def add_fake_activity(user_id: int, chat_id: int, activity_type: str) -> bool:
-    conn = None
     try:
-        conn = get_db_connection()
-        with conn.cursor() as cursor:
-            cursor.execute(
-                "INSERT INTO fake_activities (user_id, chat_id, activity_type) VALUES (%s, %s, %s)",
-                (user_id, chat_id, activity_type)
-            )
-            conn.commit()
-            return True
+        await pool.execute(
+            "INSERT INTO fake_activities (user_id, chat_id, activity_type) VALUES (%s, %s, %s)",
+            (user_id, chat_id, activity_type)
+        )
+        return True
     except Exception as e:
         logger.error(f"DB Error: {e}")
         return False
-    finally:
-        if conn:
-            conn.close()
 
 async def remove_fake_activity(user_id: int, chat_id: int, activity_type: str) -> bool:
-    conn = None
     try:
-        conn = get_db_connection()
-        with conn.cursor() as cursor:
-            cursor.execute(
-                "DELETE FROM fake_activities WHERE user_id = %s AND chat_id = %s AND activity_type = %s",
-                (user_id, chat_id, activity_type)
-            )
-            conn.commit()
-            return cursor.rowcount > 0
+        rowcount = await pool.execute(
+            "DELETE FROM fake_activities WHERE user_id = %s AND chat_id = %s AND activity_type = %s",
+            (user_id, chat_id, activity_type)
+        )
+        return rowcount > 0
     except Exception as e:
         logger.error(f"DB Error: {e}")
         return False
-    finally:
-        if conn:
-            conn.close()
 
 async def list_fake_activities(user_id: int, activity_type: str) -> List[Dict[str, int]]:
-    conn = None
     try:
-        conn = get_db_connection()
-        with conn.cursor() as cursor:
-            cursor.execute(
-                "SELECT chat_id FROM fake_activities WHERE user_id = %s AND activity_type = %s ORDER BY chat_id",
-                (user_id, activity_type)
-            )
-            return [{"chat_id": row[0]} for row in cursor.fetchall()]
+        rows = await pool.fetchall(
+            "SELECT chat_id FROM fake_activities WHERE user_id = %s AND activity_type = %s ORDER BY chat_id",
+            (user_id, activity_type)
+        )
+        return [{"chat_id": row[0]} for row in rows]
     except Exception as e:
         logger.error(f"DB Error: {e}")
         return []
-    finally:
-        if conn:
-            conn.close()
+
+async def load_all_fake_activities() -> List[Dict[str, Any]]:
+    """Возвращает фейковые активности всех пользователей для восстановления при старте."""
+    try:
+        rows = await pool.fetchall("SELECT user_id, chat_id, activity_type FROM fake_activities")
+        return [{
+            'user_id': row[0],
+            'chat_id': row[1],
+            'activity_type': row[2]
+        } for row in rows]
+    except Exception as e:
+        logger.error(f"DB Error in load_all_fake_activities: {e}")
+        return []
 
 async def set_user_prefix(user_id: int, prefix: str) -> bool:
     """Устанавливает префикс для пользователя."""
-    conn = None
     try:
-        conn = get_db_connection()
-        with conn.cursor() as cursor:
-            cursor.execute(
-                """
-                INSERT INTO settings (user_id, prefix) VALUES (%s, %s)
-                ON CONFLICT (user_id) DO UPDATE SET prefix = %s
-                """,
-                (user_id, prefix, prefix)
-            )
-            conn.commit()
-            return True
+        await pool.execute(
+            """
+            INSERT INTO settings (user_id, prefix) VALUES (%s, %s)
+            ON CONFLICT (user_id) DO UPDATE SET prefix = %s
+            """,
+            (user_id, prefix, prefix)
+        )
+        user_state.set(user_id, "prefix", prefix)
+        return True
     except Exception as e:
         logger.error(f"Ошибка установки префикса: {e}")
         return False
-    finally:
-        if conn:
-            conn.close()
 
 async def get_user_prefix(user_id: int) -> str:
     """Получает префикс пользователя или возвращает '.' по умолчанию."""
-    conn = None
+    cached = user_state.get(user_id, "prefix")
+    if cached is not None:
+        return cached
     try:
-        conn = get_db_connection()
-        with conn.cursor() as cursor:
-            cursor.execute(
-                "SELECT prefix FROM settings WHERE user_id = %s",
-                (user_id,)
-            )
-            result = cursor.fetchone()
-            return result[0] if result else "."
+        result = await pool.fetchone(
+            "SELECT prefix FROM settings WHERE user_id = %s",
+            (user_id,)
+        )
+        return result[0] if result else DEFAULT_PREFIX
     except Exception as e:
         logger.error(f"Ошибка получения префикса: {e}")
-        return "."
-    finally:
-        if conn:
-            conn.close()
+        return DEFAULT_PREFIX
 
 async def alias_exists(user_id: int, alias_name: str) -> bool:
     """Проверяет, существует ли алиас."""
-    conn = None
+    cached = user_state.has_alias(user_id, alias_name)
+    if cached is not None:
+        return cached
     try:
-        conn = get_db_connection()
-        with conn.cursor() as cursor:
-            cursor.execute(
-                "SELECT 1 FROM aliases WHERE user_id = %s AND alias_name = %s",
-                (user_id, alias_name)
-            )
-            return cursor.fetchone() is not None
+        row = await pool.fetchone(
+            "SELECT 1 FROM aliases WHERE user_id = %s AND alias_name = %s",
+            (user_id, alias_name)
+        )
+        return row is not None
     except Exception as e:
         logger.error(f"DB Error: {e}")
         return False
-    finally:
-        if conn:
-            conn.close()
 
 async def save_alias(user_id: int, alias_name: str, command: str) -> bool:
     """Сохраняет алиас в базу."""
-    conn = None
     try:
-        conn = get_db_connection()
-        with conn.cursor() as cursor:
-            cursor.execute(
-                "INSERT INTO aliases (user_id, alias_name, command) VALUES (%s, %s, %s)",
-                (user_id, alias_name, command)
-            )
-            conn.commit()
-            return True
+        await pool.execute(
+            "INSERT INTO aliases (user_id, alias_name, command) VALUES (%s, %s, %s)",
+            (user_id, alias_name, command)
+        )
+        user_state.add_alias(user_id, alias_name)
+        return True
     except Exception as e:
         logger.error(f"DB Error: {e}")
         return False
-    finally:
-        if conn:
-            conn.close()
 
 async def delete_alias(user_id: int, alias_name: str) -> bool:
     """Удаляет алиас."""
-    conn = None
     try:
-        conn = get_db_connection()
-        with conn.cursor() as cursor:
-            cursor.execute(
-                "DELETE FROM aliases WHERE user_id = %s AND alias_name = %s",
-                (user_id, alias_name)
-            )
-            conn.commit()
-            return cursor.rowcount > 0
+        rowcount = await pool.execute(
+            "DELETE FROM aliases WHERE user_id = %s AND alias_name = %s",
+            (user_id, alias_name)
+        )
+        user_state.remove_alias(user_id, alias_name)
+        return rowcount > 0
     except Exception as e:
         logger.error(f"DB Error: {e}")
         return False
-    finally:
-        if conn:
-            conn.close()
 
 async def list_aliases(user_id: int) -> List[Dict[str, str]]:
     """Возвращает список алиасов пользователя."""
-    conn = None
     try:
-        conn = get_db_connection()
-        with conn.cursor() as cursor:
-            cursor.execute(
-                "SELECT alias_name, command FROM aliases WHERE user_id = %s ORDER BY alias_name",
-                (user_id,)
-            )
-            return [{"name": row[0], "command": row[1]} for row in cursor.fetchall()]
+        rows = await pool.fetchall(
+            "SELECT alias_name, command FROM aliases WHERE user_id = %s ORDER BY alias_name",
+            (user_id,)
+        )
+        return [{"name": row[0], "command": row[1]} for row in rows]
     except Exception as e:
         logger.error(f"DB Error: {e}")
         return []
-    finally:
-        if conn:
-            conn.close()
 
 async def get_alias_command(user_id: int, alias_name: str) -> Optional[str]:
     """Получает команду, связанную с алиасом."""
-    conn = None
     try:
-        conn = get_db_connection()
-        with conn.cursor() as cursor:
-            cursor.execute(
-                "SELECT command FROM aliases WHERE user_id = %s AND alias_name = %s",
-                (user_id, alias_name)
-            )
-            result = cursor.fetchone()
-            return result[0] if result else None
+        result = await pool.fetchone(
+            "SELECT command FROM aliases WHERE user_id = %s AND alias_name = %s",
+            (user_id, alias_name)
+        )
+        return result[0] if result else None
     except Exception as e:
         logger.error(f"DB Error: {e}")
         return None
-    finally:
-        if conn:
-            conn.close()
 
 async def get_edit_text(user_id: int) -> str:
     """Получает текст редактирования для пользователя."""
+    cached = user_state.get(user_id, "edit_text")
+    if cached is not None:
+        return cached
     try:
-        conn = get_db_connection()
-        with conn.cursor(cursor_factory=DictCursor) as cursor:
-            cursor.execute("SELECT edit_text FROM settings WHERE user_id = %s", (user_id,))
-            result = cursor.fetchone()
-            return result['edit_text'] if result else '🫥🫥🫥'
+        result = await pool.fetchone("SELECT edit_text FROM settings WHERE user_id = %s", (user_id,))
+        return result[0] if result else DEFAULT_EDIT_TEXT
     except Exception as e:
         logger.error(f"Ошибка при получении edit_text для user_id={user_id}: {e}")
-        return '🫥🫥🫥'
-    finally:
-        if conn:
-            conn.close()
+        return DEFAULT_EDIT_TEXT
 
 async def set_edit_text(user_id: int, edit_text: str) -> bool:
     """Устанавливает текст редактирования для пользователя."""
     try:
-        conn = get_db_connection()
-        with conn.cursor() as cursor:
-            cursor.execute("""
-                INSERT INTO settings (user_id, edit_text)
-                VALUES (%s, %s)
-                ON CONFLICT (user_id)
-                DO UPDATE SET edit_text = %s
-            """, (user_id, edit_text, edit_text))
-            conn.commit()
-            return True
+        await pool.execute("""
+            INSERT INTO settings (user_id, edit_text)
+            VALUES (%s, %s)
+            ON CONFLICT (user_id)
+            DO UPDATE SET edit_text = %s
+        """, (user_id, edit_text, edit_text))
+        user_state.set(user_id, "edit_text", edit_text)
+        return True
     except Exception as e:
         logger.error(f"Ошибка при установке edit_text для user_id={user_id}: {e}")
         return False
-    finally:
-        if conn:
-            conn.close()
 
 async def get_delete_cmd(user_id: int) -> str:
     """Получает название команды удаления для пользователя."""
+    cached = user_state.get(user_id, "delete_cmd")
+    if cached is not None:
+        return cached
     try:
-        conn = get_db_connection()
-        with conn.cursor(cursor_factory=DictCursor) as cursor:
-            cursor.execute("SELECT delete_cmd FROM settings WHERE user_id = %s", (user_id,))
-            result = cursor.fetchone()
-            return result['delete_cmd'] if result else 'дд'
+        result = await pool.fetchone("SELECT delete_cmd FROM settings WHERE user_id = %s", (user_id,))
+        return result[0] if result else DEFAULT_DELETE_CMD
     except Exception as e:
         logger.error(f"Ошибка при получении delete_cmd для user_id={user_id}: {e}")
-        return 'дд'
-    finally:
-        if conn:
-            conn.close()
+        return DEFAULT_DELETE_CMD
 
 async def set_delete_cmd(user_id: int, delete_cmd: str) -> bool:
     """Устанавливает название команды удаления для пользователя."""
     try:
-        conn = get_db_connection()
-        with conn.cursor() as cursor:
-            cursor.execute("""
-                INSERT INTO settings (user_id, delete_cmd)
-                VALUES (%s, %s)
-                ON CONFLICT (user_id)
-                DO UPDATE SET delete_cmd = %s
-            """, (user_id, delete_cmd, delete_cmd))
-            conn.commit()
-            return True
+        await pool.execute("""
+            INSERT INTO settings (user_id, delete_cmd)
+            VALUES (%s, %s)
+            ON CONFLICT (user_id)
+            DO UPDATE SET delete_cmd = %s
+        """, (user_id, delete_cmd, delete_cmd))
+        user_state.set(user_id, "delete_cmd", delete_cmd)
+        return True
     except Exception as e:
         logger.error(f"Ошибка при установке delete_cmd для user_id={user_id}: {e}")
         return False
-    finally:
-        if conn:
-            conn.close()
 
-async def save_interval(user_id: int, interval_name: str, chat_id: int, interval_minutes: int, interval_text: str) -> bool:
-    conn = None
+async def save_interval(user_id: int, interval_name: str, chat_id: int, interval_minutes: int, interval_text: str,
+                        started_at: float) -> bool:
+    """Сохраняет интервал; started_at (unix-время) — точка отсчёта расписания."""
     try:
-        conn = get_db_connection()
-        with conn.cursor() as cursor:
-            cursor.execute(
-                "INSERT INTO intervals (user_id, interval_name, chat_id, interval_minutes, interval_text) VALUES (%s, %s, %s, %s, %s)",
-                (user_id, interval_name, chat_id, interval_minutes, interval_text)
-            )
-            conn.commit()
-            return True
+        await pool.execute(
+            "INSERT INTO intervals (user_id, interval_name, chat_id, interval_minutes, interval_text, started_at) "
+            "VALUES (%s, %s, %s, %s, %s, to_timestamp(%s))",
+            (user_id, interval_name, chat_id, interval_minutes, interval_text, started_at)
+        )
+        return True
     except Exception as e:
         logger.error(f"DB Error in save_interval: {e}")
         return False
-    finally:
-        if conn:
-            conn.close()
 
 async def delete_interval(user_id: int, interval_name: str) -> bool:
-    conn = None
     try:
-        conn = get_db_connection()
-        with conn.cursor() as cursor:
-            cursor.execute(
-                "DELETE FROM intervals WHERE user_id = %s AND interval_name = %s",
-                (user_id, interval_name)
-            )
-            conn.commit()
-            return cursor.rowcount > 0
+        rowcount = await pool.execute(
+            "DELETE FROM intervals WHERE user_id = %s AND interval_name = %s",
+            (user_id, interval_name)
+        )
+        return rowcount > 0
     except Exception as e:
         logger.error(f"DB Error in delete_interval: {e}")
         return False
-    finally:
-        if conn:
-            conn.close()
 
 async def list_intervals(user_id: int) -> List[Dict[str, Any]]:
-    conn = None
     try:
-        conn = get_db_connection()
-        with conn.cursor() as cursor:
-            cursor.execute(
-                "SELECT interval_name, chat_id, interval_minutes, interval_text FROM intervals WHERE user_id = %s",
-                (user_id,)
-            )
-            return [{
-                'interval_name': row[0],
-                'chat_id': row[1],
-                'interval_minutes': row[2],
-                'interval_text': row[3]
-            } for row in cursor.fetchall()]
+        rows = await pool.fetchall(
+            "SELECT interval_name, chat_id, interval_minutes, interval_text FROM intervals WHERE user_id = %s",
+            (user_id,)
+        )
+        return [{
+            'interval_name': row[0],
+            'chat_id': row[1],
+            'interval_minutes': row[2],
+            'interval_text': row[3]
+        } for row in rows]
     except Exception as e:
         logger.error(f"DB Error in list_intervals: {e}")
         return []
-    finally:
-        if conn:
-            conn.close()
+
+async def load_all_intervals() -> List[Dict[str, Any]]:
+    """Возвращает интервалы всех пользователей для восстановления расписания при старте."""
+    try:
+        rows = await pool.fetchall(
+            "SELECT user_id, interval_name, chat_id, interval_minutes, interval_text, "
+            "EXTRACT(EPOCH FROM started_at) FROM intervals"
+        )
+        return [{
+            'user_id': row[0],
+            'interval_name': row[1],
+            'chat_id': row[2],
+            'interval_minutes': row[3],
+            'interval_text': row[4],
+            'started_at': float(row[5])
+        } for row in rows]
+    except Exception as e:
+        logger.error(f"DB Error in load_all_intervals: {e}")
+        return []
 
 async def count_intervals(user_id: int) -> int:
-    conn = None
     try:
-        conn = get_db_connection()
-        with conn.cursor() as cursor:
-            cursor.execute(
-                "SELECT COUNT(*) FROM intervals WHERE user_id = %s",
-                (user_id,)
-            )
-            return cursor.fetchone()[0]
+        row = await pool.fetchone(
+            "SELECT COUNT(*) FROM intervals WHERE user_id = %s",
+            (user_id,)
+        )
+        return row[0]
     except Exception as e:
         logger.error(f"DB Error in count_intervals: {e}")
         return 0
-    finally:
-        if conn:
-            conn.close()
\ No newline at end of file
+
+def load_file_ids() -> List[Tuple[str, str, str]]:
+    """Загружает все сохранённые file_id (file_path, content_hash, file_id) при старте."""
+    def _load(cursor):
+        cursor.execute("SELECT file_path, content_hash, file_id FROM file_ids")
+        return cursor.fetchall()
+
+    try:
+        return db_pool.run_sync(_load)
+    except Exception as e:
+        logger.error(f"DB Error in load_file_ids: {e}")
+        return []
+
+async def save_file_id(file_path: str, content_hash: str, file_id: str) -> bool:
+    try:
+        await pool.execute("""
+            INSERT INTO file_ids (file_path, content_hash, file_id) VALUES (%s, %s, %s)
+            ON CONFLICT (file_path) DO UPDATE SET content_hash = EXCLUDED.content_hash, file_id = EXCLUDED.file_id
+        """, (file_path, content_hash, file_id))
+        return True
+    except Exception as e:
+        logger.error(f"DB Error in save_file_id: {e}")
+        return False
+
+async def delete_file_id(file_path: str) -> bool:
+    try:
+        rowcount = await pool.execute("DELETE FROM file_ids WHERE file_path = %s", (file_path,))
+        return rowcount > 0
+    except Exception as e:
+        logger.error(f"DB Error in delete_file_id: {e}")
+        return False
+
+async def get_api_cache(source: str, cache_key: str) -> Optional[Tuple[Any, Optional[float]]]:
+    """Возвращает (ответ, срок в unix-времени или None) из постоянного кэша API."""
+    try:
+        return await pool.fetchone("""
+            SELECT value, EXTRACT(EPOCH FROM expires_at)::float FROM api_cache
+            WHERE source = %s AND cache_key = %s AND (expires_at IS NULL OR expires_at > NOW())
+        """, (source, cache_key))
+    except Exception as e:
+        logger.error(f"DB Error in get_api_cache: {e}")
+        return None
+
+async def save_api_cache(source: str, cache_key: str, value: Any, expires_at: Optional[float]) -> bool:
+    """Сохраняет ответ API и заодно удаляет просроченные ответы того же источника."""
+    def _save(cursor):
+        cursor.execute("""
+            INSERT INTO api_cache (source, cache_key, value, expires_at) VALUES (%s, %s, %s::jsonb, to_timestamp(%s))
+            ON CONFLICT (source, cache_key) DO UPDATE SET value = EXCLUDED.value, expires_at = EXCLUDED.expires_at
+        """, (source, cache_key, json.dumps(value), expires_at))
+        cursor.execute("DELETE FROM api_cache WHERE source = %s AND expires_at < NOW()", (source,))
+
+    try:
+        await pool.run(_save)
+        return True
+    except Exception as e:
+        logger.error(f"DB Error in save_api_cache: {e}")
+        return False
+
+def load_rendered_file_ids(limit: int) -> List[Tuple[str, str]]:
+    """Загружает (ключ, file_id) недавно использованных изображений, от старых к новым."""
+    def _load(cursor):
+        cursor.execute("""
+            SELECT cache_key, file_id FROM (
+                SELECT cache_key, file_id, used_at FROM render_cache ORDER BY used_at DESC LIMIT %s
+            ) recent ORDER BY used_at
+        """, (limit,))
+        return cursor.fetchall()
+
+    try:
+        return db_pool.run_sync(_load)
+    except Exception as e:
+        logger.error(f"DB Error in load_rendered_file_ids: {e}")
+        return []
+
+async def save_rendered_file_id(cache_key: str, file_id: str, limit: int) -> bool:
+    """Сохраняет file_id изображения и удаляет самые давно использованные записи сверх limit."""
+    def _save(cursor):
+        cursor.execute("""
+            INSERT INTO render_cache (cache_key, file_id) VALUES (%s, %s)
+            ON CONFLICT (cache_key) DO UPDATE SET file_id = EXCLUDED.file_id, used_at = NOW()
+        """, (cache_key, file_id))
+        cursor.execute("""
+            DELETE FROM render_cache WHERE cache_key NOT IN (
+                SELECT cache_key FROM render_cache ORDER BY used_at DESC LIMIT %s
+            )
+        """, (limit,))
+
+    try:
+        await pool.run(_save)
+        return True
+    except Exception as e:
+        logger.error(f"DB Error in save_rendered_file_id: {e}")
+        return False
+
+async def touch_rendered_file_id(cache_key: str) -> bool:
+    try:
+        rowcount = await pool.execute("UPDATE render_cache SET used_at = NOW() WHERE cache_key = %s", (cache_key,))
+        return rowcount > 0
+    except Exception as e:
+        logger.error(f"DB Error in touch_rendered_file_id: {e}")
+        return False
+
+async def delete_rendered_file_id(cache_key: str) -> bool:
+    try:
+        rowcount = await pool.execute("DELETE FROM render_cache WHERE cache_key = %s", (cache_key,))
+        return rowcount > 0
+    except Exception as e:
+        logger.error(f"DB Error in delete_rendered_file_id: {e}")
+        return False
+
+async def create_delete_job(user_id: int, chat_id: int, edit_text: Optional[str],
+                            message_ids: List[int]) -> Optional[int]:
+    """Сохраняет задание массового удаления; edit_text None — удаление без редактирования."""
+    try:
+        row = await pool.fetchone(
+            "INSERT INTO delete_jobs (user_id, chat_id, edit_text, message_ids) VALUES (%s, %s, %s, %s) "
+            "RETURNING job_id",
+            (user_id, chat_id, edit_text, message_ids)
+        )
+        return row[0]
+    except Exception as e:
+        logger.error(f"DB Error in create_delete_job: {e}")
+        return None
+
+async def update_delete_job(job_id: int, message_ids: List[int]) -> bool:
+    """Запоминает, какие сообщения задания ещё не удалены."""
+    try:
+        rowcount = await pool.execute(
+            "UPDATE delete_jobs SET message_ids = %s WHERE job_id = %s",
+            (message_ids, job_id)
+        )
+        return rowcount > 0
+    except Exception as e:
+        logger.error(f"DB Error in update_delete_job: {e}")
+        return False
+
+async def finish_delete_job(job_id: int) -> bool:
+    try:
+        rowcount = await pool.execute("DELETE FROM delete_jobs WHERE job_id = %s", (job_id,))
+        return rowcount > 0
+    except Exception as e:
+        logger.error(f"DB Error in finish_delete_job: {e}")
+        return False
+
+async def load_delete_jobs() -> List[Dict[str, Any]]:
+    """Незавершённые задания удаления для продолжения после перезапуска.
+
+    Каждая загрузка считается попыткой: attempts — номер текущей.
+    """
+    try:
+        rows = await pool.fetchall(
+            "UPDATE delete_jobs SET attempts = attempts + 1 "
+            "RETURNING job_id, user_id, chat_id, edit_text, message_ids, attempts"
+        )
+        return sorted(({
+            'job_id': row[0],
+            'user_id': row[1],
+            'chat_id': row[2],
+            'edit_text': row[3],
+            'message_ids': list(row[4]),
+            'attempts': row[5]
+        } for row in rows), key=lambda job: job['job_id'])
+    except Exception as e:
+        logger.error(f"DB Error in load_delete_jobs: {e}")
+        return []
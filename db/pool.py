@@ -0,0 +1,161 @@
+import asyncio
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Sequence, TypeVar
+import psycopg2
+from psycopg2.pool import ThreadedConnectionPool
+from config import db_config, DB_POOL_MIN_SIZE, DB_POOL_MAX_SIZE
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+class DatabasePool:
+    """Ограниченный пул соединений PostgreSQL с неблокирующим доступом из asyncio.
+
+    Соединения открываются один раз при старте, запросы выполняются в отдельных
+    потоках, поэтому event loop не ждёт ни рукопожатия, ни самого запроса.
+    """
+
+    def __init__(self, min_size: int, max_size: int, **conn_kwargs):
+        self.min_size = min_size
+        self.max_size = max_size
+        self._conn_kwargs = conn_kwargs
+        self._pool: Optional[ThreadedConnectionPool] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._in_use = 0
+        self._waiters = 0
+        self._acquired = 0
+        self._total_wait = 0.0
+        self._max_wait = 0.0
+
+    @property
+    def is_open(self) -> bool:
+        return self._pool is not None
+
+    def open(self):
+        """Создаёт пул соединений. Вызывается один раз при запуске."""
+        if self._pool is not None:
+            return
+        self._pool = ThreadedConnectionPool(self.min_size, self.max_size, **self._conn_kwargs)
+        self._executor = ThreadPoolExecutor(max_workers=self.max_size, thread_name_prefix="db")
+        self._semaphore = asyncio.Semaphore(self.max_size)
+        logger.info(f"Пул соединений БД открыт (min={self.min_size}, max={self.max_size})")
+
+    def close(self):
+        """Закрывает все соединения пула."""
+        if self._pool is None:
+            return
+        self._executor.shutdown(wait=True)
+        self._pool.closeall()
+        self._pool = None
+        self._executor = None
+        self._semaphore = None
+        logger.info("Пул соединений БД закрыт")
+
+    def run_sync(self, func: Callable[[Any], T]) -> T:
+        """Выполняет func(cursor) в транзакции на соединении из пула (блокирующий вызов)."""
+        conn = self._pool.getconn()
+        broken = False
+        try:
+            with conn.cursor() as cursor:
+                result = func(cursor)
+            conn.commit()
+            return result
+        except (psycopg2.OperationalError, psycopg2.InterfaceError):
+            broken = True
+            raise
+        except Exception:
+            try:
+                conn.rollback()
+            except Exception:
+                broken = True
+            raise
+        finally:
+            self._pool.putconn(conn, close=broken or bool(conn.closed))
+
+    def _release(self):
+        self._in_use -= 1
+        self._semaphore.release()
+
+    async def run(self, func: Callable[[Any], T]) -> T:
+        """Асинхронно выполняет func(cursor) в транзакции, не блокируя event loop."""
+        if self._pool is None:
+            raise RuntimeError("Пул соединений БД не инициализирован")
+
+        started = time.monotonic()
+        self._waiters += 1
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self._waiters -= 1
+        waited = time.monotonic() - started
+        self._acquired += 1
+        self._total_wait += waited
+        self._max_wait = max(self._max_wait, waited)
+        self._in_use += 1
+
+        loop = asyncio.get_running_loop()
+        try:
+            future = self._executor.submit(self.run_sync, func)
+        except Exception:
+            self._release()
+            raise
+        # Слот освобождается только когда поток действительно вернул соединение,
+        # даже если ожидающая корутина была отменена раньше.
+        future.add_done_callback(lambda _: loop.call_soon_threadsafe(self._release))
+        return await asyncio.wrap_future(future)
+
+    def stats(self) -> Dict[str, Any]:
+        """Возвращает статистику пула: размер, занятость, ожидающих и время ожидания."""
+        opened = 0
+        if self._pool is not None:
+            opened = len(self._pool._pool) + len(self._pool._used)
+        return {
+            "min_size": self.min_size,
+            "max_size": self.max_size,
+            "open": opened,
+            "in_use": self._in_use,
+            "waiters": self._waiters,
+            "acquired": self._acquired,
+            "avg_wait_ms": (self._total_wait / self._acquired * 1000) if self._acquired else 0.0,
+            "max_wait_ms": self._max_wait * 1000,
+        }
+
+db_pool = DatabasePool(DB_POOL_MIN_SIZE, DB_POOL_MAX_SIZE, **db_config)
+
+def init_pool():
+    """Открывает глобальный пул соединений."""
+    db_pool.open()
+
+def close_pool():
+    """Закрывает глобальный пул соединений."""
+    db_pool.close()
+
+def get_pool_stats() -> Dict[str, Any]:
+    return db_pool.stats()
+
+async def run(func: Callable[[Any], T]) -> T:
+    return await db_pool.run(func)
+
+async def fetchone(query: str, params: Sequence[Any] = ()) -> Optional[tuple]:
+    def _query(cursor):
+        cursor.execute(query, params)
+        return cursor.fetchone()
+    return await db_pool.run(_query)
+
+async def fetchall(query: str, params: Sequence[Any] = ()) -> List[tuple]:
+    def _query(cursor):
+        cursor.execute(query, params)
+        return cursor.fetchall()
+    return await db_pool.run(_query)
+
+async def execute(query: str, params: Sequence[Any] = ()) -> int:
+    """Выполняет изменяющий запрос и возвращает количество затронутых строк."""
+    def _query(cursor):
+        cursor.execute(query, params)
+        return cursor.rowcount
+    return await db_pool.run(_query)
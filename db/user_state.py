@@ -0,0 +1,95 @@
+import logging
+from typing import Any, Dict, Iterable, Optional
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+DEFAULT_PREFIX = "."
+DEFAULT_EDIT_TEXT = '🫥🫥🫥'
+DEFAULT_DELETE_CMD = 'дд'
+
+class UserStateSnapshot:
+    """Снимок настроек пользователей (префикс, удалялка, текст редактирования, алиасы).
+
+    Загружается целиком одним запросом при старте и обновляется write-through
+    функциями из db_utils, поэтому фильтры сообщений не обращаются к БД.
+    Пока снимок не загружен, все обращения считаются промахами.
+    """
+
+    def __init__(self):
+        self._users: Dict[int, Dict[str, Any]] = {}
+        self.loaded = False
+        self.hits = 0
+        self.misses = 0
+
+    def _new_user(self) -> Dict[str, Any]:
+        return {
+            "prefix": DEFAULT_PREFIX,
+            "edit_text": DEFAULT_EDIT_TEXT,
+            "delete_cmd": DEFAULT_DELETE_CMD,
+            "aliases": set(),
+        }
+
+    def load(self, rows: Iterable[tuple]):
+        """Заполняет снимок строками (user_id, prefix, edit_text, delete_cmd, [алиасы])."""
+        users = {}
+        for user_id, prefix, edit_text, delete_cmd, aliases in rows:
+            state = self._new_user()
+            if prefix is not None:
+                state["prefix"] = prefix
+            if edit_text is not None:
+                state["edit_text"] = edit_text
+            if delete_cmd is not None:
+                state["delete_cmd"] = delete_cmd
+            state["aliases"] = set(aliases or ())
+            users[user_id] = state
+        self._users = users
+        self.loaded = True
+        logger.info(f"Снимок настроек загружен: {len(users)} пользователей")
+
+    def get(self, user_id: int, field: str) -> Optional[Any]:
+        """Возвращает значение настройки или None, если снимок ещё не загружен."""
+        if not self.loaded:
+            self.misses += 1
+            return None
+        self.hits += 1
+        state = self._users.get(user_id)
+        if state is None:
+            return self._new_user()[field]
+        return state[field]
+
+    def has_alias(self, user_id: int, alias_name: str) -> Optional[bool]:
+        """Проверяет алиас; None означает, что снимок ещё не загружен."""
+        aliases = self.get(user_id, "aliases")
+        if aliases is None:
+            return None
+        return alias_name in aliases
+
+    def set(self, user_id: int, field: str, value: Any):
+        if not self.loaded:
+            return
+        self._users.setdefault(user_id, self._new_user())[field] = value
+
+    def add_alias(self, user_id: int, alias_name: str):
+        if not self.loaded:
+            return
+        self._users.setdefault(user_id, self._new_user())["aliases"].add(alias_name)
+
+    def remove_alias(self, user_id: int, alias_name: str):
+        if not self.loaded:
+            return
+        state = self._users.get(user_id)
+        if state:
+            state["aliases"].discard(alias_name)
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "loaded": self.loaded,
+            "users": len(self._users),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
+
+user_state = UserStateSnapshot()
@@ -1,15 +1,24 @@
-import asyncio
 import logging
-from pyrogram import Client, filters
+from pyrogram import Client, filters, idle
 from pyrogram.handlers import RawUpdateHandler
 from pyrogram.types import Message
-from config import api_id, api_hash, db_config
-from db.db_utils import init_db
+from config import api_id, api_hash
+from db.db_utils import init_db, load_user_state
+from db.pool import init_pool, close_pool
+from utils.file_id_cache import load_file_id_cache
+from utils.media_pool import close_media_pool
+from utils.media_catalog import start_media_backfill, stop_media_backfill
+from utils.render_pool import close_render_pool
+from utils.render_cache import load_render_cache
+from utils.http_client import start_http_client, close_http_client
+from utils.router import router
+from utils.message_index import message_index
+from utils.outbound import outbound
 from commands.type_cmd import register as register_type
 from commands.hack_cmd import register as register_hack
 from commands.speedtest_cmd import register as register_speedtest
 from commands.template_cmd import register as register_template
-from commands.delete_cmd import register as register_delete
+from commands.delete_cmd import register as register_delete, resume_delete_jobs, stop_delete_jobs
 from commands.voice_cmd import register as register_voice
 from commands.speed_server_cmd import register as register_speed_server
 from commands.animation_cmd import register as register_animation
@@ -17,7 +26,7 @@ from commands.help_cmd import register as register_help
 from commands.video_note_cmd import register as register_video_note
 from commands.megapush_cmd import register as register_megapush
 from commands.choose_cmd import register as register_choose
-from commands.fake_activity_cmd import register as register_fake_activity
+from commands.fake_activity_cmd import register as register_fake_activity, start_fake_activity_ticker, stop_fake_activity_ticker
 from commands.online_cmd import register as register_online
 from commands.prefix_cmd import register as register_prefix
 from commands.profile_cmd import register as register_profile
@@ -28,7 +37,7 @@ from commands.screenshot_cmd import register as register_screenshot
 from commands.redach_cmd import register as register_redach
 from commands.udalyalka_cmd import register as register_udalyalka
 from commands.spam_cmd import register as register_spam
-from commands.interval_cmd import register as register_interval
+from commands.interval_cmd import register as register_interval, start_interval_scheduler, stop_interval_scheduler
 from commands.ping_cmd import register as register_ping
 from commands.advice_cmd import register as register_advice
 from commands.trap_cmd import register as register_trap
@@ -65,6 +74,9 @@ def safe_command_filter(_: Client, __: any, message: Message):
     )
 
 def register_all_commands(app):
+    # Единый обработчик команд ставится первым в группе 0, чтобы исходящие
+    # команды не перехватывались обработчиками всех сообщений (ловушка)
+    router.install(app)
     register_type(app)
     register_hack(app)
     register_speedtest(app)
@@ -120,12 +132,44 @@ async def error_handler(client: Client, update, users: dict, chats: dict):
     logger.error(f"Ошибка при обработке обновления: {type(update).__name__}, детали: {update_details}")
     return True  # Продолжить обработку других фильтров
 
+async def main():
+    await app.start()
+    await start_http_client()
+    # Фоновые задачи стартуют после подключения клиента
+    await start_interval_scheduler(app)
+    await start_fake_activity_ticker(app)
+    await resume_delete_jobs(app)
+    start_media_backfill()
+    logger.info("Бот запущен")
+    try:
+        await idle()
+    finally:
+        await stop_interval_scheduler()
+        await stop_fake_activity_ticker()
+        await stop_delete_jobs()
+        await stop_media_backfill()
+        await close_media_pool()
+        await close_render_pool()
+        await close_http_client()
+        await app.stop()
+
 if __name__ == "__main__":
+    init_pool()
     init_db()
+    load_user_state()
+    load_file_id_cache()
+    load_render_cache()
     register_all_commands(app)
+    # Индекс недавних сообщений для удалялки и конвертации раскладки
+    message_index.install(app)
+    # Ответы команд проходят через общий планировщик исходящих запросов
+    outbound.install(app)
     # Регистрируем обработчик ошибок
     app.add_handler(RawUpdateHandler(error_handler), group=-1)
     # Добавляем фильтр для всех сообщений
     app.on_message(filters.create(safe_command_filter))
     logger.info("Бот запускается...")
-    app.run()
\ No newline at end of file
+    try:
+        app.run(main())
+    finally:
+        close_pool()
\ No newline at end of file
@@ -0,0 +1,33 @@
+from pyrogram import raw
+from utils.message_index import MessageIndex, MessageRecord
+
+ME = 1
+PRIVATE_CHAT = 42
+CHANNEL = -1001234567890
+
+def _index() -> MessageIndex:
+    index = MessageIndex(per_chat=100, max_chats=10)
+    for chat_id in (PRIVATE_CHAT, CHANNEL):
+        for message_id in range(1, 6):
+            index._add(chat_id, MessageRecord(message_id, ME, 0, 1, None))
+    return index
+
+def test_delete_without_chat_skips_channels():
+    index = _index()
+    index.remove(None, [5])
+    assert index.recent_from(PRIVATE_CHAT, ME, 2) == [4, 3]
+    assert index.recent_from(CHANNEL, ME, 2) == [5, 4]
+
+def test_delete_with_chat_touches_only_that_chat():
+    index = _index()
+    index.remove(CHANNEL, [5])
+    assert index.recent_from(CHANNEL, ME, 2) == [4, 3]
+    assert index.recent_from(PRIVATE_CHAT, ME, 2) == [5, 4]
+
+def test_own_channel_delete_removes_from_that_channel():
+    index = _index()
+    index._observe(raw.functions.channels.DeleteMessages(
+        channel=raw.types.InputChannel(channel_id=1234567890, access_hash=0), id=[5]
+    ), None)
+    assert index.recent_from(CHANNEL, ME, 2) == [4, 3]
+    assert index.recent_from(PRIVATE_CHAT, ME, 2) == [5, 4]
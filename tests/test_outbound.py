@@ -0,0 +1,103 @@
+import asyncio
+from types import SimpleNamespace
+from pyrogram import raw
+from utils.outbound import OutboundScheduler, Priority, TokenBucket
+
+def _scheduler(**limits) -> OutboundScheduler:
+    return OutboundScheduler(limits, max_flood_wait=60, flood_retries=2)
+
+async def _noop(value=None):
+    return value
+
+def test_bucket_refills_at_its_rate():
+    bucket = TokenBucket(rate=10, capacity=2)
+    now = bucket._updated
+    bucket.take()
+    bucket.take()
+    assert abs(bucket.wait_time(now) - 0.1) < 1e-9
+    assert bucket.wait_time(now + 0.1) < 1e-6
+    # Запас: фоновому запросу нужен токен сверх reserve
+    assert abs(bucket.wait_time(now + 0.1, reserve=1) - 0.1) < 1e-9
+
+def test_bucket_penalty_blocks_and_slows_then_recovers():
+    bucket = TokenBucket(rate=10, capacity=5)
+    now = bucket._updated
+    bucket.penalize(3, now)
+    assert bucket.wait_time(now) == 3
+    assert bucket.rate == 5
+    for _ in range(10):
+        bucket.recover()
+    assert bucket.rate == 10
+
+def test_background_yields_only_to_interactive_waiting_for_same_buckets():
+    async def scenario():
+        scheduler = _scheduler(edit=(20, 1, 20, 1), send=(20, 1, 20, 1))
+        await scheduler.run("edit", 1, _noop)  # корзина правок пуста
+        interactive = asyncio.create_task(scheduler.run("edit", 1, _noop, priority=Priority.INTERACTIVE))
+        await asyncio.sleep(0.01)
+        waiting_edit = scheduler._interactive_ahead("edit", 2)
+        waiting_send = scheduler._interactive_ahead("send", 2)
+        await interactive
+        return waiting_edit, waiting_send
+
+    assert asyncio.run(scenario()) == (True, False)
+
+def test_interactive_waiting_out_flood_wait_does_not_hold_background():
+    async def scenario():
+        scheduler = _scheduler(edit=(20, 30, 20, 30))
+        scheduler._penalize("edit", 1, 0.2)
+        interactive = asyncio.create_task(scheduler.run("edit", 1, _noop, priority=Priority.INTERACTIVE))
+        await asyncio.sleep(0.01)
+        blocked_claims = dict(scheduler._interactive_waiting)
+        await interactive
+        return blocked_claims
+
+    assert asyncio.run(scenario()) == {}
+
+def test_stale_coalesced_frame_is_dropped_after_key_reset():
+    async def scenario():
+        scheduler = _scheduler(edit=(10, 3, 100, 100))
+        sent = []
+
+        async def show(text):
+            sent.append(text)
+
+        for _ in range(3):
+            await scheduler.run("edit", 1, _noop)
+        # Старый кадр ждёт дольше (оставляет запас), новый интерактивный проходит раньше
+        old = asyncio.create_task(scheduler.run("edit", 1, show, "old", coalesce="frame",
+                                                priority=Priority.BACKGROUND))
+        await asyncio.sleep(0.01)
+        await scheduler.run("edit", 1, show, "new", coalesce="frame", priority=Priority.INTERACTIVE)
+        newest = asyncio.create_task(scheduler.run("edit", 1, show, "newest", coalesce="frame",
+                                                   priority=Priority.BACKGROUND))
+        await asyncio.gather(old, newest)
+        return sent, scheduler.coalesced
+
+    sent, coalesced = asyncio.run(scenario())
+    assert sent == ["new", "newest"]
+    assert coalesced == 1
+
+def test_install_routes_client_requests_through_buckets():
+    async def scenario():
+        scheduler = _scheduler(send=(20, 30, 2, 5), edit=(20, 30, 5, 20), delete=(10, 20, 5, 10),
+                               action=(60, 60, 1, 3))
+        calls = []
+
+        async def invoke(query, *args, **kwargs):
+            calls.append(type(query).__name__)
+            return "ok"
+
+        client = SimpleNamespace(invoke=invoke, me=SimpleNamespace(id=7))
+        scheduler.install(client)
+        peer = raw.types.InputPeerUser(user_id=42, access_hash=0)
+        await client.invoke(raw.functions.messages.SendMessage(peer=peer, message="hi", random_id=1))
+        await client.invoke(raw.functions.messages.GetChats(id=[1]))
+        # Запрос внутри run не считается второй раз
+        await scheduler.run("edit", 42, client.invoke, raw.functions.messages.EditMessage(peer=peer, id=1))
+        return calls, scheduler.calls, set(scheduler._chats)
+
+    calls, scheduled, buckets = asyncio.run(scenario())
+    assert calls == ["SendMessage", "GetChats", "EditMessage"]
+    assert scheduled == 2
+    assert buckets == {("send", 42), ("edit", 42)}
@@ -0,0 +1,37 @@
+import asyncio
+from types import SimpleNamespace
+from pyrogram.errors import PeerIdInvalid
+from utils.peer_cache import PeerCache, PeerInfo
+
+AVAILABLE = 1
+GONE = 2
+FLAKY = 3
+
+class FakeClient:
+    def __init__(self):
+        self.get_chat_calls = []
+
+    async def get_users(self, user_ids):
+        raise ConnectionError("пакет не прошёл")
+
+    async def get_chat(self, chat_id):
+        self.get_chat_calls.append(chat_id)
+        if chat_id == GONE:
+            raise PeerIdInvalid()
+        if chat_id == FLAKY:
+            raise ConnectionError("сеть")
+        return SimpleNamespace(id=chat_id, title=None, first_name="Вася", username="vasya")
+
+def test_only_permanent_errors_are_cached():
+    cache = PeerCache(max_size=10, ttl=60, negative_ttl=60, concurrency=2)
+    client = FakeClient()
+
+    result = asyncio.run(cache.get_many(client, [AVAILABLE, GONE, FLAKY]))
+    assert result == {AVAILABLE: PeerInfo(AVAILABLE, None, "Вася", "vasya"), GONE: None}
+
+    # Недоступный чат отвечается из кэша, временная ошибка запрашивается снова
+    client.get_chat_calls.clear()
+    result = asyncio.run(cache.get_many(client, [AVAILABLE, GONE, FLAKY]))
+    assert GONE in result and result[GONE] is None
+    assert FLAKY not in result
+    assert client.get_chat_calls == [FLAKY]
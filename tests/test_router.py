@@ -0,0 +1,81 @@
+import asyncio
+from types import SimpleNamespace
+import pytest
+import utils.router as router_module
+from utils.router import CommandRouter
+
+ME = 1
+
+async def _handler(client, message):
+    pass
+
+async def _other(client, message):
+    pass
+
+def _message(text=None, caption=None, is_self=True):
+    return SimpleNamespace(text=text, caption=caption, from_user=SimpleNamespace(id=ME, is_self=is_self))
+
+@pytest.fixture
+def settings(monkeypatch):
+    """Снимок настроек пользователя вместо БД."""
+    values = {"prefix": "лп", "delete_cmd": "дд", "aliases": {"привет"}}
+
+    async def get_user_prefix(user_id):
+        return values["prefix"]
+
+    async def get_delete_cmd(user_id):
+        return values["delete_cmd"]
+
+    async def alias_exists(user_id, text):
+        return text in values["aliases"]
+
+    monkeypatch.setattr(router_module, "get_user_prefix", get_user_prefix)
+    monkeypatch.setattr(router_module, "get_delete_cmd", get_delete_cmd)
+    monkeypatch.setattr(router_module, "alias_exists", alias_exists)
+    return values
+
+def _resolve(router: CommandRouter, message):
+    route = asyncio.run(router.resolve(message))
+    return route.handler if route else None
+
+def test_prefixed_and_dotted_commands_dispatch(settings):
+    router = CommandRouter()
+    router.command("пинг", _handler, exact=True)
+    router.dot_command("hack", _other)
+
+    message = _message("ЛП Пинг")
+    assert _resolve(router, message) is _handler
+    assert message.command == ["пинг"]
+    assert _resolve(router, _message("лп пинг 5")) is None
+    assert _resolve(router, _message(".hack")) is _other
+    assert _resolve(router, _message("лп пинг", is_self=False)) is None
+
+def test_caption_only_for_caption_commands(settings):
+    router = CommandRouter()
+    router.command("эдвайс", _handler, caption=True)
+    router.command("дем", _other)
+
+    assert _resolve(router, _message(caption="лп эдвайс текст")) is _handler
+    assert _resolve(router, _message(caption="лп дем текст")) is None
+
+def test_delete_command_forms(settings):
+    router = CommandRouter()
+    router.delete_command(_handler)
+    router.alias(_other)
+
+    for text in ("дд", "ДД5", "дд 5", "дд-", "дд-5", "дд- 5"):
+        assert _resolve(router, _message(text)) is _handler, text
+    assert _resolve(router, _message("ддд")) is None
+
+    # Команда удаления с префиксом не путается с командами префикса
+    settings["delete_cmd"] = "лпд"
+    assert _resolve(router, _message("лпд 3")) is None
+
+def test_alias_is_last_fallback(settings):
+    router = CommandRouter()
+    router.command("пинг", _handler)
+    router.alias(_other)
+
+    assert _resolve(router, _message("привет")) is _other
+    assert _resolve(router, _message("пока")) is None
+    assert _resolve(router, _message(caption="привет")) is None
@@ -0,0 +1,20 @@
+from utils import text_layout
+
+FRAME_FONT_SIZE = 32
+FRAME_MAX_TEXT_WIDTH = 600
+
+def _lines(text: str):
+    lines = text_layout.layout(text.split("\n"), FRAME_FONT_SIZE, FRAME_MAX_TEXT_WIDTH, 12, keep_whitespace=True)
+    return ["".join(run.text for run in runs) for runs in lines]
+
+def test_indented_multiline_frame_round_trips():
+    frame = "  /\\_/\\   \n ( o.o )\n\n   > ^ <"
+    assert _lines(frame) == frame.split("\n")
+
+def test_only_long_lines_are_wrapped():
+    long_line = "    " + " ".join(["слово"] * 40)
+    lines = _lines(f"  коротко\n{long_line}")
+    assert lines[0] == "  коротко"
+    assert lines[1].startswith("    слово")
+    assert len(lines) > 2
+    assert " ".join(line.strip() for line in lines[1:]) == long_line.strip()
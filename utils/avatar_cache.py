@@ -0,0 +1,111 @@
+import asyncio
+import logging
+import os
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple
+from pyrogram import Client
+from pyrogram.types import User
+from utils.render_pool import render
+from utils.renderers import prepare_avatar
+from config import AVATAR_CACHE_SIZE, AVATAR_CHECK_TTL
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+AVATAR_CACHE_DIR = "quotes/avatars"
+
+# (file_unique_id, file_id) текущего фото профиля
+PhotoRef = Tuple[str, str]
+
+class AvatarCache:
+    """Кэш готовых круглых аватарок 150×150 для цитат.
+
+    Ключ — file_unique_id фото профиля, поэтому смена аватарки сама даёт
+    новый ключ. Текущее фото обычно известно из профиля отправителя в самом
+    сообщении; если его там нет, результат запроса к Telegram хранится
+    check_ttl секунд. Аватарки лежат в памяти (LRU) и на диске, оба уровня
+    ограничены max_size записями.
+    """
+
+    def __init__(self, directory: str, max_size: int, check_ttl: float):
+        self.directory = directory
+        self.max_size = max_size
+        self.check_ttl = check_ttl
+        self._entries: "OrderedDict[str, bytes]" = OrderedDict()
+        self._current: "OrderedDict[int, Tuple[float, Optional[PhotoRef]]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    async def _current_photo(self, client: Client, user: User) -> Optional[PhotoRef]:
+        if user.photo:
+            return user.photo.big_photo_unique_id, user.photo.big_file_id
+
+        checked = self._current.get(user.id)
+        if checked and time.time() - checked[0] < self.check_ttl:
+            return checked[1]
+
+        photo_ref = None
+        async for photo in client.get_chat_photos(user.id, limit=1):
+            photo_ref = (photo.file_unique_id, photo.file_id)
+        self._current[user.id] = (time.time(), photo_ref)
+        self._current.move_to_end(user.id)
+        while len(self._current) > self.max_size:
+            self._current.popitem(last=False)
+        return photo_ref
+
+    async def photo_id(self, client: Client, user: User) -> str:
+        """file_unique_id текущего фото профиля ("" — фото нет)."""
+        photo_ref = await self._current_photo(client, user)
+        return photo_ref[0] if photo_ref else ""
+
+    def _path(self, unique_id: str) -> str:
+        return os.path.join(self.directory, f"{unique_id}.png")
+
+    def _remember(self, unique_id: str, avatar: bytes):
+        self._entries[unique_id] = avatar
+        self._entries.move_to_end(unique_id)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def _read(self, path: str) -> Optional[bytes]:
+        if not os.path.exists(path):
+            return None
+        # Время изменения служит отметкой последнего использования для вытеснения с диска
+        os.utime(path)
+        with open(path, "rb") as f:
+            return f.read()
+
+    def _write(self, path: str, avatar: bytes):
+        os.makedirs(self.directory, exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(avatar)
+        files = [os.path.join(self.directory, name) for name in os.listdir(self.directory)]
+        if len(files) > self.max_size:
+            files.sort(key=os.path.getmtime)
+            for old_path in files[:len(files) - self.max_size]:
+                os.remove(old_path)
+
+    async def get(self, client: Client, user: User) -> Optional[bytes]:
+        """Возвращает готовую аватарку (PNG) или None, если фото профиля нет."""
+        photo_ref = await self._current_photo(client, user)
+        if not photo_ref:
+            return None
+        unique_id, file_id = photo_ref
+
+        avatar = self._entries.get(unique_id)
+        if avatar is None:
+            avatar = await asyncio.to_thread(self._read, self._path(unique_id))
+        if avatar is not None:
+            self._remember(unique_id, avatar)
+            self.hits += 1
+            return avatar
+
+        self.misses += 1
+        photo = await client.download_media(file_id, in_memory=True)
+        avatar = await render(prepare_avatar, photo.getvalue())
+        self._remember(unique_id, avatar)
+        await asyncio.to_thread(self._write, self._path(unique_id), avatar)
+        return avatar
+
+avatar_cache = AvatarCache(AVATAR_CACHE_DIR, AVATAR_CACHE_SIZE, AVATAR_CHECK_TTL)
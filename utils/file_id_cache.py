@@ -0,0 +1,136 @@
+import asyncio
+import logging
+import os
+from typing import Awaitable, Callable, Dict, Iterable, Optional, Tuple
+from pyrogram import errors as pyrogram_errors
+from pyrogram.types import Message
+from db.db_utils import load_file_ids, save_file_id, delete_file_id
+from utils.media_store import hash_file
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Ошибки, при которых сохранённый file_id больше не принимается Telegram
+REJECTED_FILE_ID_ERRORS = (
+    pyrogram_errors.FileIdInvalid,
+    pyrogram_errors.FileReferenceExpired,
+    pyrogram_errors.FileReferenceInvalid,
+    pyrogram_errors.MediaEmpty,
+)
+# Pyrogram ещё до запроса к Telegram отвечает ValueError с таким текстом на
+# неразборчивый file_id и на file_id другого типа медиа
+FILE_ID_DECODE_ERROR_PREFIX = 'Failed to decode "'
+FILE_ID_TYPE_ERROR_SUFFIX = " file id instead"
+
+def file_id_rejected(error: Exception) -> bool:
+    """Означает ли ошибка отправки, что сохранённый file_id больше не годится."""
+    if isinstance(error, REJECTED_FILE_ID_ERRORS):
+        return True
+    if not isinstance(error, ValueError):
+        return False
+    text = str(error)
+    return text.startswith(FILE_ID_DECODE_ERROR_PREFIX) or text.endswith(FILE_ID_TYPE_ERROR_SUFFIX)
+
+Sender = Callable[[str], Awaitable[Message]]
+
+class FileIdCache:
+    """Кэш file_id для локальных файлов, которые отправляются повторно.
+
+    Файл определяется путём и хэшем содержимого. Первая отправка загружает файл
+    и запоминает file_id из ответа, последующие отправляют только file_id.
+    Хэш пересчитывается лишь при изменении размера или времени изменения файла.
+    """
+
+    def __init__(self):
+        self._file_ids: Dict[str, Tuple[str, str]] = {}
+        self._hashes: Dict[str, Tuple[int, int, str]] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def load(self, rows: Iterable[tuple]):
+        """Заполняет кэш строками (file_path, content_hash, file_id)."""
+        self._file_ids = {path: (content_hash, file_id) for path, content_hash, file_id in rows}
+        logger.info(f"Кэш file_id загружен: {len(self._file_ids)} файлов")
+
+    async def content_hash(self, path: str) -> str:
+        stat = os.stat(path)
+        cached = self._hashes.get(path)
+        if cached and cached[0] == stat.st_mtime_ns and cached[1] == stat.st_size:
+            return cached[2]
+        content_hash = await asyncio.to_thread(hash_file, path)
+        self._hashes[path] = (stat.st_mtime_ns, stat.st_size, content_hash)
+        return content_hash
+
+    def get(self, path: str, content_hash: str) -> Optional[str]:
+        entry = self._file_ids.get(path)
+        if entry and entry[0] == content_hash:
+            return entry[1]
+        return None
+
+    async def remember(self, path: str, content_hash: str, file_id: str):
+        self._file_ids[path] = (content_hash, file_id)
+        await save_file_id(path, content_hash, file_id)
+
+    async def forget(self, path: str):
+        self._file_ids.pop(path, None)
+        self._hashes.pop(path, None)
+        await delete_file_id(path)
+
+    async def send(self, path: str, media_type: str, send: Sender) -> Message:
+        """Отправляет файл через send(media), подставляя file_id, если он известен.
+
+        media_type — атрибут ответа с отправленным медиа (voice, video_note, photo).
+        """
+        path = os.path.normpath(path)
+        content_hash = await self.content_hash(path)
+
+        sent = await self._send_known(path, content_hash, send)
+        if sent:
+            return sent
+        return await self._upload(path, path, content_hash, media_type, send)
+
+    async def send_converted(self, source_unique_id: str, media_type: str, send: Sender,
+                             convert: Callable[[], Awaitable[Optional[str]]]) -> Optional[Message]:
+        """Отправляет результат обработки файла Telegram, обрабатывая его только один раз.
+
+        convert() создаёт файл и возвращает путь к нему (None — ошибка). file_id
+        результата запоминается по file_unique_id исходного файла, поэтому повторная
+        команда для того же файла ничего не скачивает, не конвертирует и не загружает.
+        """
+        key = f"tg:{media_type}:{source_unique_id}"
+        sent = await self._send_known(key, source_unique_id, send)
+        if sent:
+            return sent
+        path = await convert()
+        if not path:
+            return None
+        return await self._upload(key, path, source_unique_id, media_type, send)
+
+    async def _send_known(self, key: str, content_hash: str, send: Sender) -> Optional[Message]:
+        file_id = self.get(key, content_hash)
+        if not file_id:
+            return None
+        try:
+            sent = await send(file_id)
+            self.hits += 1
+            return sent
+        except Exception as e:
+            if not file_id_rejected(e):
+                raise
+            logger.warning(f"file_id для {key} отклонён, загружаем заново: {e}")
+            await self.forget(key)
+            return None
+
+    async def _upload(self, key: str, path: str, content_hash: str, media_type: str, send: Sender) -> Message:
+        self.misses += 1
+        sent = await send(path)
+        media = getattr(sent, media_type, None) if sent else None
+        if media:
+            await self.remember(key, content_hash, media.file_id)
+        return sent
+
+file_id_cache = FileIdCache()
+
+def load_file_id_cache():
+    """Загружает сохранённые file_id при старте."""
+    file_id_cache.load(load_file_ids())
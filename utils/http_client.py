@@ -0,0 +1,44 @@
+import logging
+from typing import Optional
+import aiohttp
+from config import (HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT, HTTP_TOTAL_TIMEOUT,
+                    HTTP_MAX_CONNECTIONS, HTTP_MAX_PER_HOST, HTTP_DNS_CACHE_TTL)
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+_session: Optional[aiohttp.ClientSession] = None
+
+def get_session() -> aiohttp.ClientSession:
+    """Возвращает общую HTTP-сессию для всех команд.
+
+    Соединения с каждым хостом переиспользуются (keep-alive), адреса кэшируются,
+    число одновременных запросов к одному хосту ограничено, а таймауты
+    подключения и чтения одинаковы для всех запросов.
+    """
+    global _session
+    if _session is None or _session.closed:
+        connector = aiohttp.TCPConnector(
+            limit=HTTP_MAX_CONNECTIONS,
+            limit_per_host=HTTP_MAX_PER_HOST,
+            ttl_dns_cache=HTTP_DNS_CACHE_TTL
+        )
+        timeout = aiohttp.ClientTimeout(
+            total=HTTP_TOTAL_TIMEOUT,
+            connect=HTTP_CONNECT_TIMEOUT,
+            sock_read=HTTP_READ_TIMEOUT
+        )
+        _session = aiohttp.ClientSession(connector=connector, timeout=timeout)
+    return _session
+
+async def start_http_client():
+    """Создаёт общую сессию при запуске."""
+    get_session()
+    logger.info(f"HTTP-клиент запущен (соединений на хост: {HTTP_MAX_PER_HOST})")
+
+async def close_http_client():
+    """Закрывает общую сессию и все её соединения."""
+    global _session
+    if _session is not None and not _session.closed:
+        await _session.close()
+    _session = None
@@ -0,0 +1,99 @@
+import asyncio
+import json
+import logging
+import os
+import shutil
+from typing import Any, Dict, Optional
+from db.db_utils import list_media_without_metadata, update_media_metadata
+from utils.media_pool import run_ffprobe
+from utils.media_store import media_store
+from utils.file_id_cache import file_id_cache
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Расширение файла по умолчанию для каждого вида медиа
+MEDIA_EXTENSIONS = {"voice": "ogg", "video_note": "mp4"}
+
+_backfill_task: Optional[asyncio.Task] = None
+
+async def probe_media(file_path: str) -> Dict[str, Any]:
+    """Собирает метаданные файла одним вызовом ffprobe (при сохранении, не при отправке)."""
+    result = await run_ffprobe([
+        "-v", "error",
+        "-show_entries", "format=duration:stream=codec_type,codec_name,width,height",
+        "-of", "json",
+        file_path
+    ])
+    info = json.loads(result.stdout or b"{}")
+    streams = info.get("streams", [])
+    video = next((s for s in streams if s.get("codec_type") == "video"), {})
+    audio = next((s for s in streams if s.get("codec_type") == "audio"), None)
+    duration = info.get("format", {}).get("duration")
+    return {
+        "duration": float(duration) if duration else None,
+        "width": video.get("width"),
+        "height": video.get("height"),
+        "video_codec": video.get("codec_name"),
+        "audio_codec": audio.get("codec_name") if audio else None,
+        "file_size": os.path.getsize(file_path),
+        "has_audio": audio is not None,
+    }
+
+async def _backfill_row(row: Dict[str, Any]) -> bool:
+    kind, file_path = row["kind"], row["file_path"]
+    if not file_path or not os.path.exists(file_path):
+        logger.warning(f"Файл {file_path} для '{row['name']}' не найден, метаданные не заполнены")
+        return False
+
+    metadata = await probe_media(file_path)
+    if row["content_hash"]:
+        return await update_media_metadata(kind, row["user_id"], row["name"], metadata)
+
+    # Запись сохранена до появления хранилища: копия файла переносится туда,
+    # старый файл удаляется только после обновления строки
+    ext = os.path.splitext(file_path)[1].lstrip(".") or MEDIA_EXTENSIONS[kind]
+    staging_path = media_store.staging_path(kind, ext)
+    await asyncio.to_thread(shutil.copyfile, file_path, staging_path)
+    try:
+        moved = await media_store.store(
+            kind, staging_path, ext,
+            lambda content_hash, blob_path: update_media_metadata(kind, row["user_id"], row["name"], metadata,
+                                                                  content_hash, blob_path)
+        )
+    finally:
+        if os.path.exists(staging_path):
+            os.remove(staging_path)
+    if moved:
+        os.remove(file_path)
+        await file_id_cache.forget(os.path.normpath(file_path))
+    return moved
+
+async def backfill_media_metadata():
+    """Однократно заполняет метаданные записей, сохранённых до появления каталога.
+
+    Файлы обрабатываются параллельно; число одновременных ffprobe ограничивает
+    пул обработки медиа. Повторный запуск затрагивает только незаполненные строки.
+    """
+    rows = await list_media_without_metadata()
+    if not rows:
+        return
+    logger.info(f"Заполнение метаданных медиа: {len(rows)} записей")
+    results = await asyncio.gather(*(_backfill_row(row) for row in rows), return_exceptions=True)
+    for row, result in zip(rows, results):
+        if isinstance(result, Exception):
+            logger.error(f"Ошибка заполнения метаданных '{row['name']}': {result}")
+    logger.info(f"Метаданные заполнены: {sum(1 for result in results if result is True)} из {len(rows)}")
+
+def start_media_backfill():
+    """Запускает заполнение метаданных в фоне, не задерживая старт бота."""
+    global _backfill_task
+    _backfill_task = asyncio.create_task(backfill_media_metadata())
+
+async def stop_media_backfill():
+    """Прерывает незавершённое заполнение; оставшиеся строки обработаются при следующем запуске."""
+    global _backfill_task
+    if _backfill_task and not _backfill_task.done():
+        _backfill_task.cancel()
+        await asyncio.gather(_backfill_task, return_exceptions=True)
+    _backfill_task = None
@@ -0,0 +1,251 @@
+import asyncio
+import logging
+import os
+import time
+from typing import AsyncIterator, Awaitable, Callable, List, Optional, Sequence
+from pyrogram import Client
+from pyrogram.types import Message
+from config import MEDIA_POOL_WORKERS, MEDIA_POOL_QUEUE_SIZE, MEDIA_JOB_TIMEOUT
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Не чаще одного редактирования сообщения с прогрессом за столько секунд
+PROGRESS_EDIT_INTERVAL = 3
+
+Progress = Callable[[float, bool], Awaitable[None]]
+
+# Признаки того, что контейнер нельзя прочитать из потока (например, moov в конце mp4)
+UNSEEKABLE_INPUT_ERRORS = ("moov atom not found", "partial file", "Invalid data found when processing input")
+
+class MediaJobError(Exception):
+    """Ошибка выполнения ffmpeg/ffprobe: ненулевой код выхода или таймаут."""
+
+    def __init__(self, message: str, stderr: str = ""):
+        super().__init__(message)
+        self.stderr = stderr
+
+class MediaResult:
+    def __init__(self, returncode: int, stdout: bytes, stderr: str):
+        self.returncode = returncode
+        self.stdout = stdout
+        self.stderr = stderr
+
+class MediaJob:
+    def __init__(self, args: Sequence[str], timeout: float, progress: Optional[Progress], check: bool,
+                 stdin: Optional[AsyncIterator[bytes]]):
+        self.args = list(args)
+        self.timeout = timeout
+        self.progress = progress
+        self.check = check
+        self.stdin = stdin
+        self.future = asyncio.get_running_loop().create_future()
+
+def _kill(process: asyncio.subprocess.Process):
+    if process.returncode is None:
+        try:
+            process.kill()
+        except ProcessLookupError:
+            pass
+
+class MediaPool:
+    """Пул для запуска ffmpeg/ffprobe без блокировки event loop.
+
+    Задания ставятся в ограниченную очередь (при переполнении отправитель ждёт),
+    одновременно выполняется не больше workers процессов. У каждого задания
+    свой таймаут; отмена ожидающей корутины убивает процесс.
+    """
+
+    def __init__(self, workers: int, queue_size: int, default_timeout: float):
+        self.workers = workers
+        self.queue_size = queue_size
+        self.default_timeout = default_timeout
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+        self._running = 0
+        self._completed = 0
+        self._failed = 0
+
+    def _ensure_started(self):
+        if self._tasks:
+            return
+        self._queue = asyncio.Queue(maxsize=self.queue_size)
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        logger.info(f"Пул обработки медиа запущен: {self.workers} процессов, очередь {self.queue_size}")
+
+    async def run(self, args: Sequence[str], timeout: Optional[float] = None,
+                  progress: Optional[Progress] = None, check: bool = True,
+                  stdin: Optional[AsyncIterator[bytes]] = None) -> MediaResult:
+        """Выполняет команду в пуле и возвращает результат.
+
+        progress(секунды, завершено) вызывается по мере обработки; для этого
+        в команду ffmpeg добавляется `-progress pipe:1`. Если передан stdin,
+        его фрагменты по мере поступления пишутся во вход процесса.
+        """
+        self._ensure_started()
+        if progress:
+            args = [args[0], "-progress", "pipe:1", "-nostats", *args[1:]]
+        job = MediaJob(args, timeout or self.default_timeout, progress, check, stdin)
+        await self._queue.put(job)
+        return await job.future
+
+    async def _worker(self):
+        while True:
+            job = await self._queue.get()
+            try:
+                if job.future.done():
+                    continue
+                self._running += 1
+                try:
+                    result = await self._execute(job)
+                    self._completed += 1
+                    if not job.future.done():
+                        job.future.set_result(result)
+                except Exception as e:
+                    self._failed += 1
+                    if not job.future.done():
+                        job.future.set_exception(e)
+                finally:
+                    self._running -= 1
+            finally:
+                self._queue.task_done()
+
+    async def _execute(self, job: MediaJob) -> MediaResult:
+        name = os.path.basename(job.args[0])
+        process = await asyncio.create_subprocess_exec(
+            *job.args,
+            stdin=asyncio.subprocess.PIPE if job.stdin else None,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE
+        )
+        # Отмена ожидающего результата сразу останавливает процесс
+        job.future.add_done_callback(lambda _: _kill(process))
+        try:
+            stdout, stderr, _ = await asyncio.wait_for(
+                asyncio.gather(self._read_stdout(job, process), process.stderr.read(), self._feed_stdin(job, process)),
+                timeout=job.timeout
+            )
+            await process.wait()
+        except asyncio.TimeoutError:
+            _kill(process)
+            await process.wait()
+            raise MediaJobError(f"{name} не завершился за {job.timeout} сек")
+        except BaseException:
+            _kill(process)
+            raise
+
+        result = MediaResult(process.returncode, stdout, stderr.decode(errors="replace"))
+        if job.check and process.returncode != 0:
+            raise MediaJobError(
+                f"{name} завершился с кодом {process.returncode}: {result.stderr.strip()[-500:]}",
+                result.stderr
+            )
+        return result
+
+    async def _feed_stdin(self, job: MediaJob, process: asyncio.subprocess.Process):
+        if not job.stdin:
+            return
+        try:
+            async for chunk in job.stdin:
+                process.stdin.write(chunk)
+                # drain() приостанавливает загрузку, пока ffmpeg не разберёт буфер
+                await process.stdin.drain()
+        except (BrokenPipeError, ConnectionResetError):
+            # ffmpeg завершился раньше, чем прочитал весь вход; итог покажет код выхода
+            pass
+        finally:
+            if not process.stdin.is_closing():
+                process.stdin.close()
+
+    async def _read_stdout(self, job: MediaJob, process: asyncio.subprocess.Process) -> bytes:
+        if not job.progress:
+            return await process.stdout.read()
+
+        # Формат -progress: блоки строк key=value, каждый заканчивается progress=continue|end
+        out_time = 0.0
+        async for raw_line in process.stdout:
+            key, _, value = raw_line.decode(errors="replace").strip().partition("=")
+            if key == "out_time_us" and value.isdigit():
+                out_time = int(value) / 1_000_000
+            elif key == "progress":
+                try:
+                    await job.progress(out_time, value == "end")
+                except Exception as e:
+                    logger.error(f"Ошибка в обработчике прогресса: {e}")
+        return b""
+
+    async def close(self):
+        """Останавливает обработчики и отменяет задания в очереди."""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        if self._queue:
+            while not self._queue.empty():
+                job = self._queue.get_nowait()
+                job.future.cancel()
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "running": self._running,
+            "queued": self._queue.qsize() if self._queue else 0,
+            "completed": self._completed,
+            "failed": self._failed,
+        }
+
+media_pool = MediaPool(
+    MEDIA_POOL_WORKERS or max(1, (os.cpu_count() or 1) // 2),
+    MEDIA_POOL_QUEUE_SIZE,
+    MEDIA_JOB_TIMEOUT
+)
+
+async def run_ffmpeg(args: Sequence[str], timeout: Optional[float] = None,
+                     progress: Optional[Progress] = None,
+                     stdin: Optional[AsyncIterator[bytes]] = None) -> MediaResult:
+    return await media_pool.run(["ffmpeg", *args], timeout=timeout, progress=progress, stdin=stdin)
+
+async def transcode_from_telegram(client: Client, file_id: str, output_args: Sequence[str], fallback_path: str,
+                                  progress: Optional[Progress] = None, timeout: Optional[float] = None) -> MediaResult:
+    """Пропускает файл из Telegram через ffmpeg без промежуточной записи на диск.
+
+    Фрагменты загрузки идут прямо во вход ffmpeg. Если контейнер нельзя
+    разобрать из потока (mp4 с индексом в конце), файл скачивается в
+    fallback_path и обрабатывается оттуда.
+    """
+    try:
+        return await run_ffmpeg(["-i", "pipe:0", *output_args], timeout=timeout, progress=progress,
+                                stdin=client.stream_media(file_id))
+    except MediaJobError as e:
+        if not any(marker in e.stderr for marker in UNSEEKABLE_INPUT_ERRORS):
+            raise
+        logger.info(f"Вход не читается из потока, скачиваем во временный файл: {fallback_path}")
+
+    try:
+        await client.download_media(file_id, fallback_path)
+        return await run_ffmpeg(["-i", fallback_path, *output_args], timeout=timeout, progress=progress)
+    finally:
+        if os.path.exists(fallback_path):
+            os.remove(fallback_path)
+
+async def run_ffprobe(args: Sequence[str], timeout: Optional[float] = 15, check: bool = True) -> MediaResult:
+    return await media_pool.run(["ffprobe", *args], timeout=timeout, check=check)
+
+async def close_media_pool():
+    await media_pool.close()
+
+def edit_progress(message: Message, title: str, duration: Optional[float]) -> Optional[Progress]:
+    """Возвращает обработчик прогресса, который показывает проценты в сообщении."""
+    if not duration:
+        return None
+    last_edit = time.monotonic()
+
+    async def report(seconds: float, finished: bool):
+        nonlocal last_edit
+        now = time.monotonic()
+        if finished or now - last_edit < PROGRESS_EDIT_INTERVAL:
+            return
+        last_edit = now
+        await message.edit(f"{title}: {min(100, int(seconds / duration * 100))}%")
+
+    return report
@@ -0,0 +1,94 @@
+import asyncio
+import hashlib
+import logging
+import os
+import uuid
+from typing import Awaitable, Callable, Optional, Tuple
+from db.db_utils import get_media_blob_by_source, media_blob_exists, media_blob_lock
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+MEDIA_ROOT = "media"
+
+# Сохраняет запись со ссылкой на файл: save(хэш, путь) -> удалось ли
+SaveBlob = Callable[[str, str], Awaitable[bool]]
+
+def hash_file(path: str) -> str:
+    """SHA-256 содержимого файла (читается блоками по 1 МБ)."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+class MediaStore:
+    """Хранилище медиа с адресацией по содержимому.
+
+    Файл лежит по пути <root>/<kind>/<ab>/<cd>/<sha256>.<ext>, поэтому одинаковые
+    записи под разными именами хранятся один раз, а каталоги не разрастаются.
+    Учёт ссылок ведётся в таблице media_blobs, привязка исходного файла
+    Telegram (file_unique_id) к готовому результату — в media_sources.
+    Перенос файла вместе с сохранением ссылки на него и удаление файла без
+    ссылок идут под блокировкой хэша (db_utils.media_blob_lock).
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+
+    def blob_path(self, kind: str, content_hash: str, ext: str) -> str:
+        return os.path.join(self.root, kind, content_hash[:2], content_hash[2:4], f"{content_hash}.{ext}")
+
+    def staging_path(self, kind: str, ext: str) -> str:
+        """Путь для записи нового файла до того, как станет известен его хэш."""
+        staging_dir = os.path.join(self.root, kind, "tmp")
+        os.makedirs(staging_dir, exist_ok=True)
+        return os.path.join(staging_dir, f"{uuid.uuid4().hex}.{ext}")
+
+    async def find(self, kind: str, file_unique_id: str) -> Optional[Tuple[str, str]]:
+        """Возвращает (хэш, путь) уже сохранённого результата для исходного файла Telegram."""
+        blob = await get_media_blob_by_source(kind, file_unique_id)
+        if blob and os.path.exists(blob[1]):
+            return blob
+        return None
+
+    def _place(self, kind: str, staging_path: str, content_hash: str, ext: str) -> str:
+        path = self.blob_path(kind, content_hash, ext)
+        if os.path.exists(path):
+            os.remove(staging_path)
+        else:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            os.replace(staging_path, path)
+        return path
+
+    async def _discard(self, content_hash: str, path: str):
+        if not await media_blob_exists(content_hash) and os.path.exists(path):
+            os.remove(path)
+
+    async def store(self, kind: str, staging_path: str, ext: str, save: SaveBlob) -> bool:
+        """Переносит готовый файл в хранилище и сохраняет запись через save(хэш, путь).
+
+        Если save вернул False или выбросил исключение, файл удаляется,
+        когда на него никто не ссылается.
+        """
+        content_hash = await asyncio.to_thread(hash_file, staging_path)
+        async with media_blob_lock(content_hash):
+            path = self._place(kind, staging_path, content_hash, ext)
+            try:
+                saved = await save(content_hash, path)
+            except BaseException:
+                await self._discard(content_hash, path)
+                raise
+            if not saved:
+                await self._discard(content_hash, path)
+            return saved
+
+    async def reuse(self, content_hash: str, path: str, save: SaveBlob) -> bool:
+        """Сохраняет ещё одну ссылку на файл, найденный через find."""
+        async with media_blob_lock(content_hash):
+            # Между find и блокировкой последняя ссылка на файл могла быть удалена
+            if not os.path.exists(path):
+                raise FileNotFoundError(f"Файл {path} удалён, повторите команду")
+            return await save(content_hash, path)
+
+media_store = MediaStore(MEDIA_ROOT)
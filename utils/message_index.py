@@ -0,0 +1,241 @@
+"""Индекс недавних сообщений по чатам, собранный из потока обновлений.
+
+Команды удаления и конвертации раскладки ищут свои цели здесь, без
+search_messages и get_chat_history. Индекс видит входящие обновления
+(в том числе сообщения, отправленные с других устройств) и собственные
+отправки и удаления этой сессии (через client.invoke). Pyrogram не
+догоняет обновления, пропущенные во время разрыва соединения, поэтому при
+разрыве индекс очищается, а при UpdatesTooLong / UpdateChannelTooLong
+забываются затронутые чаты. Так для каждого чата индекс непрерывен от
+первой записи до последней. Ответ, которого в индексе нет, ищется на
+сервере.
+"""
+import logging
+import zlib
+from collections import OrderedDict
+from typing import Iterable, List, Optional
+from pyrogram import Client, raw, utils
+from pyrogram.handlers import DeletedMessagesHandler, DisconnectHandler, EditedMessageHandler, MessageHandler
+from pyrogram.types import Message
+from utils.peer_cache import input_peer_id
+from config import MESSAGE_INDEX_PER_CHAT, MESSAGE_INDEX_MAX_CHATS
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Группа обработчиков индекса: раньше команд, чтобы команда уже видела своё сообщение
+MESSAGE_INDEX_GROUP = -2
+# id каналов и супергрупп меньше этой границы (-100…)
+CHANNEL_ID_BOUND = -10 ** 12
+
+def text_hash(text: Optional[str]) -> int:
+    """Короткий хэш текста; 0 — текста нет."""
+    if not text:
+        return 0
+    return zlib.crc32(text.encode()) or 1
+
+class MessageRecord:
+    """Компактная запись о сообщении."""
+    __slots__ = ("id", "sender_id", "date", "text_hash", "reply_to")
+
+    def __init__(self, message_id: int, sender_id: Optional[int], date: int, text_hash: int,
+                 reply_to: Optional[int]):
+        self.id = message_id
+        self.sender_id = sender_id
+        self.date = date
+        self.text_hash = text_hash
+        self.reply_to = reply_to
+
+class MessageIndex:
+    """Последние per_chat сообщений в каждом из max_chats недавно активных чатов."""
+
+    def __init__(self, per_chat: int, max_chats: int):
+        self.per_chat = per_chat
+        self.max_chats = max_chats
+        self._chats: "OrderedDict[int, OrderedDict[int, MessageRecord]]" = OrderedDict()
+        self._me: Optional[int] = None
+        self.hits = 0
+        self.misses = 0
+        self.resets = 0
+
+    def _add(self, chat_id: int, record: MessageRecord):
+        chat = self._chats.get(chat_id)
+        if chat is None:
+            chat = self._chats[chat_id] = OrderedDict()
+        self._chats.move_to_end(chat_id)
+        while len(self._chats) > self.max_chats:
+            self._chats.popitem(last=False)
+
+        last_id = next(reversed(chat), None)
+        chat[record.id] = record
+        if last_id is not None and record.id < last_id:
+            # Обновления почти всегда приходят по порядку; редкое опоздавшее встаёт на место
+            self._chats[chat_id] = chat = OrderedDict(sorted(chat.items()))
+        while len(chat) > self.per_chat:
+            chat.popitem(last=False)
+
+    def add(self, message: Message):
+        if not message.chat or message.empty:
+            return
+        sender_id = message.from_user.id if message.from_user else (
+            message.sender_chat.id if message.sender_chat else None)
+        self._add(message.chat.id, MessageRecord(
+            message.id,
+            sender_id,
+            int(message.date.timestamp()) if message.date else 0,
+            text_hash(message.text or message.caption),
+            message.reply_to_message_id
+        ))
+
+    def update_text(self, message: Message):
+        chat = self._chats.get(message.chat.id) if message.chat else None
+        record = chat.get(message.id) if chat else None
+        if record:
+            record.text_hash = text_hash(message.text or message.caption)
+
+    def remove(self, chat_id: Optional[int], message_ids: Iterable[int]):
+        """Убирает сообщения; chat_id None — чат неизвестен (личные чаты и обычные группы).
+
+        У каналов и супергрупп своя нумерация сообщений, поэтому удаление без
+        чата их не затрагивает.
+        """
+        if chat_id is not None:
+            chats = [self._chats.get(chat_id)]
+        else:
+            chats = [chat for indexed_id, chat in self._chats.items() if indexed_id > CHANNEL_ID_BOUND]
+        for chat in chats:
+            if chat:
+                for message_id in message_ids:
+                    chat.pop(message_id, None)
+
+    def forget(self, chat_id: int):
+        """Забывает чат: в его истории мог появиться пропуск."""
+        self._chats.pop(chat_id, None)
+
+    def clear(self, reason: str):
+        """Забывает все чаты: обновления за какое-то время могли потеряться."""
+        if self._chats:
+            logger.info(f"Индекс сообщений очищен: {reason}")
+        self._chats.clear()
+        self.resets += 1
+
+    def recent_from(self, chat_id: int, sender_id: int, limit: int,
+                    before_id: Optional[int] = None) -> Optional[List[int]]:
+        """id последних limit сообщений отправителя (новые первыми).
+
+        None — в индексе их меньше limit, нужен запрос к серверу.
+        """
+        found = []
+        for record in reversed(self._chats.get(chat_id, {}).values()):
+            if before_id is not None and record.id >= before_id:
+                continue
+            if record.sender_id == sender_id:
+                found.append(record.id)
+                if len(found) == limit:
+                    self.hits += 1
+                    return found
+        self.misses += 1
+        return None
+
+    def find(self, chat_id: int, sender_id: int, before_id: Optional[int] = None,
+             reply_to: Optional[int] = None) -> Optional[MessageRecord]:
+        """Последнее текстовое сообщение отправителя (при reply_to — ответ на это сообщение)."""
+        for record in reversed(self._chats.get(chat_id, {}).values()):
+            if before_id is not None and record.id >= before_id:
+                continue
+            if record.sender_id == sender_id and record.text_hash and (
+                    reply_to is None or record.reply_to == reply_to):
+                self.hits += 1
+                return record
+        self.misses += 1
+        return None
+
+    def _observe(self, query, result):
+        # Отправки и удаления этой сессии не приходят обновлениями — берём их из запроса и ответа
+        if isinstance(query, raw.functions.messages.DeleteMessages):
+            self.remove(None, query.id)
+            return
+        if isinstance(query, raw.functions.channels.DeleteMessages):
+            self.remove(input_peer_id(query.channel, self._me), query.id)
+            return
+        if isinstance(result, raw.types.UpdateShortSentMessage):
+            chat_id = input_peer_id(getattr(query, "peer", None), self._me)
+            if chat_id is not None:
+                reply_to = getattr(query, "reply_to_msg_id", None) or getattr(
+                    getattr(query, "reply_to", None), "reply_to_msg_id", None)
+                self._add(chat_id, MessageRecord(result.id, self._me, result.date,
+                                                 text_hash(getattr(query, "message", None)), reply_to))
+            return
+        for update in getattr(result, "updates", ()):
+            if isinstance(update, (raw.types.UpdateNewMessage, raw.types.UpdateNewChannelMessage)):
+                message = update.message
+                if isinstance(message, raw.types.Message):
+                    if message.out:
+                        sender_id = self._me
+                    elif message.from_id:
+                        sender_id = utils.get_peer_id(message.from_id)
+                    else:
+                        sender_id = utils.get_peer_id(message.peer_id)
+                    self._add(utils.get_peer_id(message.peer_id), MessageRecord(
+                        message.id, sender_id, message.date, text_hash(message.message),
+                        getattr(message.reply_to, "reply_to_msg_id", None)
+                    ))
+
+    def install(self, client: Client):
+        """Подключает индекс к потоку обновлений и ответам на запросы клиента."""
+        async def on_message(_: Client, message: Message):
+            self.add(message)
+
+        async def on_edited(_: Client, message: Message):
+            self.update_text(message)
+
+        async def on_deleted(_: Client, messages: List[Message]):
+            for message in messages:
+                self.remove(message.chat.id if message.chat else None, [message.id])
+
+        client.add_handler(MessageHandler(on_message), MESSAGE_INDEX_GROUP)
+        client.add_handler(EditedMessageHandler(on_edited), MESSAGE_INDEX_GROUP)
+        client.add_handler(DeletedMessagesHandler(on_deleted), MESSAGE_INDEX_GROUP)
+
+        # Вызывается и при переподключении сессии: пропущенные обновления не придут
+        async def on_disconnect(_: Client):
+            self.clear("соединение разорвано")
+
+        client.add_handler(DisconnectHandler(on_disconnect))
+
+        handle_updates = client.handle_updates
+
+        async def handle_and_check_gaps(updates):
+            if isinstance(updates, raw.types.UpdatesTooLong):
+                self.clear("сервер пропустил обновления")
+            for update in getattr(updates, "updates", ()):
+                if isinstance(update, raw.types.UpdateChannelTooLong):
+                    self.forget(utils.get_channel_id(update.channel_id))
+            return await handle_updates(updates)
+
+        client.handle_updates = handle_and_check_gaps
+
+        invoke = client.invoke
+
+        async def invoke_and_index(query, *args, **kwargs):
+            result = await invoke(query, *args, **kwargs)
+            try:
+                if self._me is None and client.me:
+                    self._me = client.me.id
+                self._observe(query, result)
+            except Exception as e:
+                logger.warning(f"Не удалось обновить индекс по ответу на запрос: {e}")
+            return result
+
+        client.invoke = invoke_and_index
+
+    def stats(self) -> dict:
+        return {
+            "chats": len(self._chats),
+            "messages": sum(len(chat) for chat in self._chats.values()),
+            "hits": self.hits,
+            "misses": self.misses,
+            "resets": self.resets,
+        }
+
+message_index = MessageIndex(MESSAGE_INDEX_PER_CHAT, MESSAGE_INDEX_MAX_CHATS)
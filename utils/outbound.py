@@ -0,0 +1,262 @@
+"""Общий планировщик исходящих запросов к Telegram с учётом FloodWait.
+
+Отправки, правки, удаления и действия в чате проходят через корзины
+токенов: на аккаунт и на каждый чат, отдельно для каждого вида. FloodWait
+от Telegram блокирует корзину вида на указанное время и вдвое снижает её
+скорость, после успешных запросов скорость постепенно возвращается.
+Фоновые запросы (кадры анимаций, массовые правки, интервалы) оставляют
+запас токенов и пропускают вперёд интерактивные, которые ждут тех же
+корзин (не FloodWait); устаревшие фоновые запросы с общим ключом
+объединения отбрасываются.
+
+Фоновые пути вызывают run явно. Остальные отправки, правки, удаления и
+действия клиента (обычные ответы команд) планировщик перехватывает на
+client.invoke (install) и пропускает как интерактивные.
+"""
+import asyncio
+import itertools
+import logging
+import time
+from collections import OrderedDict
+from contextvars import ContextVar
+from enum import IntEnum
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+from pyrogram import Client, raw
+from pyrogram import errors as pyrogram_errors
+from pyrogram.errors import FloodWait
+from utils.peer_cache import input_peer_id
+from config import OUTBOUND_LIMITS, OUTBOUND_MAX_FLOOD_WAIT, OUTBOUND_FLOOD_RETRIES
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Для скольких пар (вид, чат) держать корзины (давно не использованные вытесняются)
+MAX_CHAT_BUCKETS = 1000
+# Во сколько раз скорость может упасть после FloodWait
+MIN_RATE_FACTOR = 0.1
+# Доля исходной скорости, возвращаемая после каждого успешного запроса
+RECOVERY_STEP = 0.05
+
+# Запросы, которые планировщик перехватывает у клиента: вид и поле с чатом
+OUTBOUND_QUERIES = {
+    raw.functions.messages.SendMessage: ("send", "peer"),
+    raw.functions.messages.SendMedia: ("send", "peer"),
+    raw.functions.messages.SendMultiMedia: ("send", "peer"),
+    raw.functions.messages.ForwardMessages: ("send", "to_peer"),
+    raw.functions.messages.EditMessage: ("edit", "peer"),
+    raw.functions.messages.DeleteMessages: ("delete", None),
+    raw.functions.channels.DeleteMessages: ("delete", "channel"),
+    raw.functions.messages.SetTyping: ("action", "peer"),
+}
+
+# Запрос уже выполняется внутри run: перехват на client.invoke его не учитывает повторно
+_scheduled: ContextVar[bool] = ContextVar("outbound_scheduled", default=False)
+
+# Ошибки, после которых отправка в чат не имеет смысла
+PERMANENT_SEND_ERRORS = (
+    pyrogram_errors.ChatWriteForbidden,
+    pyrogram_errors.ChatAdminRequired,
+    pyrogram_errors.ChannelPrivate,
+    pyrogram_errors.PeerIdInvalid,
+    pyrogram_errors.UserBannedInChannel,
+)
+
+class Priority(IntEnum):
+    """Приоритет запроса: чем больше значение, тем больше токенов он оставляет другим."""
+    INTERACTIVE = 0
+    NORMAL = 1
+    BACKGROUND = 2
+
+class TokenBucket:
+    """Корзина токенов с блокировкой после FloodWait и адаптивной скоростью."""
+
+    def __init__(self, rate: float, capacity: float):
+        self.base_rate = rate
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.blocked_until = 0.0
+        self._updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def wait_time(self, now: float, reserve: float = 0) -> float:
+        """Через сколько секунд в корзине будет токен сверх reserve."""
+        self._refill(now)
+        needed = 1 + min(reserve, self.capacity - 1)
+        wait = (needed - self.tokens) / self.rate if self.tokens < needed else 0.0
+        return max(wait, self.blocked_until - now)
+
+    def take(self):
+        self.tokens -= 1
+
+    def penalize(self, seconds: float, now: float):
+        self._refill(now)
+        self.blocked_until = max(self.blocked_until, now + seconds)
+        self.rate = max(self.base_rate * MIN_RATE_FACTOR, self.rate / 2)
+        self.tokens = 0
+
+    def recover(self):
+        self.rate = min(self.base_rate, self.rate + self.base_rate * RECOVERY_STEP)
+
+class OutboundScheduler:
+    """Ограничивает исходящие запросы аккаунта и отдельных чатов."""
+
+    def __init__(self, limits: Dict[str, Tuple[float, float, float, float]], max_flood_wait: float,
+                 flood_retries: int):
+        self.limits = limits
+        self._account = {kind: TokenBucket(rate, burst) for kind, (rate, burst, _, _) in limits.items()}
+        self.max_flood_wait = max_flood_wait
+        self.flood_retries = flood_retries
+        self._chats: "OrderedDict[Tuple[str, int], TokenBucket]" = OrderedDict()
+        self._latest: Dict[Hashable, int] = {}
+        self._generations = itertools.count(1)
+        # Сколько интерактивных запросов ждут токенов: (вид, None) — корзины
+        # аккаунта, (вид, чат) — только корзины этого чата
+        self._interactive_waiting: Dict[Tuple[str, Optional[int]], int] = {}
+        self.calls = 0
+        self.flood_waits = 0
+        self.coalesced = 0
+        self.waited = 0.0
+
+    def _chat(self, kind: str, chat_id: int) -> TokenBucket:
+        key = (kind, chat_id)
+        bucket = self._chats.get(key)
+        if bucket is None:
+            _, _, rate, burst = self.limits[kind]
+            bucket = self._chats[key] = TokenBucket(rate, burst)
+        self._chats.move_to_end(key)
+        while len(self._chats) > MAX_CHAT_BUCKETS:
+            self._chats.popitem(last=False)
+        return bucket
+
+    def _move_claim(self, old: Optional[Tuple[str, Optional[int]]],
+                    new: Optional[Tuple[str, Optional[int]]]) -> Optional[Tuple[str, Optional[int]]]:
+        if old == new:
+            return new
+        if old is not None:
+            self._interactive_waiting[old] -= 1
+            if not self._interactive_waiting[old]:
+                del self._interactive_waiting[old]
+        if new is not None:
+            self._interactive_waiting[new] = self._interactive_waiting.get(new, 0) + 1
+        return new
+
+    def _interactive_ahead(self, kind: str, chat_id: Optional[int]) -> bool:
+        return bool(self._interactive_waiting.get((kind, None))
+                    or (chat_id is not None and self._interactive_waiting.get((kind, chat_id))))
+
+    async def _acquire(self, kind: str, chat_id: Optional[int], priority: Priority,
+                       superseded: Callable[[], bool]) -> bool:
+        """Ждёт токены; False — запрос устарел, пока ждал, и токены не взяты."""
+        account = self._account[kind]
+        reserve = float(priority)
+        started = time.monotonic()
+        claim = None
+        try:
+            while True:
+                if superseded():
+                    return False
+                now = time.monotonic()
+                chat = self._chat(kind, chat_id) if chat_id is not None else None
+                account_wait = account.wait_time(now, reserve)
+                wait = max(account_wait, chat.wait_time(now, reserve) if chat else 0.0)
+                if priority == Priority.INTERACTIVE:
+                    # Запрос, который выжидает FloodWait, фоновые не задерживает
+                    blocked = account.blocked_until > now or (chat is not None and chat.blocked_until > now)
+                    if wait <= 0 or blocked:
+                        claim = self._move_claim(claim, None)
+                    else:
+                        claim = self._move_claim(claim, (kind, None if account_wait > 0 else chat_id))
+                # Фоновые запросы ждут, пока не пройдут интерактивные, которым нужны те же корзины
+                elif wait <= 0 and self._interactive_ahead(kind, chat_id):
+                    wait = 1 / account.rate
+                if wait <= 0:
+                    account.take()
+                    if chat:
+                        chat.take()
+                    self.waited += now - started
+                    return True
+                await asyncio.sleep(wait)
+        finally:
+            self._move_claim(claim, None)
+
+    def _penalize(self, kind: str, chat_id: Optional[int], seconds: float):
+        now = time.monotonic()
+        self.flood_waits += 1
+        self._account[kind].penalize(seconds, now)
+        if chat_id is not None:
+            self._chat(kind, chat_id).penalize(seconds, now)
+        logger.warning(f"FloodWait {seconds} сек на '{kind}' (chat_id={chat_id}), скорость снижена")
+
+    async def run(self, kind: str, chat_id: Optional[int], call: Callable[..., Awaitable[Any]], *args,
+                  priority: Priority = Priority.NORMAL, coalesce: Optional[Hashable] = None, **kwargs) -> Any:
+        """Выполняет запрос call(*args, **kwargs), когда позволяют лимиты.
+
+        kind — вид запроса ("send", "edit", "delete", "action"). Запрос с ключом
+        coalesce отбрасывается (возвращается None), если пока он ждал, пришёл
+        более новый запрос с тем же ключом. FloodWait до max_flood_wait секунд
+        выжидается и запрос повторяется, более долгий передаётся вызывающему.
+        """
+        generation = None
+        if coalesce is not None:
+            # Общий счётчик: номер не повторяется, даже когда ключ удалён из _latest
+            generation = self._latest[coalesce] = next(self._generations)
+
+        def superseded() -> bool:
+            return coalesce is not None and self._latest.get(coalesce) != generation
+
+        try:
+            for attempt in range(self.flood_retries + 1):
+                if not await self._acquire(kind, chat_id, priority, superseded):
+                    self.coalesced += 1
+                    return None
+                self.calls += 1
+                token = _scheduled.set(True)
+                try:
+                    result = await call(*args, **kwargs)
+                except FloodWait as e:
+                    self._penalize(kind, chat_id, e.value)
+                    if attempt == self.flood_retries or e.value > self.max_flood_wait:
+                        raise
+                    continue
+                finally:
+                    _scheduled.reset(token)
+                self._account[kind].recover()
+                if chat_id is not None:
+                    self._chat(kind, chat_id).recover()
+                return result
+        finally:
+            if coalesce is not None and self._latest.get(coalesce) == generation:
+                del self._latest[coalesce]
+
+    def install(self, client: Client):
+        """Пропускает через планировщик отправки, правки, удаления и действия клиента.
+
+        Запросы, которые вызывающий не передал в run сам, идут как интерактивные.
+        """
+        invoke = client.invoke
+
+        async def invoke_scheduled(query, *args, **kwargs):
+            route = OUTBOUND_QUERIES.get(type(query))
+            if route is None or _scheduled.get():
+                return await invoke(query, *args, **kwargs)
+            kind, peer_field = route
+            me = client.me.id if client.me else None
+            chat_id = input_peer_id(getattr(query, peer_field), me) if peer_field else None
+            return await self.run(kind, chat_id, invoke, query, *args, priority=Priority.INTERACTIVE, **kwargs)
+
+        client.invoke = invoke_scheduled
+
+    def stats(self) -> dict:
+        return {
+            "calls": self.calls,
+            "flood_waits": self.flood_waits,
+            "coalesced": self.coalesced,
+            "waited": self.waited,
+            "throttled": [kind for kind, bucket in self._account.items() if bucket.rate < bucket.base_rate],
+        }
+
+outbound = OutboundScheduler(OUTBOUND_LIMITS, OUTBOUND_MAX_FLOOD_WAIT, OUTBOUND_FLOOD_RETRIES)
@@ -0,0 +1,189 @@
+"""Кэш сведений о чатах и пользователях (название, имя, username).
+
+Списки команд (интервалы, фейковая активность) показывают названия чатов
+без запроса на каждую строку: промахи собираются в пакеты — один
+get_users для пользователей, один messages.GetChats для групп и один
+channels.GetChannels для каналов и супергрупп. Что не удалось получить
+пакетом, запрашивается по одному через get_chat, не больше concurrency
+запросов одновременно. Недоступные чаты и несуществующие username тоже
+запоминаются (на negative_ttl секунд), чтобы не спрашивать о них снова;
+временные ошибки (сеть, FloodWait) не запоминаются.
+"""
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple, Union
+from pyrogram import Client, raw, utils
+from pyrogram.errors import (ChannelInvalid, ChannelPrivate, ChatForbidden, ChatIdInvalid, PeerIdInvalid,
+                             UserIdInvalid, UsernameInvalid, UsernameNotOccupied)
+from pyrogram.types import Chat, User
+from config import PEER_CACHE_SIZE, PEER_CACHE_TTL, PEER_CACHE_NEGATIVE_TTL, PEER_RESOLVE_CONCURRENCY
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Ошибки поиска по username, которые запоминаются как отрицательный ответ
+MISSING_USERNAME_ERRORS = (UsernameNotOccupied, UsernameInvalid)
+
+# Ошибки get_chat, после которых чат запоминается как недоступный
+UNAVAILABLE_CHAT_ERRORS = (ChannelPrivate, ChannelInvalid, ChatForbidden, ChatIdInvalid, PeerIdInvalid, UserIdInvalid)
+
+class PeerInfo(NamedTuple):
+    id: int
+    title: Optional[str]
+    first_name: Optional[str]
+    username: Optional[str]
+
+    @property
+    def name(self) -> Optional[str]:
+        return self.title or self.first_name
+
+def _from_chat(chat: Union[Chat, User]) -> PeerInfo:
+    return PeerInfo(chat.id, getattr(chat, "title", None), chat.first_name, chat.username)
+
+def _from_raw_chat(chat) -> Tuple[int, Optional[PeerInfo]]:
+    """(chat_id, сведения) из raw-чата; для закрытых чатов сведений нет."""
+    if isinstance(chat, raw.types.Chat):
+        return -chat.id, PeerInfo(-chat.id, chat.title, None, None)
+    if isinstance(chat, raw.types.ChatForbidden):
+        return -chat.id, None
+    chat_id = utils.get_channel_id(chat.id)
+    if isinstance(chat, raw.types.Channel):
+        return chat_id, PeerInfo(chat_id, chat.title, None, chat.username)
+    return chat_id, None
+
+def input_peer_id(peer, me: Optional[int]) -> Optional[int]:
+    """id чата из raw-пира запроса (InputPeer*, InputChannel); me — id своего аккаунта."""
+    if isinstance(peer, raw.types.InputPeerSelf):
+        return me
+    if isinstance(peer, raw.types.InputPeerUser):
+        return peer.user_id
+    if isinstance(peer, raw.types.InputPeerChat):
+        return -peer.chat_id
+    if isinstance(peer, (raw.types.InputPeerChannel, raw.types.InputChannel)):
+        return utils.get_channel_id(peer.channel_id)
+    return None
+
+# Ключ кэша: id чата или "@username" в нижнем регистре; значение — сведения,
+# None (чат недоступен) или ошибка поиска по username
+Entry = Union[PeerInfo, None, Exception]
+
+class PeerCache:
+    """LRU сведений о чатах с временем жизни и отрицательным кэшированием."""
+
+    def __init__(self, max_size: int, ttl: float, negative_ttl: float, concurrency: int):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.concurrency = concurrency
+        self._entries: "OrderedDict[Union[int, str], Tuple[float, Entry]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def _lookup(self, key: Union[int, str]) -> Tuple[bool, Entry]:
+        entry = self._entries.get(key)
+        if entry and entry[0] > time.time():
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return True, entry[1]
+        self.misses += 1
+        return False, None
+
+    def _store(self, key: Union[int, str], value: Entry):
+        ttl = self.ttl if isinstance(value, PeerInfo) else self.negative_ttl
+        self._entries[key] = (time.time() + ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    async def _fetch_users(self, client: Client, user_ids: List[int]) -> Dict[int, Optional[PeerInfo]]:
+        users = await client.get_users(user_ids)
+        return {user.id: _from_chat(user) for user in users}
+
+    async def _fetch_chats(self, client: Client, chat_ids: List[int]) -> Dict[int, Optional[PeerInfo]]:
+        result = await client.invoke(raw.functions.messages.GetChats(id=[-chat_id for chat_id in chat_ids]))
+        return dict(_from_raw_chat(chat) for chat in result.chats)
+
+    async def _fetch_channels(self, client: Client, channel_ids: List[int]) -> Dict[int, Optional[PeerInfo]]:
+        peers = await asyncio.gather(*(client.resolve_peer(channel_id) for channel_id in channel_ids))
+        result = await client.invoke(raw.functions.channels.GetChannels(id=[
+            raw.types.InputChannel(channel_id=peer.channel_id, access_hash=peer.access_hash) for peer in peers
+        ]))
+        return dict(_from_raw_chat(chat) for chat in result.chats)
+
+    async def _fetch(self, client: Client, chat_ids: List[int]) -> Dict[int, Optional[PeerInfo]]:
+        by_type: Dict[str, List[int]] = {"user": [], "chat": [], "channel": []}
+        for chat_id in chat_ids:
+            by_type[utils.get_peer_type(chat_id)].append(chat_id)
+
+        # Один запрос на каждый тип; ошибка пакета оставляет его id для запросов по одному
+        fetchers = [(self._fetch_users, by_type["user"]), (self._fetch_chats, by_type["chat"]),
+                    (self._fetch_channels, by_type["channel"])]
+        batches = await asyncio.gather(
+            *(fetch(client, ids) for fetch, ids in fetchers if ids), return_exceptions=True
+        )
+        resolved: Dict[int, Optional[PeerInfo]] = {}
+        for batch in batches:
+            if isinstance(batch, Exception):
+                logger.warning(f"Пакетный запрос сведений о чатах не удался: {batch}")
+            else:
+                resolved.update(batch)
+
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def fetch_one(chat_id: int):
+            async with semaphore:
+                try:
+                    resolved[chat_id] = _from_chat(await client.get_chat(chat_id))
+                except UNAVAILABLE_CHAT_ERRORS as e:
+                    logger.info(f"Чат {chat_id} недоступен: {e}")
+                    resolved[chat_id] = None
+                except Exception as e:
+                    # Временная ошибка: чат не попадает ни в результат, ни в кэш
+                    logger.warning(f"Не удалось получить сведения о чате {chat_id}: {e}")
+
+        await asyncio.gather(*(fetch_one(chat_id) for chat_id in chat_ids if chat_id not in resolved))
+        return resolved
+
+    async def get_many(self, client: Client, chat_ids: Iterable[int]) -> Dict[int, Optional[PeerInfo]]:
+        """Сведения о чатах по id; None — чат недоступен, id нет — сведения
+        временно не получены."""
+        result: Dict[int, Optional[PeerInfo]] = {}
+        missing = []
+        for chat_id in dict.fromkeys(chat_ids):
+            found, value = self._lookup(chat_id)
+            if found:
+                result[chat_id] = value
+            else:
+                missing.append(chat_id)
+
+        if missing:
+            for chat_id, info in (await self._fetch(client, missing)).items():
+                self._store(chat_id, info)
+                result[chat_id] = info
+        return result
+
+    async def get(self, client: Client, chat_id: int) -> Optional[PeerInfo]:
+        return (await self.get_many(client, [chat_id])).get(chat_id)
+
+    async def resolve_username(self, client: Client, username: str) -> PeerInfo:
+        """Пользователь или чат по @username; ошибки «не существует» повторяются из кэша."""
+        key = username.lower()
+        found, value = self._lookup(key)
+        if not found:
+            try:
+                chat = await client.get_users(username)
+                value = _from_chat(chat)
+                self._store(chat.id, value)
+            except MISSING_USERNAME_ERRORS as e:
+                value = e
+            self._store(key, value)
+        if isinstance(value, Exception):
+            raise value
+        return value
+
+    def stats(self) -> dict:
+        return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+peer_cache = PeerCache(PEER_CACHE_SIZE, PEER_CACHE_TTL, PEER_CACHE_NEGATIVE_TTL, PEER_RESOLVE_CONCURRENCY)
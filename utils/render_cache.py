@@ -0,0 +1,140 @@
+import asyncio
+import hashlib
+import logging
+from collections import OrderedDict
+from io import BytesIO
+from typing import Awaitable, Callable, Iterable, List, Optional, Union
+from pyrogram import Client
+from pyrogram.types import Message, Photo
+from db.db_utils import load_rendered_file_ids, save_rendered_file_id, touch_rendered_file_id, delete_rendered_file_id
+from utils.file_id_cache import Sender, file_id_rejected
+from utils.renderers import RENDER_VERSIONS
+from config import RENDER_CACHE_SIZE
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Отправка альбома: список file_id или буферов → отправленные сообщения
+GroupSender = Callable[[List[Union[str, BytesIO]]], Awaitable[List[Message]]]
+
+def _sent_file_id(message: Optional[Message]) -> Optional[str]:
+    media = message and (message.photo or message.animation)
+    return media.file_id if media else None
+
+class RenderCache:
+    """Кэш готовых изображений и анимаций: (команда, источник, текст, версия) → file_id.
+
+    Повтор команды на том же сообщении с тем же текстом отправляет уже
+    загруженное в Telegram изображение по file_id — без скачивания,
+    отрисовки и загрузки. Хранится не больше max_size записей (LRU),
+    записи сохраняются в БД и переживают перезапуск.
+    """
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._entries: "OrderedDict[str, str]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def load(self, rows: Iterable[tuple]):
+        """Заполняет кэш строками (ключ, file_id) от давно использованных к недавним."""
+        self._entries = OrderedDict(rows)
+        logger.info(f"Кэш изображений загружен: {len(self._entries)} записей")
+
+    @staticmethod
+    def key(command: str, source_id: str, text: str) -> str:
+        raw = f"{command}\0{RENDER_VERSIONS[command]}\0{source_id}\0{text}"
+        return hashlib.sha256(raw.encode()).hexdigest()
+
+    async def send(self, key: str, send: Sender,
+                   produce: Callable[[], Awaitable[Optional[BytesIO]]]) -> Optional[Message]:
+        """Отправляет изображение по сохранённому file_id или создаёт его через produce().
+
+        produce() возвращает буфер для загрузки (None — ошибка отрисовки).
+        """
+        file_id = self._entries.get(key)
+        if file_id:
+            try:
+                sent = await send(file_id)
+                self.hits += 1
+                await self._touch(key)
+                return sent
+            except Exception as e:
+                if not file_id_rejected(e):
+                    raise
+                logger.warning(f"file_id изображения отклонён, рисуем заново: {e}")
+                await self._forget(key)
+
+        self.misses += 1
+        upload = await produce()
+        if upload is None:
+            return None
+        sent = await send(upload)
+        file_id = _sent_file_id(sent)
+        if file_id:
+            await self._remember(key, file_id)
+        return sent
+
+    async def send_album(self, keys: List[str], send_group: GroupSender,
+                         produce: Callable[[int], Awaitable[Optional[BytesIO]]]) -> Optional[List[Message]]:
+        """Отправляет альбом одним сообщением.
+
+        Уже отрисованные элементы идут по file_id, остальные создаются через
+        produce(индекс) одновременно. None — если хотя бы один элемент не удался.
+        """
+        media: List[Union[str, BytesIO, None]] = [self._entries.get(key) for key in keys]
+        missing = [i for i, file_id in enumerate(media) if not file_id]
+        rendered = await asyncio.gather(*(produce(i) for i in missing))
+        if any(upload is None for upload in rendered):
+            return None
+        for i, upload in zip(missing, rendered):
+            media[i] = upload
+
+        try:
+            sent = await send_group(media)
+        except Exception as e:
+            if len(missing) == len(keys) or not file_id_rejected(e):
+                raise
+            logger.warning(f"file_id в альбоме отклонён, рисуем альбом заново: {e}")
+            for key in keys:
+                await self._forget(key)
+            return await self.send_album(keys, send_group, produce)
+
+        self.hits += len(keys) - len(missing)
+        self.misses += len(missing)
+        for i, (key, message) in enumerate(zip(keys, sent)):
+            file_id = _sent_file_id(message)
+            if i not in missing:
+                await self._touch(key)
+            elif file_id:
+                await self._remember(key, file_id)
+        return sent
+
+    async def _touch(self, key: str):
+        self._entries.move_to_end(key)
+        await touch_rendered_file_id(key)
+
+    async def _remember(self, key: str, file_id: str):
+        self._entries[key] = file_id
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+        await save_rendered_file_id(key, file_id, self.max_size)
+
+    async def _forget(self, key: str):
+        if self._entries.pop(key, None):
+            await delete_rendered_file_id(key)
+
+render_cache = RenderCache(RENDER_CACHE_SIZE)
+
+def load_render_cache():
+    """Загружает сохранённые file_id изображений при старте."""
+    render_cache.load(load_rendered_file_ids(RENDER_CACHE_SIZE))
+
+async def reply_album_photos(client: Client, message: Message) -> List[Photo]:
+    """Фото альбома, на который ответили командой (пусто, если ответ не на альбом)."""
+    target = message.reply_to_message
+    if not target or not target.media_group_id:
+        return []
+    group = await client.get_media_group(target.chat.id, target.id)
+    return [item.photo for item in group if item.photo]
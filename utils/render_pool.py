@@ -0,0 +1,160 @@
+import asyncio
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from io import BytesIO
+from typing import Any, Callable, Dict, Optional, Tuple, Union
+from PIL import Image, ImageFont
+from config import RENDER_POOL_WORKERS
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Шаблоны и шрифты, которые каждый процесс отрисовки загружает один раз
+TEMPLATES = {
+    "demotivator": "resources/demotivator_template.jpg",
+    "quote": "resources/quote_template.jpg",
+}
+FONTS = {
+    "arial": "resources/fonts/arial.ttf",
+    "dejavu": "resources/fonts/DejaVuSans.ttf",
+    "emoji": "resources/fonts/seguiemj.ttf",
+}
+
+_templates: Dict[str, Image.Image] = {}
+_font_data: Dict[str, bytes] = {}
+_assets_loaded = False
+
+PhotoSource = Union[str, bytes]
+
+def _load_assets():
+    """Читает шаблоны и файлы шрифтов в память процесса отрисовки."""
+    global _assets_loaded
+    _assets_loaded = True
+    for name, path in TEMPLATES.items():
+        try:
+            image = Image.open(path)
+            image.load()
+            _templates[name] = image
+        except OSError as e:
+            logger.warning(f"Шаблон {path} не загружен: {e}")
+    for name, path in FONTS.items():
+        try:
+            with open(path, "rb") as f:
+                _font_data[name] = f.read()
+        except OSError as e:
+            logger.warning(f"Шрифт {path} не загружен: {e}")
+
+def template(name: str) -> Optional[Image.Image]:
+    """Копия заранее загруженного шаблона (None, если файла нет)."""
+    if not _assets_loaded:
+        _load_assets()
+    image = _templates.get(name)
+    return image.copy() if image else None
+
+def has_font(name: str) -> bool:
+    """Загружен ли файл шрифта (если нет, font() вернёт шрифт по умолчанию)."""
+    if not _assets_loaded:
+        _load_assets()
+    return name in _font_data
+
+@lru_cache(maxsize=64)
+def font(name: str, size: int) -> ImageFont.FreeTypeFont:
+    """Шрифт нужного размера; создаётся из данных в памяти один раз на процесс."""
+    if not _assets_loaded:
+        _load_assets()
+    data = _font_data.get(name)
+    try:
+        if data is None:
+            raise OSError(f"шрифт '{name}' не загружен")
+        return ImageFont.truetype(BytesIO(data), size)
+    except OSError as e:
+        logger.error(f"Ошибка загрузки шрифта {name} ({size}): {e}")
+        return ImageFont.load_default()
+
+def open_photo(source: PhotoSource, size: Optional[Tuple[int, int]] = None) -> Image.Image:
+    """Открывает фото из файла или байтов.
+
+    Если известен итоговый размер, JPEG декодируется в режиме draft сразу
+    в уменьшенном в 2–8 раз виде (не меньше size), и LANCZOS обрабатывает
+    уже небольшое изображение.
+    """
+    image = Image.open(BytesIO(source) if isinstance(source, (bytes, bytearray)) else source)
+    if size:
+        image.draft("RGB", size)
+    return image
+
+def to_jpeg(image: Image.Image, quality: int = 75) -> bytes:
+    output = BytesIO()
+    image.convert("RGB").save(output, "JPEG", quality=quality)
+    return output.getvalue()
+
+def as_upload(data: bytes, name: str) -> BytesIO:
+    """Буфер с готовым изображением для send_photo; имя файла Pyrogram берёт из .name."""
+    upload = BytesIO(data)
+    upload.name = name
+    return upload
+
+class RenderPool:
+    """Пул процессов для отрисовки изображений через PIL.
+
+    Отрисовка не выполняется в event loop: задания уходят в отдельные
+    процессы, где шаблоны и шрифты уже загружены при старте. Функции
+    отрисовки получают и возвращают байты, чтобы передача между процессами
+    была дешёвой.
+    """
+
+    def __init__(self, workers: int):
+        self.workers = workers
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._running = 0
+        self._completed = 0
+        self._failed = 0
+
+    def _ensure_started(self):
+        if self._executor:
+            return
+        # spawn: дочерние процессы не наследуют потоки и блокировки клиента Telegram
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_load_assets
+        )
+        logger.info(f"Пул отрисовки запущен: {self.workers} процессов")
+
+    async def run(self, func: Callable[..., Any], *args) -> Any:
+        """Выполняет func(*args) в процессе пула и возвращает результат."""
+        self._ensure_started()
+        self._running += 1
+        try:
+            result = await asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+            self._completed += 1
+            return result
+        except Exception:
+            self._failed += 1
+            raise
+        finally:
+            self._running -= 1
+
+    async def close(self):
+        if self._executor:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "running": self._running,
+            "completed": self._completed,
+            "failed": self._failed,
+        }
+
+render_pool = RenderPool(RENDER_POOL_WORKERS or max(1, (os.cpu_count() or 1) // 2))
+
+async def render(func: Callable[..., Any], *args) -> Any:
+    return await render_pool.run(func, *args)
+
+async def close_render_pool():
+    await render_pool.close()
@@ -0,0 +1,225 @@
+"""Функции отрисовки изображений для команд.
+
+Выполняются в процессах пула отрисовки (utils.render_pool): получают фото
+как путь или байты и возвращают готовый JPEG в байтах (кадры анимаций — PNG).
+"""
+import logging
+from io import BytesIO
+from textwrap import wrap
+from typing import List, Optional
+from PIL import Image, ImageDraw, ImageFont
+from utils import text_layout
+from utils.render_pool import PhotoSource, font, open_photo, template, to_jpeg
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Версии отрисовки для кэша готовых изображений: увеличить при изменении
+# шаблона или вида результата, чтобы старые file_id больше не использовались
+RENDER_VERSIONS = {
+    "demotivator": 1,
+    "quote": 2,
+    "advice": 1,
+    "type": 2,
+    "animation": 2,
+}
+
+# Демотиватор
+DEMOTIVATOR_PHOTO_SIZE = (610, 569)
+DEMOTIVATOR_PHOTO_POSITION = (54, 32)
+DEMOTIVATOR_TEXT_COLOR = (255, 255, 255)
+
+# Кадры текстовых анимаций
+FRAME_FONT_SIZE = 32
+FRAME_MAX_TEXT_WIDTH = 600
+FRAME_MAX_LINES = 12
+FRAME_PADDING = 40
+FRAME_MIN_SIZE = (320, 180)
+FRAME_BACKGROUND = (23, 33, 43)
+
+# Цитата
+MAX_TEXT_LENGTH = 500
+MAX_USERNAME_LENGTH = 30
+MAX_QUOTE_LINES = 10
+USERNAME_FONT_SIZE = 24
+AVATAR_SIZE = (150, 150)
+AVATAR_POSITION = (50, 50)
+TEXT_AREA_LEFT = AVATAR_POSITION[0] + AVATAR_SIZE[0] + 30
+TEXT_COLOR = (255, 255, 255)
+
+def render_demotivator(photo: PhotoSource, text: str) -> bytes:
+    """Демотиватор: фото на шаблоне и подпись в одну или две строки."""
+    canvas = template("demotivator")
+    if canvas is None:
+        raise FileNotFoundError("Шаблон демотиватора не найден")
+    mem = open_photo(photo, DEMOTIVATOR_PHOTO_SIZE).convert('RGBA')
+    resized_mem = mem.resize(DEMOTIVATOR_PHOTO_SIZE, Image.LANCZOS)
+
+    # Параметры подписи
+    strip_width, strip_height = 700, 1300
+    font_width = 50 if len(text) >= 25 else 60
+    draw = ImageDraw.Draw(canvas)
+
+    if '\n' in text:
+        split_offers = text.split('\n')[:2]  # Ограничиваем до 2 строк
+        for i, line in enumerate(split_offers):
+            if i == 1:
+                strip_height += 110
+                font_width -= 20
+            line_font = font("arial", font_width)
+            bbox = draw.textbbox((0, 0), line, font=line_font)
+            text_width = bbox[2] - bbox[0]
+            text_height = bbox[3] - bbox[1]
+            position = ((strip_width - text_width) / 2, (strip_height - text_height) / 2)
+            draw.text(position, line, fill=DEMOTIVATOR_TEXT_COLOR, font=line_font)
+    else:
+        line_font = font("arial", font_width)
+        bbox = draw.textbbox((0, 0), text, font=line_font)
+        text_width = bbox[2] - bbox[0]
+        text_height = bbox[3] - bbox[1]
+        strip_height = 1330
+        position = ((strip_width - text_width) / 2, (strip_height - text_height) / 2)
+        draw.text(position, text, fill=DEMOTIVATOR_TEXT_COLOR, font=line_font)
+
+    # Накладываем фото на шаблон
+    canvas.paste(resized_mem, DEMOTIVATOR_PHOTO_POSITION, resized_mem)
+    return to_jpeg(canvas)
+
+def _draw_advice_lines(draw: ImageDraw.ImageDraw, lines: List[str], line_font: ImageFont.FreeTypeFont,
+                       img_width: int, y_position: int, font_size: int):
+    for line in lines:
+        text_width = draw.textlength(line, font=line_font)
+        draw.text(
+            ((img_width - text_width) / 2, y_position),
+            line,
+            font=line_font,
+            fill="white",
+            stroke_width=2,
+            stroke_fill="black"
+        )
+        y_position += font_size + 5
+
+def render_advice(photo: PhotoSource, top_text: str, bottom_text: str) -> bytes:
+    """Мем «эдвайс»: текст сверху и снизу фото белым с чёрной обводкой."""
+    img = open_photo(photo).convert('RGB')
+    draw = ImageDraw.Draw(img)
+    img_width, img_height = img.size
+
+    # Адаптивный размер шрифта
+    font_size = int(img_height / 10)
+    advice_font = font("arial", font_size)
+    chars_per_line = int(img_width / (font_size * 0.6))
+
+    if top_text:
+        _draw_advice_lines(draw, wrap(top_text, width=chars_per_line), advice_font, img_width, 10, font_size)
+    if bottom_text:
+        wrapped_text = wrap(bottom_text, width=chars_per_line)
+        y_position = img_height - (len(wrapped_text) * (font_size + 5)) - 20
+        _draw_advice_lines(draw, wrapped_text, advice_font, img_width, y_position, font_size)
+
+    return to_jpeg(img)
+
+def create_circle_mask(size: tuple) -> Image.Image:
+    """Создаёт круглую маску для аватарки."""
+    mask = Image.new('L', size, 0)
+    draw = ImageDraw.Draw(mask)
+    draw.ellipse((0, 0, *size), fill=255)
+    return mask
+
+def calculate_font_size(text: str) -> int:
+    """Вычисляет размер шрифта на основе длины текста."""
+    text_length = len(text)
+    if text_length < 50:
+        return 36
+    elif text_length < 100:
+        return 30
+    elif text_length < 200:
+        return 24
+    elif text_length < 300:
+        return 20
+    return 18
+
+def prepare_avatar(photo: PhotoSource) -> bytes:
+    """Круглая аватарка 150×150 в PNG с прозрачностью, готовая для вставки в цитату."""
+    avatar = open_photo(photo, AVATAR_SIZE).convert('RGB').resize(AVATAR_SIZE, Image.Resampling.LANCZOS)
+    avatar.putalpha(create_circle_mask(AVATAR_SIZE))
+    output = BytesIO()
+    avatar.save(output, "PNG")
+    return output.getvalue()
+
+def render_quote(avatar: Optional[bytes], username: str, text: str) -> bytes:
+    """Цитата: круглая аватарка (результат prepare_avatar), имя под ней и текст справа."""
+    canvas = template("quote")
+    canvas = canvas.convert('RGB') if canvas else Image.new('RGB', (800, 500), (40, 40, 40))
+    canvas_width, canvas_height = canvas.size
+    draw = ImageDraw.Draw(canvas)
+
+    # Готовая круглая аватарка из кэша (серая заглушка, если фото нет)
+    if avatar is not None:
+        avatar_image = Image.open(BytesIO(avatar)).convert('RGBA')
+    else:
+        avatar_image = Image.new('RGB', AVATAR_SIZE, (200, 200, 200))
+        avatar_image.putalpha(create_circle_mask(AVATAR_SIZE))
+    canvas.paste(avatar_image, AVATAR_POSITION, avatar_image)
+
+    # Имя пользователя по центру под аватаркой: ширина известна без пробной отрисовки
+    name_runs = text_layout.shape(username[:MAX_USERNAME_LENGTH], USERNAME_FONT_SIZE)
+    name_width = sum(run.width for run in name_runs)
+    name_x = AVATAR_POSITION[0] + (AVATAR_SIZE[0] - name_width) // 2
+    name_y = AVATAR_POSITION[1] + AVATAR_SIZE[1] + 20
+    text_layout.draw_runs(draw, (name_x, name_y), name_runs, USERNAME_FONT_SIZE, TEXT_COLOR)
+
+    # Текст цитаты с размером шрифта по длине и вертикальным центрированием;
+    # каждая строка исходного текста (или отдельное сообщение) — свой абзац
+    text = text[:MAX_TEXT_LENGTH]
+    max_text_width = canvas_width - TEXT_AREA_LEFT - 50
+    font_size = calculate_font_size(text)
+    lines = text_layout.layout(text.split("\n"), font_size, max_text_width, MAX_QUOTE_LINES)
+
+    line_height = int(font_size * 1.2)
+    text_y = (canvas_height - len(lines) * line_height) // 2
+    for runs in lines:
+        text_layout.draw_runs(draw, (TEXT_AREA_LEFT, text_y), runs, font_size, TEXT_COLOR)
+        text_y += line_height
+
+    return to_jpeg(canvas, quality=95)
+
+
+def render_text_frames(texts: List[str]) -> List[bytes]:
+    """Кадры текстовой анимации в PNG, все одного размера.
+
+    Размер холста подбирается по самому большому кадру (чётный, как нужно
+    для H.264); текст каждого кадра выровнен по левому краю и по центру
+    по вертикали. Пробелы, отступы и пустые строки сохраняются, переносятся
+    только слишком длинные строки. Если в кадрах есть символы, которых нет в
+    загруженных шрифтах, кадры не рисуются (LookupError): команда покажет
+    анимацию правками.
+    """
+    missing = set().union(*(text_layout.missing_glyphs(text) for text in texts))
+    if missing:
+        raise LookupError(f"Нет глифов для символов: {''.join(sorted(missing))}")
+
+    line_height = int(FRAME_FONT_SIZE * 1.3)
+    laid_out = [
+        text_layout.layout(text.split("\n"), FRAME_FONT_SIZE, FRAME_MAX_TEXT_WIDTH, FRAME_MAX_LINES,
+                           keep_whitespace=True)
+        for text in texts
+    ]
+    text_width = max((sum(run.width for run in runs) for lines in laid_out for runs in lines), default=0)
+    text_height = max((len(lines) for lines in laid_out), default=0) * line_height
+    width = max(FRAME_MIN_SIZE[0], int(text_width) + 2 * FRAME_PADDING)
+    height = max(FRAME_MIN_SIZE[1], text_height + 2 * FRAME_PADDING)
+    width, height = width + width % 2, height + height % 2
+
+    frames = []
+    for lines in laid_out:
+        canvas = Image.new('RGB', (width, height), FRAME_BACKGROUND)
+        draw = ImageDraw.Draw(canvas)
+        y = (height - len(lines) * line_height) // 2
+        for runs in lines:
+            text_layout.draw_runs(draw, (FRAME_PADDING, y), runs, FRAME_FONT_SIZE, TEXT_COLOR)
+            y += line_height
+        output = BytesIO()
+        canvas.save(output, "PNG", compress_level=1)
+        frames.append(output.getvalue())
+    return frames
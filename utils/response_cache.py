@@ -0,0 +1,110 @@
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+from db.db_utils import get_api_cache, save_api_cache
+from utils.http_client import get_session
+from config import RESPONSE_CACHE_MAX_ENTRIES, RESPONSE_CACHE_PERSISTENT, RESPONSE_CACHE_EMPTY_TTL
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Время жизни ответов по источникам, в секундах
+RESPONSE_TTLS = {
+    "weather": 10 * 60,        # текущая погода
+    "forecast": 30 * 60,       # почасовой прогноз Open-Meteo
+    "geocoding": 7 * 86400,    # координаты города
+    "ip": 86400,               # геоданные IP
+    "whois": 86400,            # WHOIS домена
+    "apod": 60 * 60,           # фото дня на сегодня; прошлые даты хранятся бессрочно
+}
+
+class ResponseCache:
+    """Кэш ответов внешних API с ограничением размера и временем жизни по источникам.
+
+    Первый уровень — LRU в памяти, второй (необязательный) — таблица api_cache,
+    чтобы ответы переживали перезапуск. Запись без срока (expires_at = None)
+    хранится бессрочно.
+    """
+
+    def __init__(self, max_size: int, persistent: bool):
+        self.max_size = max_size
+        self.persistent = persistent
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[Optional[float], Any]]" = OrderedDict()
+        self.hits = 0
+        self.persistent_hits = 0
+        self.misses = 0
+
+    def _store(self, cache_key: Tuple[str, str], expires_at: Optional[float], value: Any):
+        self._entries[cache_key] = (expires_at, value)
+        self._entries.move_to_end(cache_key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    async def get(self, source: str, key: str) -> Optional[Any]:
+        """Возвращает сохранённый ответ или None, если его нет или срок истёк."""
+        cache_key = (source, key)
+        now = time.time()
+        entry = self._entries.get(cache_key)
+        if entry:
+            expires_at, value = entry
+            if expires_at is None or expires_at > now:
+                self._entries.move_to_end(cache_key)
+                self.hits += 1
+                return value
+            del self._entries[cache_key]
+
+        if self.persistent:
+            row = await get_api_cache(source, key)
+            if row:
+                value, expires_at = row
+                self._store(cache_key, expires_at, value)
+                self.persistent_hits += 1
+                return value
+
+        self.misses += 1
+        return None
+
+    async def set(self, source: str, key: str, value: Any, ttl: Optional[float]):
+        """Сохраняет ответ на ttl секунд (None — бессрочно)."""
+        expires_at = None if ttl is None else time.time() + ttl
+        self._store((source, key), expires_at, value)
+        if self.persistent:
+            await save_api_cache(source, key, value, expires_at)
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.persistent_hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "persistent_hits": self.persistent_hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits + self.persistent_hits) / total if total else 0.0,
+        }
+
+response_cache = ResponseCache(RESPONSE_CACHE_MAX_ENTRIES, RESPONSE_CACHE_PERSISTENT)
+
+async def cached_json(source: str, key: str, method: str, url: str, forever: bool = False,
+                      **request_kwargs) -> Tuple[int, Any]:
+    """Выполняет запрос через общую HTTP-сессию с кэшированием успешного JSON-ответа.
+
+    Возвращает (HTTP-статус, данные). Данные есть только при статусе 200;
+    ошибки не кэшируются. forever=True сохраняет ответ бессрочно. Пустой
+    ответ ([] или {}) хранится RESPONSE_CACHE_EMPTY_TTL секунд, чтобы
+    только что появившиеся данные не ждали полного срока источника.
+    """
+    data = await response_cache.get(source, key)
+    if data is not None:
+        return 200, data
+
+    async with get_session().request(method, url, **request_kwargs) as resp:
+        if resp.status != 200:
+            return resp.status, None
+        data = await resp.json()
+
+    if not data:
+        ttl = RESPONSE_CACHE_EMPTY_TTL
+    else:
+        ttl = None if forever else RESPONSE_TTLS[source]
+    await response_cache.set(source, key, data, ttl)
+    return 200, data
@@ -0,0 +1,140 @@
+import logging
+from typing import Awaitable, Callable, Dict, List, Optional
+from pyrogram import Client, filters
+from pyrogram.handlers import MessageHandler
+from pyrogram.types import Message
+from db.db_utils import get_user_prefix, get_delete_cmd, alias_exists
+from utils.filters import compile_delete_pattern
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+Handler = Callable[[Client, Message], Awaitable[None]]
+Check = Callable[[Message], bool]
+
+class Route:
+    """Описание команды: обработчик и дополнительные условия срабатывания."""
+
+    def __init__(self, handler: Handler, exact: bool = False, min_words: int = 0,
+                 check: Optional[Check] = None, caption: bool = False):
+        self.handler = handler
+        self.exact = exact          # команда без аргументов
+        self.min_words = min_words  # минимум слов во всём тексте, включая префикс и команду
+        self.check = check          # проверка реплая, типа чата и т.п.
+        self.caption = caption      # команда может прийти в подписи к медиа
+
+    def accepts(self, message: Message, text: str, rest: str) -> bool:
+        if self.exact and rest:
+            return False
+        if self.min_words and len(text.split()) < self.min_words:
+            return False
+        if self.check and not self.check(message):
+            return False
+        return True
+
+class CommandRouter:
+    """Единый обработчик сообщений вместо десятков отдельных фильтров.
+
+    Для каждого исходящего сообщения префикс и имя команды разбираются один раз,
+    после чего обработчик ищется в словаре. Команды вида `<префикс> <команда>`,
+    `.<команда>`, пользовательская команда удаления и алиасы проверяются по
+    снимку настроек в памяти, без запросов к БД.
+    """
+
+    def __init__(self):
+        self._prefixed: Dict[str, List[Route]] = {}
+        self._dotted: Dict[str, List[Route]] = {}
+        self._delete_route: Optional[Route] = None
+        self._alias_route: Optional[Route] = None
+
+    def command(self, name: str, handler: Handler, **options):
+        """Регистрирует команду `<префикс> <name>`."""
+        self._prefixed.setdefault(name.lower(), []).append(Route(handler, **options))
+
+    def dot_command(self, name: str, handler: Handler, **options):
+        """Регистрирует команду `.<name>` с фиксированным префиксом-точкой."""
+        self._dotted.setdefault(name.lower(), []).append(Route(handler, **options))
+
+    def delete_command(self, handler: Handler):
+        """Регистрирует обработчик пользовательской команды удаления."""
+        self._delete_route = Route(handler)
+
+    def alias(self, handler: Handler):
+        """Регистрирует обработчик вызова алиаса."""
+        self._alias_route = Route(handler)
+
+    @staticmethod
+    def _split(body: str):
+        parts = body.split(maxsplit=1)
+        if not parts:
+            return "", ""
+        return parts[0].lower(), parts[1] if len(parts) > 1 else ""
+
+    @staticmethod
+    def _match(routes: Optional[List[Route]], message: Message, text: str, rest: str,
+               is_caption: bool) -> Optional[Route]:
+        if not routes:
+            return None
+        for route in routes:
+            if is_caption and not route.caption:
+                continue
+            if route.accepts(message, text, rest):
+                return route
+        return None
+
+    async def resolve(self, message: Message) -> Optional[Route]:
+        """Находит обработчик для сообщения или возвращает None."""
+        if not (message.from_user and message.from_user.is_self):
+            return None
+        is_caption = message.text is None
+        text = message.caption if is_caption else message.text
+        if not text:
+            return None
+
+        user_id = message.from_user.id
+        prefix = await get_user_prefix(user_id)
+
+        if text[:len(prefix) + 1].lower() == f"{prefix} ".lower():
+            name, rest = self._split(text[len(prefix) + 1:])
+            route = self._match(self._prefixed.get(name), message, text, rest, is_caption)
+            if route:
+                message.command = [name] + rest.split()
+                return route
+
+        if text.startswith("."):
+            name, rest = self._split(text[1:])
+            route = self._match(self._dotted.get(name), message, text, rest, is_caption)
+            if route:
+                message.command = [name] + rest.split()
+                return route
+
+        if is_caption:
+            return None
+
+        stripped = text.strip()
+        lowered = stripped.lower()
+        if self._delete_route and not lowered.startswith(prefix.lower()):
+            delete_cmd = await get_delete_cmd(user_id)
+            if delete_cmd and compile_delete_pattern(delete_cmd).match(lowered):
+                return self._delete_route
+
+        if self._alias_route and await alias_exists(user_id, stripped):
+            return self._alias_route
+
+        return None
+
+    async def _filter(self, _, __, message: Message) -> bool:
+        route = await self.resolve(message)
+        if route is None:
+            return False
+        message._route = route
+        return True
+
+    async def _dispatch(self, client: Client, message: Message):
+        await message._route.handler(client, message)
+
+    def install(self, app: Client, group: int = 0):
+        """Добавляет единственный обработчик команд в клиент."""
+        app.add_handler(MessageHandler(self._dispatch, filters.create(self._filter)), group)
+
+router = CommandRouter()
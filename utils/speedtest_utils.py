@@ -1,15 +1,17 @@
-import httpx
+import aiohttp
 from datetime import datetime
+from utils.http_client import get_session
 
 async def run_remote_speedtest(server_url: str) -> dict | None:
     try:
-        async with httpx.AsyncClient(timeout=60.0) as client:
-            response = await client.post(
-                f"{server_url.rstrip('/')}/speedtest",
-                headers={"User-Agent": "Telegram Speedtest Bot"}
-            )
+        # Тест идёт долго, поэтому общий таймаут чтения здесь увеличен
+        async with get_session().post(
+            f"{server_url.rstrip('/')}/speedtest",
+            headers={"User-Agent": "Telegram Speedtest Bot"},
+            timeout=aiohttp.ClientTimeout(total=60.0, sock_read=60.0)
+        ) as response:
             response.raise_for_status()
-            return response.json()
+            return await response.json()
     except Exception as e:
         print(f"Remote speedtest error: {str(e)}")
         return None
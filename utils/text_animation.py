@@ -0,0 +1,127 @@
+"""Текстовые анимации одним сообщением вместо серии правок.
+
+Кадры (текст и длительность) рисуются в пуле отрисовки, ffmpeg собирает
+из них короткое MP4 без звука, и Telegram показывает его как GIF.
+Готовая анимация кэшируется по ключу (utils.render_cache), поэтому
+повторный запуск — один вызов API с file_id.
+"""
+import logging
+import os
+import tempfile
+from io import BytesIO
+from typing import AsyncIterator, List, Optional, Sequence, Tuple
+import asyncio
+from pyrogram import Client
+from pyrogram.errors import MessageNotModified
+from pyrogram.types import Message
+from utils.media_pool import run_ffmpeg
+from utils.outbound import outbound, Priority
+from utils.render_pool import render
+from utils.renderers import render_text_frames
+from utils.render_cache import render_cache
+from config import EDIT_ANIMATIONS_AS_VIDEO
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+ANIMATION_FPS = 20
+# Подпись к анимации — последний кадр, в пределах лимита Telegram
+MAX_CAPTION_LENGTH = 1024
+
+# (текст кадра, сколько секунд он показывается)
+Frame = Tuple[str, float]
+
+async def _frame_stream(images: List[bytes], counts: List[int]) -> AsyncIterator[bytes]:
+    # Кадр, который показывается дольше, повторяется нужное число раз
+    for image, count in zip(images, counts):
+        for _ in range(count):
+            yield image
+
+async def encode_animation(frames: Sequence[Frame]) -> BytesIO:
+    """Рисует кадры и кодирует их в MP4 для send_animation."""
+    texts = list(dict.fromkeys(text for text, _ in frames))
+    rendered = dict(zip(texts, await render(render_text_frames, texts)))
+    images = [rendered[text] for text, _ in frames]
+    counts = [max(1, round(seconds * ANIMATION_FPS)) for _, seconds in frames]
+
+    fd, output_path = tempfile.mkstemp(prefix="animation_", suffix=".mp4")
+    os.close(fd)
+    try:
+        await run_ffmpeg([
+            "-y", "-f", "image2pipe", "-framerate", str(ANIMATION_FPS), "-c:v", "png", "-i", "pipe:0",
+            "-c:v", "libx264", "-preset", "veryfast", "-tune", "animation", "-pix_fmt", "yuv420p",
+            "-an", "-movflags", "+faststart", output_path
+        ], stdin=_frame_stream(images, counts))
+        with open(output_path, "rb") as f:
+            upload = BytesIO(f.read())
+    finally:
+        os.remove(output_path)
+    upload.name = "animation.mp4"
+    return upload
+
+async def send_text_animation(client: Client, message: Message, key: Optional[str],
+                              frames: Sequence[Frame]) -> bool:
+    """Отправляет анимацию одним сообщением вместо команды.
+
+    key — ключ кэша готовой анимации; None — кадры каждый раз разные,
+    анимация собирается заново и не кэшируется. False — режим отключён в
+    настройках или анимацию не удалось собрать; тогда команда показывает
+    кадры правками, как раньше.
+    """
+    if not EDIT_ANIMATIONS_AS_VIDEO or not frames:
+        return False
+
+    async def produce() -> Optional[BytesIO]:
+        try:
+            return await encode_animation(frames)
+        except Exception as e:
+            logger.error(f"Не удалось собрать анимацию, показываем правками: {e}")
+            return None
+
+    reply_to_id = message.reply_to_message.id if message.reply_to_message else None
+
+    def send(animation):
+        return client.send_animation(
+            message.chat.id,
+            animation,
+            caption=frames[-1][0][:MAX_CAPTION_LENGTH],
+            reply_to_message_id=reply_to_id
+        )
+
+    if key is None:
+        animation = await produce()
+        sent = await send(animation) if animation else None
+    else:
+        sent = await render_cache.send(key, send, produce)
+    if not sent:
+        return False
+    await message.delete()
+    return True
+
+async def play_by_edits(message: Message, frames: Sequence[Frame]):
+    """Показывает кадры правками сообщения (прежний режим).
+
+    Правки идут через планировщик как фоновые: если лимиты не успевают за
+    кадрами, промежуточные кадры пропускаются, последний показывается всегда.
+    """
+    failed = False
+
+    async def show(text: str):
+        nonlocal failed
+        try:
+            await outbound.run("edit", message.chat.id, message.edit, text,
+                               priority=Priority.BACKGROUND, coalesce=("frame", message.chat.id, message.id))
+        except MessageNotModified:
+            pass
+        except Exception as e:
+            failed = True
+            logger.warning(f"Анимация прервана: {e}")
+
+    shown = []
+    for index, (text, seconds) in enumerate(frames):
+        if failed:
+            break
+        shown.append(asyncio.create_task(show(text)))
+        if index < len(frames) - 1:
+            await asyncio.sleep(seconds)
+    await asyncio.gather(*shown)
@@ -0,0 +1,174 @@
+"""Разметка текста для отрисовки: отрезки по шрифтам и перенос строк.
+
+Текст делится на отрезки (runs) одного шрифта — обычного или эмодзи;
+каждый отрезок рисуется одним вызовом draw.text. Ширина символа берётся
+из кэша (шрифт, размер, символ), поэтому каждый символ измеряется один раз
+на процесс, а разметка занимает время, линейное от длины текста.
+"""
+import re
+from typing import Dict, List, NamedTuple, Sequence, Set, Tuple
+from PIL import ImageDraw
+from utils.render_pool import font, has_font
+
+REGULAR_FONT = "dejavu"
+EMOJI_FONT = "emoji"
+
+# Символы с этого кода рисуются шрифтом эмодзи
+EMOJI_START = 0x1F000
+# Соединитель и селектор вариантов остаются в отрезке эмодзи
+EMOJI_JOINERS = ("\u200d", "\ufe0f")
+# Символ, которого нет ни в одном шрифте: его маска — глиф «нет символа»
+MISSING_CHAR = "\U0010FFFD"
+# Размер, в котором проверяется наличие глифа
+GLYPH_CHECK_SIZE = 32
+
+class Run(NamedTuple):
+    text: str
+    font_name: str
+    width: float
+
+_advances: Dict[Tuple[str, int, str], float] = {}
+
+def advance(font_name: str, size: int, char: str) -> float:
+    """Ширина символа из кэша; при ошибке шрифта — половина размера, как раньше."""
+    key = (font_name, size, char)
+    width = _advances.get(key)
+    if width is None:
+        try:
+            width = font(font_name, size).getlength(char)
+        except Exception:
+            width = size // 2
+        _advances[key] = width
+    return width
+
+_glyphs: Dict[Tuple[str, str], bool] = {}
+
+def _mask(font_name: str, char: str) -> Tuple[Tuple[int, int], bytes]:
+    mask = font(font_name, GLYPH_CHECK_SIZE).getmask(char)
+    return mask.size, bytes(mask)
+
+def has_glyph(font_name: str, char: str) -> bool:
+    """Может ли шрифт нарисовать символ; пробельные символы рисуются всегда."""
+    if char.isspace():
+        return True
+    key = (font_name, char)
+    found = _glyphs.get(key)
+    if found is None:
+        found = has_font(font_name) and _mask(font_name, char) != _mask(font_name, MISSING_CHAR)
+        _glyphs[key] = found
+    return found
+
+def missing_glyphs(text: str) -> Set[str]:
+    """Символы текста, которые загруженные шрифты нарисуют пустым прямоугольником."""
+    missing = set()
+    current = None
+    for char in text:
+        current = _font_for(char, current)
+        if not has_glyph(current, char):
+            missing.add(char)
+    return missing
+
+def _font_for(char: str, previous: str) -> str:
+    if ord(char) >= EMOJI_START or (char in EMOJI_JOINERS and previous == EMOJI_FONT):
+        return EMOJI_FONT
+    return REGULAR_FONT
+
+def shape(text: str, size: int) -> List[Run]:
+    """Делит строку на отрезки одного шрифта и считает их ширину."""
+    runs = []
+    chars: List[str] = []
+    current = None
+    width = 0.0
+    for char in text:
+        font_name = _font_for(char, current)
+        if font_name != current and chars:
+            runs.append(Run("".join(chars), current, width))
+            chars, width = [], 0.0
+        current = font_name
+        chars.append(char)
+        width += advance(font_name, size, char)
+    if chars:
+        runs.append(Run("".join(chars), current, width))
+    return runs
+
+def text_width(text: str, size: int) -> float:
+    """Ширина строки без отрисовки."""
+    width = 0.0
+    current = None
+    for char in text:
+        current = _font_for(char, current)
+        width += advance(current, size, char)
+    return width
+
+def wrap(text: str, size: int, max_width: float) -> List[str]:
+    """Переносит текст по словам.
+
+    Ширина строки накапливается: каждое слово измеряется один раз и
+    прибавляется к уже известной ширине строки. Слово шире строки
+    занимает строку целиком.
+    """
+    space = advance(REGULAR_FONT, size, " ")
+    lines = []
+    line: List[str] = []
+    line_width = 0.0
+    for word in text.split():
+        word_width = text_width(word, size)
+        if line and line_width + space + word_width > max_width:
+            lines.append(" ".join(line))
+            line, line_width = [word], word_width
+        else:
+            line_width += (space if line else 0) + word_width
+            line.append(word)
+    if line:
+        lines.append(" ".join(line))
+    return lines
+
+def wrap_exact(text: str, size: int, max_width: float) -> List[str]:
+    """Переносит строку, сохраняя пробелы и отступы (для ASCII-арта и кадров).
+
+    Строка, которая помещается, возвращается без изменений, пустая — как
+    пустая строка. Длинная разрывается по пробелам: пробелы в месте разрыва
+    отбрасываются, остальные остаются как были.
+    """
+    if text_width(text, size) <= max_width:
+        return [text]
+    lines = []
+    line = ""
+    line_width = 0.0
+    for token in re.findall(r"\s+|\S+", text):
+        token_width = text_width(token, size)
+        if not token.isspace() and line.strip() and line_width + token_width > max_width:
+            lines.append(line.rstrip())
+            line, line_width = token, token_width
+        else:
+            line += token
+            line_width += token_width
+    lines.append(line)
+    return lines
+
+def layout(paragraphs: Sequence[str], size: int, max_width: float, max_lines: int,
+           keep_whitespace: bool = False) -> List[List[Run]]:
+    """Размечает несколько абзацев (например, несколько сообщений) за один проход.
+
+    Возвращает не больше max_lines строк, каждая — список отрезков.
+    keep_whitespace — абзацы переносятся через wrap_exact: пробелы,
+    отступы и пустые строки сохраняются.
+    """
+    wrap_line = wrap_exact if keep_whitespace else wrap
+    lines = []
+    for paragraph in paragraphs:
+        for line in wrap_line(paragraph, size, max_width):
+            if len(lines) == max_lines:
+                return lines
+            lines.append(shape(line, size))
+    return lines
+
+def draw_runs(draw: ImageDraw.ImageDraw, position: Tuple[float, float], runs: Sequence[Run], size: int,
+              fill: tuple) -> float:
+    """Рисует отрезки подряд, по одному вызову draw.text на отрезок; возвращает ширину."""
+    x, y = position
+    for run in runs:
+        draw.text((x, y), run.text, fill=fill, font=font(run.font_name, size),
+                  embedded_color=run.font_name == EMOJI_FONT)
+        x += run.width
+    return x - position[0]
@@ -0,0 +1,204 @@
+import asyncio
+import json
+import logging
+import math
+import os
+import shutil
+import tempfile
+from typing import Any, Dict, List, Optional
+from pyrogram import Client
+from utils.media_pool import Progress, media_pool, run_ffmpeg, run_ffprobe, transcode_from_telegram
+from config import (MEDIA_JOB_TIMEOUT, VIDEO_NOTE_PRESET, VIDEO_NOTE_TIMEOUT_PER_SECOND,
+                    VIDEO_NOTE_SEGMENTED_FROM, VIDEO_NOTE_MIN_SEGMENT)
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Ограничения Telegram для видеокружков
+VIDEO_NOTE_SIZE = 512
+VIDEO_NOTE_MAX_SIDE = 640
+VIDEO_NOTE_MAX_DURATION = 60
+
+# Профили H.264, которые клиенты Telegram воспроизводят в кружке без перекодирования
+COPYABLE_VIDEO_PROFILES = ("Baseline", "Constrained Baseline", "Main")
+
+ENCODE_VIDEO_ARGS = [
+    "-vf", f"crop=min(iw\\,ih):min(iw\\,ih),scale={VIDEO_NOTE_SIZE}:{VIDEO_NOTE_SIZE}",
+    "-c:v", "libx264",
+    "-preset", VIDEO_NOTE_PRESET,
+    "-profile:v", "baseline",
+    "-level", "3.0",
+    "-pix_fmt", "yuv420p",
+]
+ENCODE_ARGS = [*ENCODE_VIDEO_ARGS, "-c:a", "aac"]
+
+def conversion_timeout(duration: Optional[float]) -> float:
+    """Таймаут конвертации растёт с длиной видео, но не меньше общего таймаута пула."""
+    seconds = min(duration or 0, VIDEO_NOTE_MAX_DURATION)
+    return max(MEDIA_JOB_TIMEOUT, seconds * VIDEO_NOTE_TIMEOUT_PER_SECOND)
+
+def may_be_compliant(media: Any) -> bool:
+    """По данным Telegram решает, стоит ли проверять файл ffprobe перед конвертацией.
+
+    Видеокружок или квадратное видео небольшого размера, скорее всего, можно
+    только перепаковать; остальное заведомо перекодируется из потока.
+    """
+    if getattr(media, "length", None):
+        return True
+    width, height = getattr(media, "width", 0), getattr(media, "height", 0)
+    return bool(width) and width == height and width <= VIDEO_NOTE_MAX_SIDE
+
+async def probe_streams(path: str) -> List[Dict[str, Any]]:
+    result = await run_ffprobe([
+        "-v", "error",
+        "-show_entries", "stream=codec_type,codec_name,profile,pix_fmt,width,height",
+        "-of", "json",
+        path
+    ])
+    return json.loads(result.stdout or b"{}").get("streams", [])
+
+def plan_codec_args(streams: List[Dict[str, Any]]) -> List[str]:
+    """Выбирает аргументы кодирования: копирование потоков, если вход уже подходит для кружка."""
+    video = next((s for s in streams if s.get("codec_type") == "video"), None)
+    audio = next((s for s in streams if s.get("codec_type") == "audio"), None)
+    audio_args = ["-c:a", "copy"] if audio is None or audio.get("codec_name") == "aac" else ["-c:a", "aac"]
+
+    if (video and video.get("codec_name") == "h264"
+            and video.get("pix_fmt") == "yuv420p"
+            and video.get("profile") in COPYABLE_VIDEO_PROFILES
+            and video.get("width") == video.get("height")
+            and (video.get("width") or 0) <= VIDEO_NOTE_MAX_SIDE):
+        return ["-c:v", "copy", *audio_args]
+    return ENCODE_ARGS
+
+def output_args(codec_args: List[str], output_path: str) -> List[str]:
+    return [
+        # Видео и первая аудиодорожка, если она есть
+        "-map", "0:v:0",
+        "-map", "0:a:0?",
+        *codec_args,
+        # Длиннее минуты кружок не бывает: лишнее обрезается, а не приводит к ошибке
+        "-t", str(VIDEO_NOTE_MAX_DURATION),
+        "-shortest",
+        "-movflags", "+faststart",
+        "-y",
+        output_path
+    ]
+
+def use_segments(duration: Optional[float]) -> bool:
+    """Сегментное кодирование выгодно только для длинных видео и при нескольких процессах в пуле."""
+    return media_pool.workers > 1 and (duration or 0) >= VIDEO_NOTE_SEGMENTED_FROM
+
+async def encode_single_pass(input_path: str, output_path: str, duration: Optional[float],
+                             progress: Optional[Progress] = None):
+    """Перекодирует файл в кружок одним процессом ffmpeg."""
+    await run_ffmpeg(["-i", input_path, *output_args(ENCODE_ARGS, output_path)],
+                     timeout=conversion_timeout(duration), progress=progress)
+
+async def encode_segmented(input_path: str, output_path: str, duration: float,
+                           progress: Optional[Progress] = None):
+    """Перекодирует файл в кружок параллельно по сегментам.
+
+    Видео без перекодирования режется по ключевым кадрам, сегменты
+    обрезаются, масштабируются и кодируются одновременно процессами пула,
+    звук кодируется отдельно. Затем сегменты склеиваются concat без потерь
+    и сводятся со звуком.
+    """
+    duration = min(duration, VIDEO_NOTE_MAX_DURATION)
+    segment_time = max(VIDEO_NOTE_MIN_SEGMENT, math.ceil(duration / media_pool.workers))
+    # Потоки x264 делятся между одновременно кодируемыми сегментами
+    threads = max(1, (os.cpu_count() or 1) // media_pool.workers)
+    timeout = conversion_timeout(duration)
+    work_dir = tempfile.mkdtemp(prefix="video_note_", dir=os.path.dirname(output_path) or None)
+    try:
+        streams = await probe_streams(input_path)
+        has_audio = any(s.get("codec_type") == "audio" for s in streams)
+
+        await run_ffmpeg([
+            "-i", input_path,
+            "-map", "0:v:0",
+            "-t", str(VIDEO_NOTE_MAX_DURATION),
+            "-c", "copy",
+            "-f", "segment",
+            "-segment_time", str(segment_time),
+            "-reset_timestamps", "1",
+            os.path.join(work_dir, "part_%03d.mkv")
+        ], timeout=timeout)
+        parts = sorted(name for name in os.listdir(work_dir) if name.startswith("part_"))
+
+        done = 0
+
+        async def encode_part(name: str) -> str:
+            nonlocal done
+            encoded = os.path.join(work_dir, name.replace("part_", "enc_").replace(".mkv", ".mp4"))
+            await run_ffmpeg([
+                "-i", os.path.join(work_dir, name),
+                *ENCODE_VIDEO_ARGS,
+                "-threads", str(threads),
+                "-an",
+                "-y",
+                encoded
+            ], timeout=timeout)
+            done += 1
+            if progress:
+                await progress(min(duration, done * segment_time), False)
+            return encoded
+
+        async def encode_audio() -> Optional[str]:
+            if not has_audio:
+                return None
+            audio_path = os.path.join(work_dir, "audio.m4a")
+            await run_ffmpeg([
+                "-i", input_path,
+                "-map", "0:a:0",
+                "-t", str(VIDEO_NOTE_MAX_DURATION),
+                "-c:a", "aac",
+                "-y",
+                audio_path
+            ], timeout=timeout)
+            return audio_path
+
+        *encoded, audio_path = await asyncio.gather(*(encode_part(name) for name in parts), encode_audio())
+
+        list_path = os.path.join(work_dir, "parts.txt")
+        with open(list_path, "w") as f:
+            f.writelines(f"file '{os.path.abspath(path)}'\n" for path in encoded)
+
+        command = ["-f", "concat", "-safe", "0", "-i", list_path]
+        if audio_path:
+            command += ["-i", audio_path, "-map", "0:v:0", "-map", "1:a:0", "-shortest"]
+        await run_ffmpeg([*command, "-c", "copy", "-movflags", "+faststart", "-y", output_path], timeout=timeout)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+async def convert_to_video_note(client: Client, media: Any, output_path: str, temp_path: str,
+                                progress: Optional[Progress] = None) -> bool:
+    """Делает из видео Telegram файл видеокружка.
+
+    Подходящий по данным Telegram файл скачивается и проверяется ffprobe:
+    если кодек, профиль и размеры уже годятся, потоки копируются без
+    перекодирования. Длинное видео скачивается и кодируется по сегментам
+    на нескольких ядрах, остальное перекодируется быстрым пресетом прямо из
+    загрузки. Возвращает True, если использовано копирование.
+    """
+    timeout = conversion_timeout(media.duration)
+    if not may_be_compliant(media) and not use_segments(media.duration):
+        await transcode_from_telegram(client, media.file_id, output_args(ENCODE_ARGS, output_path),
+                                      temp_path, progress, timeout)
+        return False
+
+    # Проверка ffprobe и нарезка на сегменты требуют файла на диске
+    try:
+        await client.download_media(media.file_id, temp_path)
+        codec_args = plan_codec_args(await probe_streams(temp_path)) if may_be_compliant(media) else ENCODE_ARGS
+        if codec_args is not ENCODE_ARGS:
+            await run_ffmpeg(["-i", temp_path, *output_args(codec_args, output_path)], timeout=timeout, progress=progress)
+            return True
+        if use_segments(media.duration):
+            await encode_segmented(temp_path, output_path, media.duration, progress)
+        else:
+            await encode_single_pass(temp_path, output_path, media.duration, progress)
+        return False
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)